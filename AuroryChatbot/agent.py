@@ -1,19 +1,38 @@
+import asyncio
+import contextvars
+import hashlib
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 # LangChain imports
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.prompts import ChatPromptTemplate
 from langchain.schema import StrOutputParser
 from langchain.tools import Tool
 from langchain.agents import AgentExecutor, create_react_agent
-from langchain_neo4j import Neo4jChatMessageHistory
+from langchain_core.agents import AgentAction
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage, get_buffer_string
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.tools import render_text_description
 from langchain_core.runnables.history import RunnableWithMessageHistory
 
 
 # Local imports
 from llm import llm
-from graph import graph
-from tools.cypher import cypher_qa
-from tools.vector import get_document
+from graph import get_graph
+from tools.cypher import get_cypher_qa, get_cypher_memo, invoke_cypher_qa, ainvoke_cypher_qa
+from tools.vector import get_document, aget_document, get_document_retriever
+from answer_cache import MARKET_ANSWER_TTL_SECONDS, answer_cache
+from memory import Neo4jSessionHistory, build_summarizer
+from history import prepare_history_schema
+from retention import start_retention_job
+from instrumentation import InstrumentationHandler, record_event, recording_turn, usage_stats
 
-from utils import get_session_id
+from utils import get_session_id, get_setting
 
 # Create a game chat chain (bu kısım zaten doğru görünüyor)
 chat_prompt = ChatPromptTemplate.from_messages(
@@ -82,12 +101,27 @@ gaming_system_message = ChatPromptTemplate.from_messages(
 def safe_cypher_invoke(query):
     """Safely invoke cypher_qa with error handling"""
     try:
-        if cypher_qa is None:
+        if get_cypher_qa() is None:
             return {
                 "result": "Database connection is not available. Please check Neo4j connection.",
                 "generated_cypher_query": None
             }
-        return cypher_qa.invoke(query)
+        return invoke_cypher_qa(query)
+    except Exception as e:
+        return {
+            "result": f"Error querying database: {str(e)}",
+            "generated_cypher_query": None
+        }
+
+async def asafe_cypher_invoke(query):
+    """Async counterpart of safe_cypher_invoke"""
+    try:
+        if get_cypher_qa() is None:
+            return {
+                "result": "Database connection is not available. Please check Neo4j connection.",
+                "generated_cypher_query": None
+            }
+        return await ainvoke_cypher_qa(query)
     except Exception as e:
         return {
             "result": f"Error querying database: {str(e)}",
@@ -102,6 +136,7 @@ tools = [
         name="General Chat",
         description="General chat about Aurory game and ecosystem...",
         func=aurory_chat.invoke,
+        coroutine=aurory_chat.ainvoke,
     ),
     Tool.from_function(
         name="Documents Search",
@@ -114,7 +149,8 @@ tools = [
         "content_type options: 'news', 'tweets', 'dao', or 'all'\n"
         "Example: semantic_search(query='NERITE utility', content_type='tweets')"
     ),
-        func=get_document 
+        func=get_document,
+        coroutine=aget_document
     ),
     Tool.from_function(
         name="Aurory Game Information",
@@ -123,14 +159,23 @@ tools = [
             "Use this tool for any inquiries involving tokenomics, NFT markets, DAO proposals, player strategies, or economic data within the Aurory ecosystem.\n"
             "Always rely on this tool when structured, up-to-date data from the Neo4j knowledge graph is needed."
         ),
-        func=cypher_qa.invoke 
+        func=safe_cypher_invoke,
+        coroutine=asafe_cypher_invoke
     )
 ]
 
 
+# Pencereden çıkan mesajlar bu zincirle oturum özetine katılır
+history_summarizer = build_summarizer(llm)
+
 # Create chat history callback
 def get_memory(session_id):
-    return Neo4jChatMessageHistory(session_id=session_id, graph=graph)
+    graph = get_graph()
+    if graph is None:
+        # Neo4j yokken tur geçmişsiz yanıtlanır
+        print("⚠️ Neo4j unavailable, answering without chat history")
+        return InMemoryChatMessageHistory()
+    return Neo4jSessionHistory(session_id=session_id, graph=graph, summarizer=history_summarizer)
 
 
 react_agent_structure_content = """TOOLS:
@@ -227,48 +272,517 @@ AGENTS_EXEC = {
     "gaming": gaming_chat_agent,
 }
 
-# Create a handler to call the agent
 
-def generate_response(user_input: str, agent_id: str = "gaming") -> dict: 
+# Planner mode: gereken araçlar baştan seçilir, paralel çalıştırılır ve
+# cevap tek bir LLM çağrısıyla sentezlenir (ReAct'teki ardışık adımlar yerine)
+AGENT_MODES = ("react", "planner")
+DEFAULT_AGENT_MODE = get_setting("AGENT_MODE", "react")
+MAX_PLANNER_STEPS = 4
+FINAL_ANSWER_TAG = "final_answer"
+
+TOOLS_BY_NAME = {tool.name: tool for tool in tools}
+
+AGENT_SYSTEM_PROMPTS = {
+    "dao": dao_system_message.messages[0].prompt.template,
+    "gaming": gaming_system_message.messages[0].prompt.template,
+}
+
+planner_structure_content = """TOOLS:
+------
+
+You have access to the following tools:
+
+{tools}
+
+Decide up front which tools are needed to answer the new input. All planned tools run at the same time,
+so every tool input must stand on its own. Plan at most {max_steps} tool calls.
+
+Reply with JSON only, in this exact format:
+{{"steps": [{{"tool": "<one of [{tool_names}]>", "input": "<input to the tool>"}}]}}
+
+Return {{"steps": []}} when the question can be answered without tools.
+
+Previous conversation history:
+{chat_history}
+
+New input: {input}
+"""
+
+synthesis_structure_content = """Previous conversation history:
+{chat_history}
+
+Tool results:
+{observations}
+
+New input: {input}
+
+Answer the new input using the tool results above.
+- If data is incomplete or speculative, you clearly mark it as such.
+- Stay concise, professional, and focused on actionable insights.
+"""
+
+
+def _build_planner_chain(agent_id):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", AGENT_SYSTEM_PROMPTS[agent_id]),
+        ("human", planner_structure_content),
+    ]).partial(
+        tools=render_text_description(tools),
+        tool_names=", ".join(TOOLS_BY_NAME),
+        max_steps=str(MAX_PLANNER_STEPS),
+    )
+    return prompt | llm | JsonOutputParser()
+
+
+def _build_synthesis_chain(agent_id):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", AGENT_SYSTEM_PROMPTS[agent_id]),
+        ("human", synthesis_structure_content),
+    ])
+    return prompt | llm | StrOutputParser()
+
+
+PLANNER_CHAINS = {agent_id: _build_planner_chain(agent_id) for agent_id in AGENTS_EXEC}
+SYNTHESIS_CHAINS = {agent_id: _build_synthesis_chain(agent_id) for agent_id in AGENTS_EXEC}
+
+
+def _parse_plan(plan):
+    """Planner çıktısını [(araç adı, girdi)] listesine çevirir; geçersizse None döner"""
+    if not isinstance(plan, dict) or not isinstance(plan.get("steps"), list):
+        return None
+    steps = []
+    for step in plan["steps"][:MAX_PLANNER_STEPS]:
+        if not isinstance(step, dict) or step.get("tool") not in TOOLS_BY_NAME:
+            return None
+        steps.append((step["tool"], str(step.get("input", ""))))
+    return steps
+
+
+def _format_observations(intermediate_steps):
+    if not intermediate_steps:
+        return "No tools were used."
+    return "\n\n".join(
+        f"[{action.tool}] {action.tool_input}\n{observation}"
+        for action, observation in intermediate_steps
+    )
+
+
+def _run_planned_tool(step, callbacks=None):
+    tool_name, tool_input = step
+    try:
+        observation = TOOLS_BY_NAME[tool_name].invoke(tool_input, config={"callbacks": callbacks or []})
+    except Exception as e:
+        observation = f"Error running {tool_name}: {str(e)}"
+    return AgentAction(tool=tool_name, tool_input=tool_input, log=""), observation
+
+
+async def _arun_planned_tool(step, callbacks=None):
+    tool_name, tool_input = step
+    try:
+        observation = await TOOLS_BY_NAME[tool_name].ainvoke(tool_input, config={"callbacks": callbacks or []})
+    except Exception as e:
+        observation = f"Error running {tool_name}: {str(e)}"
+    return AgentAction(tool=tool_name, tool_input=tool_input, log=""), observation
+
+
+def _run_planner(agent_id, user_input, session_id, callbacks=None):
     """
-    Agent'ı seçilen agent_id'ye göre çağırır ve yanıt ile birlikte
-    oluşturulan Cypher sorgusunu (varsa) döndürür.
+    Planner modunda bir tur çalıştırır: plan (1 LLM çağrısı), araçlar (paralel),
+    sentez (1 LLM çağrısı). Plan okunamazsa None döner ve ReAct'e geçilir.
     """
-    selected_agent_executor = AGENTS_EXEC.get(agent_id)
+    memory = get_memory(session_id)
+    chat_history = get_buffer_string(memory.messages)
+    config = {"callbacks": callbacks or []}
+
+    try:
+        steps = _parse_plan(PLANNER_CHAINS[agent_id].invoke(
+            {"input": user_input, "chat_history": chat_history}, config=config
+        ))
+    except Exception as e:
+        print(f"⚠️ Planner çıktısı okunamadı, ReAct'e geçiliyor: {e}")
+        steps = None
+    if steps is None:
+        return None
+
+    intermediate_steps = []
+    if steps:
+        with ThreadPoolExecutor(max_workers=len(steps)) as pool:
+            # Her araç, turun ölçümlerine yazabilmesi için kendi context kopyasında çalışır
+            futures = [
+                pool.submit(contextvars.copy_context().run, _run_planned_tool, step, callbacks)
+                for step in steps
+            ]
+            intermediate_steps = [future.result() for future in futures]
+
+    output = SYNTHESIS_CHAINS[agent_id].invoke(
+        {"input": user_input, "chat_history": chat_history, "observations": _format_observations(intermediate_steps)},
+        config={**config, "tags": [FINAL_ANSWER_TAG]},
+    )
+    memory.add_messages([HumanMessage(content=user_input), AIMessage(content=output)])
+    return {"output": output, "intermediate_steps": intermediate_steps}
+
 
-    if not selected_agent_executor:
-        return {"output": "Üzgünüm, seçilen agent bulunamadı. Lütfen geçerli bir agent seçin.", "generated_cypher_query": None}
+async def _arun_planner(agent_id, user_input, session_id, callbacks=None):
+    memory = get_memory(session_id)
+    chat_history = get_buffer_string(await memory.aget_messages())
+    config = {"callbacks": callbacks or []}
 
     try:
-        response = selected_agent_executor.invoke(
+        steps = _parse_plan(await PLANNER_CHAINS[agent_id].ainvoke(
+            {"input": user_input, "chat_history": chat_history}, config=config
+        ))
+    except Exception as e:
+        print(f"⚠️ Planner çıktısı okunamadı, ReAct'e geçiliyor: {e}")
+        steps = None
+    if steps is None:
+        return None
+
+    intermediate_steps = list(await asyncio.gather(*(_arun_planned_tool(step, callbacks) for step in steps)))
+
+    output = await SYNTHESIS_CHAINS[agent_id].ainvoke(
+        {"input": user_input, "chat_history": chat_history, "observations": _format_observations(intermediate_steps)},
+        config={**config, "tags": [FINAL_ANSWER_TAG]},
+    )
+    await memory.aadd_messages([HumanMessage(content=user_input), AIMessage(content=output)])
+    return {"output": output, "intermediate_steps": intermediate_steps}
+
+# Create a handler to call the agent
+
+def _extract_generated_cypher(intermediate_steps):
+    """Ara adımlardan "Aurory Game Information" aracının ürettiği Cypher sorgusunu bulur"""
+    for step in intermediate_steps:
+        # Bir adım genellikle (AgentAction, tool_output) şeklindedir
+        if isinstance(step, tuple) and len(step) == 2:
+            tool_action, tool_output = step
+            if tool_action.tool == "Aurory Game Information":
+                # tool_output, cypher.py'den dönen dictionary olmalı
+                if isinstance(tool_output, dict) and "generated_cypher_query" in tool_output:
+                    return tool_output["generated_cypher_query"]
+    return None
+
+
+def _agent_not_found_response():
+    return {"output": "Üzgünüm, seçilen agent bulunamadı. Lütfen geçerli bir agent seçin.", "generated_cypher_query": None, "cached": False}
+
+
+def _agent_error_response(agent_id, error):
+    print(f"Agent çalıştırma hatası ({agent_id}): {error}")
+    return {
+        "output": f"Üzgünüm, {agent_id.replace('-', ' ').title()} agent'ı isteğinizi işlerken bir hata ile karşılaştı: {str(error)[:100]}...",
+        "generated_cypher_query": None,
+        "cached": False
+    }
+
+
+# Agent'ın araç kullanamadığı ya da durdurulduğu turların çıktıları önbelleğe yazılmaz
+_FALLBACK_OUTPUT_PREFIXES = ("Agent stopped due to",)
+_TOOL_ERROR_PREFIXES = ("Error querying database", "Database connection is not available", "Error running ")
+# Bu alanları okuyan Cypher sorgularının yanıtları piyasa verisine dayanır
+_MARKET_CYPHER_PATTERN = re.compile(r"price|volume|floor|market", re.IGNORECASE)
+
+
+def _history_fingerprint(messages):
+    """Cache context of a turn: "" without prior turns, else a hash of the history and summary the agent sees"""
+    if not messages:
+        return ""
+    return hashlib.sha256(get_buffer_string(messages).encode("utf-8")).hexdigest()
+
+
+def _cache_context(session_id):
+    """Fingerprint of the session's chat history, or None if it can't be read (the cache is then skipped)"""
+    try:
+        return _history_fingerprint(get_memory(session_id).messages)
+    except Exception as e:
+        print(f"⚠️ Sohbet geçmişi okunamadı, yanıt önbelleği atlanıyor: {e}")
+        return None
+
+
+async def _acache_context(session_id):
+    try:
+        return _history_fingerprint(await get_memory(session_id).aget_messages())
+    except Exception as e:
+        print(f"⚠️ Sohbet geçmişi okunamadı, yanıt önbelleği atlanıyor: {e}")
+        return None
+
+
+def _tool_failed(observation):
+    if isinstance(observation, dict):
+        if observation.get("error"):
+            return True
+        observation = observation.get("result", "")
+    return isinstance(observation, str) and observation.startswith(_TOOL_ERROR_PREFIXES)
+
+
+def _cache_ttl(output, intermediate_steps, generated_cypher_query):
+    """
+    TTL to cache a fresh answer with: None for the default, 0 to not cache it
+    (fallback output or a failed tool), the market TTL if it read market data
+    """
+    if output.startswith(_FALLBACK_OUTPUT_PREFIXES):
+        return 0
+    for step in intermediate_steps:
+        if isinstance(step, tuple) and len(step) == 2 and _tool_failed(step[1]):
+            return 0
+    if generated_cypher_query and _MARKET_CYPHER_PATTERN.search(str(generated_cypher_query)):
+        return MARKET_ANSWER_TTL_SECONDS
+    return None
+
+
+def _cached_response(agent_id, user_input, session_id, context):
+    """Benzer bir soru aynı bağlamda daha önce yanıtlandıysa önbellekteki yanıtı döndürür"""
+    if context is None:
+        return None
+    cached_response = answer_cache.lookup(agent_id, user_input, context)
+    record_event("answer_cache_hit" if cached_response is not None else "answer_cache_miss")
+    if cached_response is None:
+        return None
+    _save_cached_turn(session_id, user_input, cached_response["output"])
+    return {**cached_response, "cached": True}
+
+
+async def _acached_response(agent_id, user_input, session_id, context):
+    if context is None:
+        return None
+    cached_response = await answer_cache.alookup(agent_id, user_input, context)
+    record_event("answer_cache_hit" if cached_response is not None else "answer_cache_miss")
+    if cached_response is None:
+        return None
+    await _asave_cached_turn(session_id, user_input, cached_response["output"])
+    return {**cached_response, "cached": True}
+
+
+def _agent_result(response):
+    """Agent çıktısından yanıtı ve önbellek süresini çıkarır"""
+    intermediate_steps = response.get("intermediate_steps", [])
+    result = {
+        "output": response.get("output", str(response)),
+        "generated_cypher_query": _extract_generated_cypher(intermediate_steps)
+    }
+    return result, _cache_ttl(result["output"], intermediate_steps, result["generated_cypher_query"])
+
+
+def _run_agent(agent_id, user_input, session_id, callbacks=None, mode="react", context=None):
+    """Agent'ı çalıştırır, yanıtı turdan önceki geçmişin bağlamıyla önbelleğe yazar ve sonucu döndürür"""
+    response = _run_planner(agent_id, user_input, session_id, callbacks) if mode == "planner" else None
+    if response is None:
+        mode = "react"
+        response = AGENTS_EXEC[agent_id].invoke(
             {"input": user_input},
-            config={"configurable": {"session_id": get_session_id()}}
+            config={"configurable": {"session_id": session_id}, "callbacks": callbacks or []}
         )
 
-        final_output = response.get("output", str(response))
-        generated_cypher = None
-
-        # Ara adımları kontrol ederek Cypher sorgusunu bulmaya çalışın
-        intermediate_steps = response.get("intermediate_steps", [])
-        for step in intermediate_steps:
-            # Bir adım genellikle (AgentAction, tool_output) şeklindedir
-            if isinstance(step, tuple) and len(step) == 2:
-                tool_action, tool_output = step
-                # "Aurory Game Information" aracı kullanıldıysa
-                if tool_action.tool == "Aurory Game Information":
-                    # tool_output, cypher.py'den dönen dictionary olmalı
-                    if isinstance(tool_output, dict) and "generated_cypher_query" in tool_output:
-                        generated_cypher = tool_output["generated_cypher_query"]
-                        break # Sorguyu bulduk, döngüden çık
+    result, ttl_seconds = _agent_result(response)
+    if context is not None and ttl_seconds != 0:
+        answer_cache.store(agent_id, user_input, result, context, ttl_seconds)
+    return {**result, "cached": False, "mode": mode}
 
-        return {
-            "output": final_output,
-            "generated_cypher_query": generated_cypher
-        }
 
+async def _arun_agent(agent_id, user_input, session_id, callbacks=None, mode="react", context=None):
+    response = await _arun_planner(agent_id, user_input, session_id, callbacks) if mode == "planner" else None
+    if response is None:
+        mode = "react"
+        response = await AGENTS_EXEC[agent_id].ainvoke(
+            {"input": user_input},
+            config={"configurable": {"session_id": session_id}, "callbacks": callbacks or []}
+        )
+
+    result, ttl_seconds = _agent_result(response)
+    if context is not None and ttl_seconds != 0:
+        await answer_cache.astore(agent_id, user_input, result, context, ttl_seconds)
+    return {**result, "cached": False, "mode": mode}
+
+
+def _respond(agent_id, user_input, session_id, mode=None, callbacks=None):
+    """Önbellekten ya da agent'ı çalıştırarak tek bir turu yanıtlar"""
+    context = _cache_context(session_id)
+    cached_response = _cached_response(agent_id, user_input, session_id, context)
+    if cached_response is not None:
+        return cached_response
+    try:
+        return _run_agent(agent_id, user_input, session_id, callbacks=callbacks,
+                          mode=mode or DEFAULT_AGENT_MODE, context=context)
     except Exception as e:
-        print(f"Agent çalıştırma hatası ({agent_id}): {e}")
-        return {
-            "output": f"Üzgünüm, {agent_id.replace('-', ' ').title()} agent'ı isteğinizi işlerken bir hata ile karşılaştı: {str(e)[:100]}...",
-            "generated_cypher_query": None
-        }
\ No newline at end of file
+        return _agent_error_response(agent_id, e)
+
+
+async def _arespond(agent_id, user_input, session_id, mode=None, callbacks=None):
+    context = await _acache_context(session_id)
+    cached_response = await _acached_response(agent_id, user_input, session_id, context)
+    if cached_response is not None:
+        return cached_response
+    try:
+        return await _arun_agent(agent_id, user_input, session_id, callbacks=callbacks,
+                                 mode=mode or DEFAULT_AGENT_MODE, context=context)
+    except Exception as e:
+        return _agent_error_response(agent_id, e)
+
+
+def _with_metrics(response, session_id, recorder):
+    """Turun ölçümlerini yanıta ekler ve oturum/süreç istatistiklerine işler"""
+    metrics = recorder.summary()
+    usage_stats.record(session_id, metrics)
+    return {**response, "metrics": metrics}
+
+
+def generate_response(user_input: str, agent_id: str = "gaming", session_id: str = None, mode: str = None) -> dict: 
+    """
+    Agent'ı seçilen agent_id'ye göre çağırır ve yanıt ile birlikte
+    oluşturulan Cypher sorgusunu (varsa) döndürür.
+    mode: "react" (varsayılan) veya "planner" (araçlar paralel, tek sentez çağrısı)
+    """
+    if agent_id not in AGENTS_EXEC:
+        return _agent_not_found_response()
+
+    session_id = session_id or get_session_id()
+
+    with recording_turn() as recorder:
+        response = _respond(agent_id, user_input, session_id, mode, callbacks=[InstrumentationHandler(recorder)])
+    return _with_metrics(response, session_id, recorder)
+
+
+async def agenerate_response(user_input: str, agent_id: str = "gaming", session_id: str = None, mode: str = None) -> dict:
+    """
+    generate_response'un async sürümü. LLM, araç, geçmiş ve Neo4j çağrıları
+    ainvoke ile yapılır; böylece aynı sunucudaki oturumların G/Ç'si çakışabilir.
+    session_id, Streamlit script thread'i dışında çağrılırken verilmelidir.
+    """
+    if agent_id not in AGENTS_EXEC:
+        return _agent_not_found_response()
+
+    session_id = session_id or get_session_id()
+
+    with recording_turn() as recorder:
+        response = await _arespond(agent_id, user_input, session_id, mode, callbacks=[InstrumentationHandler(recorder)])
+    return _with_metrics(response, session_id, recorder)
+
+
+class StreamingEventHandler(BaseCallbackHandler):
+    """
+    Agent çalışırken araç olaylarını ve "Final Answer:" sonrasındaki
+    token'ları bir kuyruğa aktarır.
+    """
+
+    FINAL_ANSWER_MARKER = "Final Answer:"
+
+    def __init__(self, events: queue.Queue):
+        self.events = events
+        self._buffers = {}
+        self._answer_runs = set()
+        self._tool_names = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        # Planner modundaki sentez çağrısının tamamı final cevaptır
+        if tags and FINAL_ANSWER_TAG in tags:
+            self._answer_runs.add(run_id)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id in self._answer_runs:
+            self.events.put({"type": "token", "text": token})
+            return
+
+        # ReAct çıktısında yalnızca final cevap kısmını akıt
+        buffer = self._buffers.get(run_id, "") + token
+        marker_index = buffer.find(self.FINAL_ANSWER_MARKER)
+        if marker_index == -1:
+            self._buffers[run_id] = buffer
+            return
+
+        self._buffers.pop(run_id, None)
+        self._answer_runs.add(run_id)
+        answer_start = buffer[marker_index + len(self.FINAL_ANSWER_MARKER):].lstrip()
+        if answer_start:
+            self.events.put({"type": "token", "text": answer_start})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._buffers.pop(run_id, None)
+        self._answer_runs.discard(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        tool_name = (serialized or {}).get("name", "tool")
+        self._tool_names[run_id] = tool_name
+        self.events.put({"type": "tool_start", "tool": tool_name, "input": input_str})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.events.put({"type": "tool_end", "tool": self._tool_names.pop(run_id, "tool")})
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.events.put({"type": "tool_error", "tool": self._tool_names.pop(run_id, "tool"), "error": str(error)})
+
+
+def stream_response(user_input: str, agent_id: str = "gaming", mode: str = None):
+    """
+    generate_response'un akış sürümü. Agent arka planda çalışırken
+    olayları üretir:
+      {"type": "tool_start", "tool", "input"} / {"type": "tool_end", "tool"}
+      {"type": "token", "text"} (final cevap token'ları)
+      {"type": "final", "output", "generated_cypher_query", "cached", "mode", "metrics"} (her zaman son olay)
+    """
+    if agent_id not in AGENTS_EXEC:
+        yield {"type": "final", **_agent_not_found_response()}
+        return
+
+    # Script context'i yalnızca Streamlit thread'inde okunabilir
+    session_id = get_session_id()
+    events = queue.Queue()
+
+    def run():
+        with recording_turn() as recorder:
+            callbacks = [StreamingEventHandler(events), InstrumentationHandler(recorder)]
+            result = _respond(agent_id, user_input, session_id, mode, callbacks=callbacks)
+        events.put({"type": "final", **_with_metrics(result, session_id, recorder)})
+
+    threading.Thread(target=run, daemon=True).start()
+
+    while True:
+        event = events.get()
+        yield event
+        if event["type"] == "final":
+            break
+
+
+def _save_cached_turn(session_id, user_input, output):
+    """Önbellekten dönen yanıtı da sohbet geçmişine yazar"""
+    try:
+        memory = get_memory(session_id)
+        memory.add_user_message(user_input)
+        memory.add_ai_message(output)
+    except Exception as e:
+        print(f"Önbellek yanıtı geçmişe yazılamadı: {e}")
+
+
+async def _asave_cached_turn(session_id, user_input, output):
+    try:
+        await get_memory(session_id).aadd_messages([HumanMessage(content=user_input), AIMessage(content=output)])
+    except Exception as e:
+        print(f"Önbellek yanıtı geçmişe yazılamadı: {e}")
+
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+def _warm_up():
+    start = time.perf_counter()
+    # Cypher zinciri grafiği de kurar; kurulamayanlar None döner ve sonra yeniden denenir
+    get_cypher_memo()
+    get_document_retriever()
+    prepare_history_schema()
+    # Eski oturumlar arka planda, politika ile temizlenir
+    start_retention_job()
+    print(f"🔥 Warm-up finished in {time.perf_counter() - start:.1f}s")
+
+def warm_up():
+    """
+    Starts connecting to Neo4j and building the vector store and Cypher chain
+    in a background thread, once per process. The UI doesn't wait for it;
+    a request that arrives earlier builds what it needs itself.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_warm_up, name="aurory-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
+def warm_up_done():
+    """True once the background warm-up has finished (successfully or not)"""
+    return _warm_up_thread is not None and not _warm_up_thread.is_alive()
@@ -0,0 +1,228 @@
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from llm import embeddings
+from graph import get_dataset_version
+from utils import get_setting
+from instrumentation import record_span
+
+
+def normalize_question(question: str) -> str:
+    """Lower-cases a question and collapses punctuation and whitespace"""
+    question = re.sub(r"[^\w\s#]", " ", question.lower())
+    return " ".join(question.split())
+
+
+class SemanticAnswerCache:
+    """
+    Caches agent answers by agent_id, conversation context and the embedding
+    of the normalized question.
+
+    A lookup is a hit when a fresh entry for the same agent and context is at
+    least `threshold` cosine-similar to the question. The context is a
+    fingerprint of the chat history the answer was generated with ("" for
+    the first turn of a session), so a follow-up is never answered from
+    another conversation. Entries expire after `ttl_seconds` (or the ttl
+    given to `store`), the least recently used entry is evicted beyond
+    `max_entries`, and everything is dropped when the dataset version
+    in Neo4j changes.
+    """
+
+    def __init__(self, embedding_model, threshold=0.95, ttl_seconds=3600, max_entries=256,
+                 version_provider=None, version_check_interval=60):
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version_provider = version_provider
+        self.version_check_interval = version_check_interval
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (agent_id, context, normalized question) -> entry
+        self._vectors = OrderedDict()  # normalized question -> unit vector
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def _cached_vector(self, normalized: str):
+        with self._lock:
+            vector = self._vectors.get(normalized)
+            if vector is not None:
+                self._vectors.move_to_end(normalized)
+            return vector
+
+    def _remember_vector(self, normalized: str, raw_vector) -> np.ndarray:
+        vector = np.asarray(raw_vector, dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._vectors[normalized] = vector
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _embed(self, normalized: str) -> np.ndarray:
+        vector = self._cached_vector(normalized)
+        if vector is None:
+            start = time.perf_counter()
+            raw_vector = self.embedding_model.embed_query(normalized)
+            record_span("embedding", "answer_cache", time.perf_counter() - start)
+            vector = self._remember_vector(normalized, raw_vector)
+        return vector
+
+    async def _aembed(self, normalized: str) -> np.ndarray:
+        vector = self._cached_vector(normalized)
+        if vector is None:
+            start = time.perf_counter()
+            raw_vector = await self.embedding_model.aembed_query(normalized)
+            record_span("embedding", "answer_cache", time.perf_counter() - start)
+            vector = self._remember_vector(normalized, raw_vector)
+        return vector
+
+    def _check_dataset_version(self):
+        if self.version_provider is None:
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+
+        version = self.version_provider()
+        if version is not None and version != self._version:
+            if self._version is not None:
+                print(f"♻️ Dataset version changed ({self._version} -> {version}), clearing answer cache")
+                self.invalidate()
+            self._version = version
+
+    def _is_fresh(self, entry, now) -> bool:
+        return now - entry["created_at"] < entry["ttl"]
+
+    def _exact_hit(self, agent_id: str, context: str, normalized: str, now: float):
+        # Birebir aynı soru için embedding çağrısına gerek yok
+        with self._lock:
+            entry = self._entries.get((agent_id, context, normalized))
+            if entry is not None and self._is_fresh(entry, now):
+                self._entries.move_to_end((agent_id, context, normalized))
+                self.hits += 1
+                return dict(entry["response"])
+        return None
+
+    def _nearest_hit(self, agent_id: str, context: str, vector: np.ndarray, now: float):
+        with self._lock:
+            best_key, best_score = None, -1.0
+            for key, entry in list(self._entries.items()):
+                if not self._is_fresh(entry, now):
+                    del self._entries[key]
+                    continue
+                if key[:2] != (agent_id, context):
+                    continue
+                score = float(np.dot(entry["vector"], vector))
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                return dict(self._entries[best_key]["response"])
+
+            self.misses += 1
+            return None
+
+    def _put(self, agent_id: str, context: str, normalized: str, vector: np.ndarray, response: dict, ttl_seconds=None):
+        key = (agent_id, context, normalized)
+        with self._lock:
+            self._entries[key] = {
+                "vector": vector,
+                "response": dict(response),
+                "created_at": time.time(),
+                "ttl": self.ttl_seconds if ttl_seconds is None else ttl_seconds,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, agent_id: str, question: str, context: str = ""):
+        """Returns a cached response for a similar question, or None on a miss"""
+        self._check_dataset_version()
+        normalized = normalize_question(question)
+        now = time.time()
+
+        response = self._exact_hit(agent_id, context, normalized, now)
+        if response is not None:
+            return response
+        try:
+            vector = self._embed(normalized)
+        except Exception as e:
+            print(f"⚠️ Answer cache embedding failed: {e}")
+            self.misses += 1
+            return None
+        return self._nearest_hit(agent_id, context, vector, now)
+
+    async def alookup(self, agent_id: str, question: str, context: str = ""):
+        """Async counterpart of lookup"""
+        await asyncio.to_thread(self._check_dataset_version)
+        normalized = normalize_question(question)
+        now = time.time()
+
+        response = self._exact_hit(agent_id, context, normalized, now)
+        if response is not None:
+            return response
+        try:
+            vector = await self._aembed(normalized)
+        except Exception as e:
+            print(f"⚠️ Answer cache embedding failed: {e}")
+            self.misses += 1
+            return None
+        return self._nearest_hit(agent_id, context, vector, now)
+
+    def store(self, agent_id: str, question: str, response: dict, context: str = "", ttl_seconds=None):
+        """Caches the response for the question asked to the given agent in the given context"""
+        normalized = normalize_question(question)
+        try:
+            vector = self._embed(normalized)
+        except Exception as e:
+            print(f"⚠️ Answer cache embedding failed: {e}")
+            return
+        self._put(agent_id, context, normalized, vector, response, ttl_seconds)
+
+    async def astore(self, agent_id: str, question: str, response: dict, context: str = "", ttl_seconds=None):
+        """Async counterpart of store"""
+        normalized = normalize_question(question)
+        try:
+            vector = await self._aembed(normalized)
+        except Exception as e:
+            print(f"⚠️ Answer cache embedding failed: {e}")
+            return
+        self._put(agent_id, context, normalized, vector, response, ttl_seconds)
+
+    def invalidate(self):
+        """Drops every cached answer"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+# Piyasa verisi (fiyat, hacim) okuyan yanıtlar için daha kısa ömür
+MARKET_ANSWER_TTL_SECONDS = int(get_setting("ANSWER_CACHE_MARKET_TTL_SECONDS", 300))
+
+answer_cache = SemanticAnswerCache(
+    embeddings,
+    threshold=float(get_setting("ANSWER_CACHE_THRESHOLD", 0.95)),
+    ttl_seconds=int(get_setting("ANSWER_CACHE_TTL_SECONDS", 3600)),
+    max_entries=int(get_setting("ANSWER_CACHE_MAX_ENTRIES", 256)),
+    version_provider=get_dataset_version,
+)
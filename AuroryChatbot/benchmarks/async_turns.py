@@ -0,0 +1,166 @@
+"""
+Turns per second of the sync (generate_response) and async (agenerate_response)
+agent paths at different concurrency levels.
+
+The LLM, embeddings, tools and Neo4j are replaced by stubs that only sleep for
+a fixed latency, so the numbers show how well each path overlaps I/O rather
+than how fast OpenAI or Neo4j are. Run from the AuroryChatbot directory:
+
+    python benchmarks/async_turns.py --turns 64 --llm-latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+LATENCY = {"llm": 0.05, "tool": 0.03, "neo4j": 0.005}
+TOOL_OUTPUT = "stub documents"
+
+
+class StubChatModel(BaseChatModel):
+    """Asks for one Documents Search, then answers once it sees the observation"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _reply(self, messages) -> ChatResult:
+        if f"Observation: {TOOL_OUTPUT}" in messages[-1].content:
+            text = "Thought: Do I need to use a tool? No\nFinal Answer: stub answer"
+        else:
+            text = "Thought: Do I need to use a tool? Yes\nAction: Documents Search\nAction Input: stub query"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(LATENCY["llm"])
+        return self._reply(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(LATENCY["llm"])
+        return self._reply(messages)
+
+
+class StubEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        # Farklı sorular için birbirine benzemeyen vektörler
+        return [float((hash(text) >> shift) & 0xFF) for shift in range(0, 64, 8)]
+
+
+class StubDriver:
+    def execute_query(self, query, parameters=None, **kwargs):
+        time.sleep(LATENCY["neo4j"])
+        return [], None, None
+
+
+async def stub_aquery(query, params=None):
+    await asyncio.sleep(LATENCY["neo4j"])
+    return []
+
+
+def stub_get_document(action_input):
+    time.sleep(LATENCY["tool"])
+    return TOOL_OUTPUT
+
+
+async def stub_aget_document(action_input):
+    await asyncio.sleep(LATENCY["tool"])
+    return TOOL_OUTPUT
+
+
+def install_stubs():
+    """Registers stub llm, graph and tool modules before agent.py imports them"""
+    llm_module = types.ModuleType("llm")
+    llm_module.llm = StubChatModel()
+    llm_module.embeddings = StubEmbeddings()
+
+    graph_module = types.ModuleType("graph")
+    stub_graph = types.SimpleNamespace(_driver=StubDriver(), _database="neo4j")
+    graph_module.get_graph = lambda: stub_graph
+    graph_module.get_dataset_version = lambda: None
+    graph_module.aquery = stub_aquery
+
+    vector_module = types.ModuleType("tools.vector")
+    vector_module.get_document = stub_get_document
+    vector_module.aget_document = stub_aget_document
+    vector_module.get_document_retriever = lambda: None
+
+    cypher_module = types.ModuleType("tools.cypher")
+    cypher_module.get_cypher_qa = object
+    cypher_module.get_cypher_memo = lambda: None
+    cypher_module.invoke_cypher_qa = stub_get_document
+    cypher_module.ainvoke_cypher_qa = stub_aget_document
+
+    sys.modules.update({
+        "llm": llm_module,
+        "graph": graph_module,
+        "tools.vector": vector_module,
+        "tools.cypher": cypher_module,
+    })
+
+
+def bench_sync(agent, concurrency, turns):
+    def turn(i):
+        return agent.generate_response(f"sync question {concurrency}-{i}", "gaming", session_id=f"bench-{i}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(turn, range(turns)))
+    return turns / (time.perf_counter() - start)
+
+
+async def bench_async(agent, concurrency, turns):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def turn(i):
+        async with semaphore:
+            return await agent.agenerate_response(f"async question {concurrency}-{i}", "gaming", session_id=f"bench-{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    return turns / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency", type=float, default=LATENCY["llm"])
+    parser.add_argument("--tool-latency", type=float, default=LATENCY["tool"])
+    parser.add_argument("--neo4j-latency", type=float, default=LATENCY["neo4j"])
+    args = parser.parse_args()
+    LATENCY.update(llm=args.llm_latency, tool=args.tool_latency, neo4j=args.neo4j_latency)
+
+    install_stubs()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import agent
+    # Her tur gerçekten agent'ı çalıştırsın
+    agent.answer_cache.threshold = 2.0
+
+    print(f"Stub latencies: {LATENCY}, {args.turns} turns per run\n")
+    print(f"{'concurrency':>11} | {'sync turns/s':>12} | {'async turns/s':>13}")
+    print("-" * 42)
+    for concurrency in args.concurrency:
+        # AgentExecutor'ın verbose çıktısı tabloyu bozmasın
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_rate = bench_sync(agent, concurrency, args.turns)
+            async_rate = asyncio.run(bench_async(agent, concurrency, args.turns))
+        print(f"{concurrency:>11} | {sync_rate:>12.1f} | {async_rate:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
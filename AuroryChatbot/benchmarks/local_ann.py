@@ -0,0 +1,94 @@
+"""
+Search latency of the in-process LocalVectorIndex against the Neo4j vector
+index (db.index.vector.queryNodes), and the local index's recall@k with
+Neo4j's results as the reference.
+
+Stored Document embeddings are used as queries, so no embedding API calls
+are made. Needs the Neo4j connection from .streamlit/secrets.toml; with
+--synthetic only the local index is measured on random vectors. Run from
+the AuroryChatbot directory:
+
+    python benchmarks/local_ann.py --queries 200 --k 4
+    python benchmarks/local_ann.py --synthetic 50000 --dim 1536
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.local_ann import LocalVectorIndex
+
+SAMPLE_QUERIES = "MATCH (d:Document) WHERE d.embedding IS NOT NULL RETURN d.embedding AS embedding LIMIT $limit"
+NEO4J_SEARCH = (
+    "CALL db.index.vector.queryNodes('aurory_docs', $k, $embedding) YIELD node, score "
+    "RETURN elementId(node) AS id, score"
+)
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return f"p50 {np.percentile(samples, 50):7.3f} ms   p95 {np.percentile(samples, 95):7.3f} ms"
+
+
+def timed(fn, queries):
+    samples, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(fn(query))
+        samples.append(time.perf_counter() - start)
+    return samples, results
+
+
+def run_synthetic(documents, dim, queries, k):
+    index = LocalVectorIndex(tempfile.mkdtemp(prefix="local_ann_"))
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(documents, dim)).astype(np.float32)
+    index._save([f"doc-{i}" for i in range(documents)], [0] * documents, index._normalize(vectors), (0, ""))
+    samples, _ = timed(lambda query: index.search(query, k), rng.normal(size=(queries, dim)))
+    print(f"local ({documents} x {dim}): {percentiles(samples)}")
+
+
+def run_against_neo4j(queries, k):
+    from graph import get_graph
+
+    graph = get_graph()
+    if graph is None:
+        sys.exit("❌ Neo4j connection is not available")
+
+    index = LocalVectorIndex(tempfile.mkdtemp(prefix="local_ann_"))
+    start = time.perf_counter()
+    index.sync(graph)
+    print(f"sync: {len(index)} documents in {time.perf_counter() - start:.1f}s")
+
+    sample = [row["embedding"] for row in graph.query(SAMPLE_QUERIES, {"limit": queries})]
+    neo4j_samples, neo4j_results = timed(
+        lambda query: [row["id"] for row in graph.query(NEO4J_SEARCH, {"k": k, "embedding": query})], sample
+    )
+    local_samples, local_results = timed(lambda query: [doc_id for doc_id, _ in index.search(query, k)], sample)
+
+    recall = np.mean([
+        len(set(local) & set(reference)) / max(len(reference), 1)
+        for local, reference in zip(local_results, neo4j_results)
+    ])
+    print(f"neo4j index: {percentiles(neo4j_samples)}")
+    print(f"local index: {percentiles(local_samples)}")
+    print(f"local recall@{k} vs neo4j: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--synthetic", type=int, default=0, help="number of random documents (skips Neo4j)")
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args.synthetic, args.dim, args.queries, args.k)
+    else:
+        run_against_neo4j(args.queries, args.k)
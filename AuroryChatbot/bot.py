@@ -1,55 +1,67 @@
 import streamlit as st
-from agent import generate_response 
+from agent import stream_response, DEFAULT_AGENT_MODE, warm_up, warm_up_done
 import time
 import uuid
 from datetime import datetime, timedelta
-import requests
 from pytz import timezone
-from langchain_neo4j import Neo4jChatMessageHistory
 from langchain_core.messages import AIMessage, HumanMessage
 import os
-from graph import graph 
+from graph import get_graph, get_graph_error
+from memory import Neo4jSessionHistory
+from history import count_sessions, list_sessions, prepare_history_schema
+from retention import purge_sessions
+from neo4j_pool import pool_metrics
+from instrumentation import usage_stats
+from market_data import AURORY_COLLECTIONS, market_data
+from market_history import collection_series, market_history, start_market_sampler
 from utils import write_message 
 from utils import get_session_id 
 
 #for history 
-def get_all_sessions_from_neo4j():
+HISTORY_PAGE_SIZE = 20
+
+def get_sessions_page_from_neo4j(cursor=None):
     """
-    Neo4j'den tüm sohbet oturumlarını ve ilk mesajlarını çeker.
+    Neo4j'den bir sayfa sohbet oturumu çeker (son aktiviteye göre, en yeni önce).
+    (oturumlar, sonraki sayfa imleci) döndürür.
     """
-    if isinstance(graph, str): # graph objesi bağlantı hatası yüzünden string ise
-        st.error(f"Neo4j bağlantı hatası nedeniyle geçmiş yüklenemiyor: {graph}")
-        return []
+    graph = get_graph()
+    if graph is None: # Neo4j'ye bağlanılamadıysa
+        st.error(f"Neo4j bağlantı hatası nedeniyle geçmiş yüklenemiyor: {get_graph_error()}")
+        return [], None
 
-    query = """
-    MATCH (s:Session)
-    RETURN s.id AS sessionId
-    ORDER BY s.id DESC 
-    """
     try:
-        results = graph.query(query)
-        
-        sessions_data = []
-        for record in results:
-            sessions_data.append({
-                "id": record["sessionId"],
-               
-            })
-        return sessions_data
+        prepare_history_schema()
+        return list_sessions(graph, limit=HISTORY_PAGE_SIZE, cursor=cursor)
     except Exception as e:
         st.error(f"Neo4j'den oturumları çekerken hata oluştu: {e}")
-        return []
+        return [], None
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_session_count():
+    """Kenar çubuğundaki oturum sayısı; her rerun'da Neo4j'ye gitmemek için önbellekte"""
+    graph = get_graph()
+    if graph is None:
+        return None
+    try:
+        return count_sessions(graph)
+    except Exception as e:
+        print(f"⚠️ Session count failed: {e}")
+        return None
 
 def get_session_messages_from_neo4j(session_id):
     """
     Belirli bir oturuma ait tüm mesajları Neo4j'den çeker.
     """
-    if isinstance(graph, str): # graph objesi bağlantı hatası yüzünden string ise
-        st.error(f"Neo4j bağlantı hatası nedeniyle mesajlar yüklenemiyor: {graph}")
+    graph = get_graph()
+    if graph is None: # Neo4j'ye bağlanılamadıysa
+        st.error(f"Neo4j bağlantı hatası nedeniyle mesajlar yüklenemiyor: {get_graph_error()}")
         return []
 
-    history_manager = Neo4jChatMessageHistory(session_id=session_id, graph=graph)
-    messages = history_manager.messages # LangChain'in mesaj formatında döner
+    # Neo4jChatMessageHistory silinirken paylaşılan sürücüyü kapatır, bu sınıf kapatmaz
+    history_manager = Neo4jSessionHistory(session_id=session_id, graph=graph)
+    # Geçmiş sayfası pencereli/özetli istem görünümünü değil, tüm mesajları gösterir
+    messages = history_manager.full_messages() # LangChain'in mesaj formatında döner
 
     formatted_messages = []
     for msg in messages:
@@ -61,18 +73,17 @@ def get_session_messages_from_neo4j(session_id):
 
 def delete_session_from_neo4j(session_id):
     """
-    Belirli bir oturumu ve bağlı tüm mesajları Neo4j'den siler.
+    Belirli bir oturumu ve bağlı tüm mesajları Neo4j'den siler
+    (mesaj zinciri parçalı işlemlerle, parametreli sorgu ile).
     """
-    if isinstance(graph, str):
-        st.error(f"Neo4j bağlantı hatası nedeniyle oturum silinemiyor: {graph}")
+    graph = get_graph()
+    if graph is None:
+        st.error(f"Neo4j bağlantı hatası nedeniyle oturum silinemiyor: {get_graph_error()}")
         return False
-    
-    query = f"""
-    MATCH (s:Session {{id: '{session_id}'}})
-    DETACH DELETE s
-    """
+
     try:
-        graph.query(query)
+        purge_sessions(graph, [session_id])
+        get_session_count.clear()
         return True
     except Exception as e:
         st.error(f"Oturumu silerken hata oluştu: {e}")
@@ -392,6 +403,8 @@ def init_session_state():
         st.session_state.system_status = "online"
     if "user_preferences" not in st.session_state:
         st.session_state.user_preferences = {"notifications": True}
+    if "agent_mode" not in st.session_state:
+        st.session_state.agent_mode = DEFAULT_AGENT_MODE
 
 def validate_user_input(user_input: str) -> tuple[bool, str]:
     """Enhanced input validation with comprehensive checks"""
@@ -479,66 +492,54 @@ def handle_submit(message):
     st.session_state.system_status = "processing"
     
     agent_id = AGENTS[st.session_state.selected_agent]["id"]
-    processing_status_placeholder = st.empty()
+    show_details = st.session_state.show_query_details
+
+    # Kullanıcının mesajını yanıt akarken de göster
+    display_message(st.session_state.messages[-1])
+
+    status = st.status(f"🔍 {st.session_state.selected_agent} is analyzing your query...", expanded=show_details)
+    answer_placeholder = st.empty()
 
     try:
         start_time = time.time()
-        
-        with processing_status_placeholder.container():
-            st.markdown(f'<div style="display: flex; align-items: center; gap: 10px; margin-bottom: 10px;">'
-                        f'<div class="loading-spinner"></div>'
-                        f'<span style="font-size: 0.9em; color: #f093fb;">🔍 {st.session_state.selected_agent} is analyzing your query...</span>'
-                        f'</div>', unsafe_allow_html=True)
-            
-            if st.session_state.show_query_details:
-                progress_bar = st.progress(0)
-                
-                processing_status_placeholder.markdown(f'<div style="display: flex; align-items: center; gap: 10px; margin-bottom: 10px;">'
-                                                f'<div class="loading-spinner"></div>'
-                                                f'<span style="font-size: 0.9em; color: #f093fb;">🔍 Parsing query...</span>'
-                                                f'</div>', unsafe_allow_html=True)
-                progress_bar.progress(20)
-                time.sleep(0.3)
-                
-                processing_status_placeholder.markdown(f'<div style="display: flex; align-items: center; gap: 10px; margin-bottom: 10px;">'
-                                                f'<div class="loading-spinner"></div>'
-                                                f'<span style="font-size: 0.9em; color: #f093fb;">🧠 Selecting optimal agent...</span>'
-                                                f'</div>', unsafe_allow_html=True)
-                progress_bar.progress(40)
-                time.sleep(0.3)
-                
-                processing_status_placeholder.markdown(f'<div style="display: flex; align-items: center; gap: 10px; margin-bottom: 10px;">'
-                                                f'<div class="loading-spinner"></div>'
-                                                f'<span style="font-size: 0.9em; color: #f093fb;">📊 Fetching relevant data...</span>'
-                                                f'</div>', unsafe_allow_html=True)
-                progress_bar.progress(60)
-                time.sleep(0.3)
-                
-                processing_status_placeholder.markdown(f'<div style="display: flex; align-items: center; gap: 10px; margin-bottom: 10px;">'
-                                                f'<div class="loading-spinner"></div>'
-                                                f'<span style="font-size: 0.9em; color: #f093fb;">🤖 Generating intelligent response...</span>'
-                                                f'</div>', unsafe_allow_html=True)
-                progress_bar.progress(80)
-                time.sleep(0.3)
-                
-                processing_status_placeholder.markdown(f'<div style="display: flex; align-items: center; gap: 10px; margin-bottom: 10px;">'
-                                                f'<div class="loading-spinner"></div>'
-                                                f'<span style="font-size: 0.9em; color: #f093fb;">✨ Finalizing analysis...</span>'
-                                                f'</div>', unsafe_allow_html=True)
-                progress_bar.progress(100)
-                time.sleep(0.2)
-                
-        response_data = generate_response(message, agent_id=agent_id)
+        response_data = {}
+        streamed_answer = ""
+
+        for event in stream_response(message, agent_id=agent_id, mode=st.session_state.agent_mode):
+            if event["type"] == "tool_start":
+                status.update(label=f"🛠️ Using {event['tool']}...")
+                if show_details:
+                    status.markdown(f"🛠️ **{event['tool']}** ← `{str(event['input'])[:200]}`")
+            elif event["type"] == "tool_end":
+                status.update(label="🤖 Generating response...")
+                if show_details:
+                    status.markdown(f"✅ {event['tool']} finished")
+            elif event["type"] == "tool_error":
+                if show_details:
+                    status.markdown(f"⚠️ {event['tool']} failed: {event['error'][:200]}")
+            elif event["type"] == "token":
+                streamed_answer += event["text"]
+                answer_placeholder.markdown(streamed_answer + "▌")
+            elif event["type"] == "final":
+                response_data = event
+
+        status.update(label="✨ Analysis complete", state="complete", expanded=False)
+
         main_response_content = response_data.get("output", "No response generated.")
         generated_cypher_query = response_data.get("generated_cypher_query", None)
 
         processing_time = time.time() - start_time
+        metrics = response_data.get("metrics") or {}
         
         query_details = {
             'processing_time': f"{processing_time:.2f}s",
-            'tokens_used': f"~{len(message.split()) * 4}",
-            'confidence': "95%",
-            'agent_used': st.session_state.selected_agent
+            'tokens_used': format_token_usage(metrics),
+            'stage_timings': format_stage_timings(metrics.get("stages", {})),
+            'agent_used': st.session_state.selected_agent,
+            'answer_cache': "hit" if response_data.get("cached") else "miss",
+            'cypher_memo': format_cache_events(metrics.get("events", {}), "cypher_memo"),
+            'agent_mode': response_data.get("mode", "N/A"),
+            'metrics': metrics
         }
         
         if processing_time > 2:
@@ -583,7 +584,7 @@ def handle_submit(message):
         append_message_to_session_state('assistant', error_response)
         st.error(f"⚠️ Processing error: {str(e)}")
     finally:
-        processing_status_placeholder.empty()
+        answer_placeholder.empty()
         st.rerun()
 
 def display_integrated_agent_selector():
@@ -679,6 +680,13 @@ def display_enhanced_sidebar():
             value=st.session_state.auto_scroll,
             help="Automatically scroll to latest messages"
         )
+
+        planner_mode = st.checkbox(
+            "Parallel Tool Planner",
+            value=st.session_state.agent_mode == "planner",
+            help="Plan the needed tools up front, run them in parallel and answer in a single step"
+        )
+        st.session_state.agent_mode = "planner" if planner_mode else "react"
         
         st.markdown("---")
         
@@ -686,10 +694,65 @@ def display_enhanced_sidebar():
         st.markdown("### 📊 System Status")
         col1, col2 = st.columns(2)
         with col1:
-            total_sessions = len(get_all_sessions_from_neo4j())
-            st.metric("Sessions", total_sessions)
+            # Bağlantı kurulurken arayüzü bekletme
+            session_count = get_session_count() if warm_up_done() else None
+            st.metric("Sessions", session_count if session_count is not None else "…")
         with col2:
             st.metric("Messages", len(st.session_state.messages))
+
+        if st.session_state.show_query_details:
+            display_usage_stats()
+
+            pool = pool_metrics.snapshot()
+            with st.expander("🔌 Neo4j Connection Pool", expanded=False):
+                if not pool["available"]:
+                    st.caption(f"Pool metrics unavailable ({pool['unavailable_reason']})")
+                st.markdown(f"""
+                • In Use: {pool['in_use']} / {pool['max_pool_size']} ({pool['utilization']:.0%})<br>
+                • Open Connections: {pool['open_connections']} (peak in use: {pool['peak_in_use']})<br>
+                • Acquisitions: {pool['acquisitions']} ({pool['acquire_failures']} failed)<br>
+                • Wait: avg {pool['avg_wait_ms']:.1f} ms, max {pool['max_wait_ms']:.1f} ms
+                """, unsafe_allow_html=True)
+
+STAGE_LABELS = {"llm": "LLM", "tool": "Tools", "retriever": "Retriever", "neo4j": "Neo4j", "embedding": "Embeddings"}
+
+def format_stage_timings(stages):
+    """{"llm": {"count": 2, "ms": 3100.0}, ...} -> "LLM 3.10s (2) · Neo4j 0.12s (3)" """
+    parts = [
+        f"{STAGE_LABELS.get(kind, kind)} {stage['ms'] / 1000:.2f}s ({stage['count']})"
+        for kind, stage in stages.items() if stage["count"]
+    ]
+    return " · ".join(parts) or "N/A"
+
+def format_token_usage(metrics):
+    prompt_tokens = metrics.get("prompt_tokens", 0)
+    completion_tokens = metrics.get("completion_tokens", 0)
+    if not (prompt_tokens or completion_tokens):
+        return "N/A"
+    return f"{prompt_tokens + completion_tokens} ({prompt_tokens} prompt + {completion_tokens} completion)"
+
+def format_cache_events(events, cache_name):
+    hits, misses = events.get(f"{cache_name}_hit", 0), events.get(f"{cache_name}_miss", 0)
+    if not (hits or misses):
+        return "N/A"
+    return f"{hits} hit / {misses} miss"
+
+def display_usage_stats():
+    """Oturum ve süreç bazında gerçek ölçümler"""
+    with st.expander("📈 Usage Stats", expanded=False):
+        for title, stats in (("This session", usage_stats.session(get_session_id())), ("All sessions", usage_stats.process())):
+            events = stats["events"]
+            answer_lookups = events.get("answer_cache_hit", 0) + events.get("answer_cache_miss", 0)
+            hit_rate = events.get("answer_cache_hit", 0) / answer_lookups if answer_lookups else 0.0
+            st.markdown(f"""
+            **{title}**<br>
+            • Turns: {stats['turns']} (avg {stats['avg_turn_ms'] / 1000:.2f}s)<br>
+            • Tokens: {stats['prompt_tokens']} prompt + {stats['completion_tokens']} completion<br>
+            • Stages: {format_stage_timings(stats['stages'])}<br>
+            • Answer Cache Hit Rate: {hit_rate:.0%}<br>
+            • Cypher Memo: {format_cache_events(events, 'cypher_memo')}
+            """, unsafe_allow_html=True)
+
 def display_chat_interface():
     """Main chat interface with enhanced features"""
   
@@ -758,8 +821,11 @@ def display_message(message):
                 <strong>Query Analytics:</strong><br>
                 • Processing Time: {details.get('processing_time', 'N/A')}<br>
                 • Tokens Used: {details.get('tokens_used', 'N/A')}<br>
-                • Confidence: {details.get('confidence', 'N/A')}<br>
-                • Agent: {details.get('agent_used', 'N/A')}
+                • Stages: {details.get('stage_timings', 'N/A')}<br>
+                • Agent: {details.get('agent_used', 'N/A')}<br>
+                • Answer Cache: {details.get('answer_cache', 'N/A')}<br>
+                • Cypher Memo: {details.get('cypher_memo', 'N/A')}<br>
+                • Mode: {details.get('agent_mode', 'N/A')}
             </div>
             """, unsafe_allow_html=True)
         
@@ -768,112 +834,136 @@ def display_message(message):
                 st.code(message['generated_cypher_query'], language='cypher')
 
 # Market page functions
-AURORY_COLLECTIONS = {
-    "Aurorians": "aurory"
-}
-
-@st.cache_data(ttl=300)
-def get_magic_eden_stats_cached(collection_symbol):
-    base_url = f"https://api-mainnet.magiceden.dev/v2/collections/{collection_symbol}"
-    stats = {
-        "collection": collection_symbol,
-        "floor_price_SOL": None,
-        "trade_volume_SOL": None,
-        "listed_count": None,
-        "avg_price_24h": None,
-        "volume_change_24h": None
-    }
-    
-    try:
-        response = requests.get(f"{base_url}/stats", timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            stats.update({
-                "floor_price_SOL": data.get("floorPrice", 0) / 1e9 if data.get("floorPrice") else None,
-                "trade_volume_SOL": data.get("volumeAll", 0) / 1e9 if data.get("volumeAll") else None,
-                "listed_count": data.get("listedCount", 0),
-                "avg_price_24h": data.get("avgPrice24hr", 0) / 1e9 if data.get("avgPrice24hr") else None
-            })
-    except Exception as e:
-        st.error(f"Error fetching Magic Eden data for {collection_symbol}: {str(e)}")
-    
-    return stats
-@st.cache_data(ttl=300)
-def get_sol_price():
-    """Get current SOL price in USD"""
-    try:
-        response = requests.get("https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd", timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("solana", {}).get("usd", 0)
-    except:
-        pass
-    return 0
+TREND_METRICS = {
+    "Floor Price (SOL)": "floor_price_SOL",
+    "Avg Price 24h (SOL)": "avg_price_24h",
+    "Listed Items": "listed_count",
+    "Volume All Time (SOL)": "trade_volume_SOL",
+    "SOL Price (USD)": "sol_price",
+}
+TREND_RANGES = {"24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400, "1y": 365 * 86400}
+
+def format_data_age(entry):
+    if entry["updated_at"] is None:
+        return "not loaded yet"
+    age = int(entry["age_seconds"])
+    return f"{age}s ago" if age < 120 else f"{age // 60} min ago"
+
+def change_24h(series, current, fmt):
+    """Change of a series against its stored value 24h ago, formatted for st.metric (None if unknown)"""
+    previous = market_history.value_at(series, time.time() - 86400)
+    if previous is None or current is None:
+        return None
+    return fmt.format(current - previous) + " (24h)"
+
+def display_market_trends(collection_symbol):
+    """Trend chart of a collection metric, read from the local market history"""
+    st.markdown("#### 📈 Trends")
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        label = st.selectbox("Metric", list(TREND_METRICS.keys()), key=f"trend_metric_{collection_symbol}")
+    with col2:
+        range_label = st.radio("Range", list(TREND_RANGES.keys()), horizontal=True, key=f"trend_range_{collection_symbol}")
+
+    field = TREND_METRICS[label]
+    series = "sol_price" if field == "sol_price" else collection_series(collection_symbol, field)
+    end = time.time()
+    points = market_history.range(series, end - TREND_RANGES[range_label], end)
+    if len(points) < 2:
+        st.caption("Not enough history yet; samples are recorded in the background.")
+        return
+    st.line_chart(
+        {"time": [datetime.fromtimestamp(ts) for ts, _ in points], label: [value for _, value in points]},
+        x="time", y=label
+    )
 
 def display_market_interface():
     """Market analysis interface"""
     st.title("Aurory Market Analysis")
-    
-    # SOL price header
-    sol_price = get_sol_price()
+
+    # Veriler arka planda yenilenir; sayfa ağ isteği beklemez
+    sol_entry = market_data.sol_price()
+    sol_price = sol_entry["value"] or 0
     if sol_price > 0:
-        st.metric("SOL Price (USD)", f"${sol_price:.2f}")
-        st.markdown("---")
-    
+        st.metric("SOL Price (USD)", f"${sol_price:.2f}", delta=change_24h("sol_price", sol_price, "{:+.2f} USD"))
+    if st.button("🔄 Refresh market data", key="refresh_market_data"):
+        market_data.refresh(force=True)
+    st.markdown("---")
+
     # Collection tabs
     tabs = st.tabs(list(AURORY_COLLECTIONS.keys()))
-    
+
     for idx, (collection_name, collection_symbol) in enumerate(AURORY_COLLECTIONS.items()):
         with tabs[idx]:
             st.subheader(f"{collection_name} Collection")
-            
-            with st.spinner(f"Fetching {collection_name} data..."):
-                stats = get_magic_eden_stats_cached(collection_symbol)
-            
-            # Metrics display
+
+            entry = market_data.collection_stats(collection_symbol)
+            stats = entry["value"] or {
+                "collection": collection_symbol,
+                "floor_price_SOL": None,
+                "trade_volume_SOL": None,
+                "listed_count": None,
+                "avg_price_24h": None,
+                "volume_change_24h": None
+            }
+            if entry["value"] is None and entry["error"] is None:
+                st.info(f"Fetching {collection_name} data in the background, refresh the page in a moment.")
+            elif entry["error"]:
+                st.warning(f"Showing last known data ({format_data_age(entry)}): {entry['error']}")
+            else:
+                refreshing = " · refreshing" if entry["refreshing"] else ""
+                st.caption(f"Updated {format_data_age(entry)}{refreshing}")
+
+            # Metrics display; deltas are the change against the stored value 24h ago
             col1, col2, col3, col4 = st.columns(4)
-            
+
             with col1:
                 if stats["floor_price_SOL"]:
-                    floor_usd = stats["floor_price_SOL"] * sol_price if sol_price > 0 else 0
                     st.metric(
-                        "Floor Price", 
+                        "Floor Price",
                         f"{stats['floor_price_SOL']:.2f} SOL",
-                        delta=f"${floor_usd:.2f}" if floor_usd > 0 else None
+                        delta=change_24h(collection_series(collection_symbol, "floor_price_SOL"), stats["floor_price_SOL"], "{:+.2f} SOL")
                     )
                 else:
                     st.metric("Floor Price", "N/A")
-            
+
             with col2:
                 if stats["trade_volume_SOL"]:
-                    volume_usd = stats["trade_volume_SOL"] * sol_price if sol_price > 0 else 0
                     st.metric(
-                        "Volume (All Time)", 
+                        "Volume (All Time)",
                         f"{stats['trade_volume_SOL']:.0f} SOL",
-                        delta=f"${volume_usd:.0f}" if volume_usd > 0 else None
+                        delta=change_24h(collection_series(collection_symbol, "trade_volume_SOL"), stats["trade_volume_SOL"], "{:+.0f} SOL")
                     )
                 else:
                     st.metric("Volume (All Time)", "N/A")
-            
+
             with col3:
                 if stats["listed_count"]:
-                    st.metric("Listed Items", f"{stats['listed_count']:,}")
+                    st.metric(
+                        "Listed Items",
+                        f"{stats['listed_count']:,}",
+                        delta=change_24h(collection_series(collection_symbol, "listed_count"), stats["listed_count"], "{:+,.0f}"),
+                        delta_color="inverse"
+                    )
                 else:
                     st.metric("Listed Items", "N/A")
-            
+
             with col4:
                 if stats["avg_price_24h"]:
-                    avg_usd = stats["avg_price_24h"] * sol_price if sol_price > 0 else 0
                     st.metric(
-                        "Avg Price (24h)", 
+                        "Avg Price (24h)",
                         f"{stats['avg_price_24h']:.2f} SOL",
-                        delta=f"${avg_usd:.2f}" if avg_usd > 0 else None
+                        delta=change_24h(collection_series(collection_symbol, "avg_price_24h"), stats["avg_price_24h"], "{:+.2f} SOL")
                     )
                 else:
                     st.metric("Avg Price (24h)", "N/A")
-            
-        
-            
+
+            if sol_price > 0 and stats["floor_price_SOL"]:
+                st.caption(f"Floor ≈ ${stats['floor_price_SOL'] * sol_price:,.2f} · "
+                           f"All-time volume ≈ ${(stats['trade_volume_SOL'] or 0) * sol_price:,.0f}")
+
+            display_market_trends(collection_symbol)
+
             # Quick actions
             col1, col2, col3 = st.columns(3)
             
@@ -888,15 +978,24 @@ def display_history_interface():
     if "selected_history_session_id" not in st.session_state or st.session_state.selected_history_session_id is None:
         # Tüm oturumları gösterme mantığı
         st.subheader("All Chat Sessions")
-        all_sessions = get_all_sessions_from_neo4j()
+        # Önceki sayfaların imleçleri; ilk sayfanın imleci None
+        if "history_cursors" not in st.session_state:
+            st.session_state.history_cursors = [None]
+        page_sessions, next_cursor = get_sessions_page_from_neo4j(st.session_state.history_cursors[-1])
 
-        if not all_sessions:
+        if not page_sessions and len(st.session_state.history_cursors) == 1:
             st.info("No chat sessions found in the database. Start a conversation in the 'Chat' tab!")
             return
 
-        for session_info in all_sessions:
+        for session_info in page_sessions:
             session_id = session_info["id"]
-            with st.expander(f"**Oturum ID:** `{session_id}`"):
+            last_activity = (
+                datetime.fromtimestamp(session_info["last_activity"] / 1000).strftime("%Y-%m-%d %H:%M")
+                if session_info["last_activity"] else "unknown"
+            )
+            preview = session_info["preview"] or "(no messages)"
+            with st.expander(f"**{preview[:60]}** · {session_info['message_count']} messages · {last_activity}"):
+                st.caption(f"Oturum ID: `{session_id}`")
                 if st.button(f"Bu Oturumu Görüntüle", key=f"view_session_{session_id}"):
                     st.session_state.selected_history_session_id = session_id
                     st.session_state.current_page = "📚 History"
@@ -908,6 +1007,18 @@ def display_history_interface():
                     st.success(f"Oturum `{session_id}` silindi.")
                     st.rerun()
 
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if len(st.session_state.history_cursors) > 1 and st.button("⬅️ Newer", key="history_newer"):
+                st.session_state.history_cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(f"Page {len(st.session_state.history_cursors)}")
+        with col_next:
+            if next_cursor is not None and st.button("Older ➡️", key="history_older"):
+                st.session_state.history_cursors.append(next_cursor)
+                st.rerun()
+
     else: # Belirli bir oturum seçildiğinde bu blok çalışır
         session_id = st.session_state.selected_history_session_id
         st.subheader(f"History for Session ID: `{session_id}`")
@@ -939,6 +1050,11 @@ def main():
     """Main application logic"""
     # init_session_state fonksiyonunu çağırarak oturum durumunu başlat
     init_session_state()
+
+    # Neo4j ve zincirler arka planda hazırlanır (süreç başına bir kez)
+    warm_up()
+    # Piyasa verisi arka planda örneklenir ve yerel geçmişe kaydedilir
+    start_market_sampler(market_data)
     
     # Gelişmiş kenar çubuğunu görüntüle
     # Hata ayıklama için yorum satırı yaptığımız satırı geri açıyoruz
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: süreçler arası kilit yok, süreç içi kilit yeterli
+    fcntl = None
+
+# Bu dosya veri hattı (Data/vector_embedding.py) tarafından da kullanılır; streamlit'e bağımlı olmamalı
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "embeddings")
+
+# Anahtar kaydı: sha256(model, metin) özeti + vektör satır numarası
+KEY_RECORD = struct.Struct("<32sQ")
+
+
+def embedding_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    Append-only, content-addressed store of embeddings for one model.
+
+    Vectors are rows of a float32 file read through a memory map; the keys
+    file holds fixed-size (sha256(model, text), row) records and is loaded
+    into a dict. Appends from other processes are picked up on the next
+    miss, and on POSIX appends are serialized with a file lock, so the
+    chatbot and the data pipeline can share one store.
+    """
+
+    def __init__(self, model: str, path: str = DEFAULT_STORE_PATH):
+        self.model = model
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self._vectors_path = os.path.join(path, f"{slug}.f32")
+        self._keys_path = os.path.join(path, f"{slug}.keys")
+        self._meta_path = os.path.join(path, f"{slug}.json")
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._keys_offset = 0
+        self._matrix = None
+        self.dim = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._read_new_keys()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _read_new_keys(self):
+        """Loads key records appended since the last read (by this or another process)"""
+        if not os.path.exists(self._keys_path):
+            return False
+        size = os.path.getsize(self._keys_path)
+        # Yarım yazılmış son kayıt atlanır
+        size -= size % KEY_RECORD.size
+        if size <= self._keys_offset:
+            return False
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read(size - self._keys_offset)
+        for digest, row in KEY_RECORD.iter_unpack(data):
+            self._rows[digest] = row
+        self._keys_offset = size
+        if self.dim is None and os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        return True
+
+    def _vector(self, row: int) -> List[float]:
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            # Dosya büyüdü: yeniden eşlenir
+            rows = os.path.getsize(self._vectors_path) // (4 * self.dim)
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._matrix[row].tolist()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Stored embeddings of the texts, None where a text has none"""
+        keys = [embedding_key(self.model, text) for text in texts]
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._read_new_keys()
+            return [self._vector(self._rows[key]) if key in self._rows else None for key in keys]
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        with self._lock:
+            self._read_new_keys()
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                key = embedding_key(self.model, text)
+                if key not in self._rows:
+                    pending[key] = vector
+            if not pending:
+                return
+
+            matrix = np.asarray(list(pending.values()), dtype=np.float32)
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match the store ({self.dim})")
+
+            with open(self._vectors_path, "ab") as vectors_file, open(self._keys_path, "ab") as keys_file:
+                if fcntl is not None:
+                    fcntl.flock(vectors_file, fcntl.LOCK_EX)
+                try:
+                    # Satır numaraları dosyanın gerçek boyutundan gelir (başka süreç de yazmış olabilir)
+                    first_row = os.fstat(vectors_file.fileno()).st_size // (4 * self.dim)
+                    # Yarıda kalmış bir yazmanın artığı kesilir; yoksa "ab" yeni satırları
+                    # kaydırılmış bir konuma ekler ve sonraki tüm vektörler bozulur
+                    vectors_file.truncate(first_row * 4 * self.dim)
+                    keys_size = os.fstat(keys_file.fileno()).st_size
+                    keys_file.truncate(keys_size - keys_size % KEY_RECORD.size)
+                    vectors_file.write(matrix.tobytes())
+                    vectors_file.flush()
+                    records = b"".join(
+                        KEY_RECORD.pack(key, first_row + i) for i, key in enumerate(pending)
+                    )
+                    keys_file.write(records)
+                    keys_file.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(vectors_file, fcntl.LOCK_UN)
+            self._read_new_keys()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that are looked up in an EmbeddingStore first; only misses reach the wrapped model."""
+
+    def __init__(self, underlying: Embeddings, store: EmbeddingStore = None, model: str = None):
+        self.underlying = underlying
+        self.model = model or getattr(underlying, "model", None) or type(underlying).__name__
+        if store is None:
+            store = EmbeddingStore(self.model, os.getenv("EMBEDDING_STORE_PATH", DEFAULT_STORE_PATH))
+        self.store = store
+        self.hits = self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.store.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # Aynı metin bir partide birden fazla kez geçebilir; bir kez gömülür
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            embedded = dict(zip(unique, self.underlying.embed_documents(unique)))
+            self.store.put_many(unique, [embedded[text] for text in unique])
+            for i in missing:
+                vectors[i] = embedded[texts[i]]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.store.get_many([text])[0]
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        vector = self.underlying.embed_query(text)
+        self.store.put_many([text], [vector])
+        return vector
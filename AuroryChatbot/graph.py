@@ -1,27 +1,79 @@
+import asyncio
+import weakref
+
 import streamlit as st
 from langchain_neo4j import Neo4jGraph
+from neo4j import AsyncGraphDatabase
+
+from utils import get_setting, lazy_resource, resource_errors
+from neo4j_pool import driver_config, pool_metrics
 
 # Neo4j bağlantı bilgileri st.secrets'tan çekiliyor
 NEO4J_URI = st.secrets["NEO4J_URI"]
 NEO4J_USERNAME = st.secrets["NEO4J_USERNAME"]
 NEO4J_PASSWORD = st.secrets["NEO4J_PASSWORD"]
 
-try:
-    # Neo4j Graph nesnesi oluştur
+GRAPH_RESOURCE = "Neo4j"
+
+@lazy_resource(GRAPH_RESOURCE, retry_seconds=int(get_setting("NEO4J_RETRY_SECONDS", 30)))
+def get_graph():
+    """
+    Returns the shared Neo4jGraph, connecting on first use.
+    Returns None while Neo4j is unreachable (see get_graph_error).
+    """
     graph = Neo4jGraph(
         url=NEO4J_URI,
         username=NEO4J_USERNAME,
-        password=NEO4J_PASSWORD
+        password=NEO4J_PASSWORD,
+        # Şema, schema_snapshot.py tarafından veri sürümü başına bir kez çıkarılır
+        refresh_schema=False,
+        # Vektör deposu ve sohbet geçmişi de bu sürücünün havuzunu kullanır
+        driver_config=driver_config()
     )
-
-    # Bağlantı testi
-    test_result = graph.query("RETURN 1 as test")
+    pool_metrics.instrument(graph._driver)
+    # Neo4jGraph kurulurken bağlantıyı zaten doğrular (verify_connectivity)
     print("✅ Neo4j connection successful")
+    return graph
+
+def get_graph_error():
+    """Returns the last Neo4j connection error, or None"""
+    return resource_errors.get(GRAPH_RESOURCE)
+
+# Veri yükleme betikleri her yüklemede bu düğümün sürümünü günceller
+DATASET_VERSION_QUERY = """
+MATCH (m:DatasetVersion {name: 'aurory'})
+RETURN m.version AS version
+"""
+
+def get_dataset_version():
+    """Returns the version stamp written by the last data load, or None if it is unavailable"""
+    graph = get_graph()
+    if graph is None:
+        return None
+    try:
+        result = graph.query(DATASET_VERSION_QUERY)
+    except Exception as e:
+        print(f"⚠️ Dataset version lookup failed: {e}")
+        return None
+    return result[0]["version"] if result else None
+
+# Async sürücüler event loop'a bağlıdır, bu yüzden her loop için ayrı tutulur
+_async_drivers = weakref.WeakKeyDictionary()
+
+def get_async_driver():
+    """Returns the async Neo4j driver of the running event loop"""
+    loop = asyncio.get_running_loop()
+    driver = _async_drivers.get(loop)
+    if driver is None:
+        driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD), **driver_config())
+        pool_metrics.instrument_async(driver)
+        _async_drivers[loop] = driver
+    return driver
 
-except Exception as e:
-    print(f"❌ Neo4j connection failed: {e}")
-    # Hata durumunda string döndür (bu durumu cypher.py'de yakalıyoruz)
-    graph = f"Connection failed: {str(e)}"
+async def aquery(query, params=None):
+    """Async counterpart of graph.query, returns the records as dictionaries"""
+    records, _, _ = await get_async_driver().execute_query(query, params or {})
+    return [record.data() for record in records]
 
-# Export the graph object
-__all__ = ['graph']
\ No newline at end of file
+# Export the graph accessors
+__all__ = ['get_graph', 'get_graph_error', 'get_dataset_version', 'get_async_driver', 'aquery']
\ No newline at end of file
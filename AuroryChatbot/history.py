@@ -0,0 +1,116 @@
+from graph import get_graph
+from utils import lazy_resource
+
+PREVIEW_LENGTH = 120
+# Henüz hiç aktivitesi olmayan ilk sayfa imleci
+FIRST_PAGE_CURSOR = {"last_activity": 2 ** 62, "id": ""}
+
+SCHEMA_QUERIES = [
+    # Benzersizlik kısıtı Session.id üzerinde bir index de oluşturur
+    "CREATE CONSTRAINT session_id IF NOT EXISTS FOR (s:Session) REQUIRE s.id IS UNIQUE",
+    "CREATE INDEX session_last_activity IF NOT EXISTS FOR (s:Session) ON (s.lastActivity)",
+]
+
+# Özet alanları olmayan (eski) oturumları bir kez doldurur. Mesajlarda zaman damgası olmadığı için
+# gerçek son aktivite bilinmez: lastActivity = 0 (listenin sonunda) ve saklama süresi backfilledAt'ten işler
+BACKFILL_QUERY = """
+MATCH (s:Session) WHERE s.lastActivity IS NULL
+CALL {
+    WITH s
+    OPTIONAL MATCH (s)-[:LAST_MESSAGE]->(last_message:Message)
+    OPTIONAL MATCH p=(last_message)<-[:NEXT*0..]-(first_message:Message)
+    WHERE NOT ()-[:NEXT]->(first_message)
+    WITH s, coalesce(nodes(p), []) AS chain
+    SET s.messageCount = size(chain),
+        s.preview = left(last([m IN chain WHERE m.type = 'human' | m.content]), $preview_length),
+        s.lastActivity = 0,
+        s.backfilledAt = timestamp()
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+# backfilledAt eklenmeden önce doldurulmuş oturumlar
+BACKFILL_TIMESTAMP_QUERY = """
+MATCH (s:Session) WHERE s.lastActivity = 0 AND s.backfilledAt IS NULL
+SET s.backfilledAt = timestamp()
+"""
+
+SESSIONS_PAGE_QUERY = """
+MATCH (s:Session)
+WHERE s.lastActivity <= $last_activity
+  AND NOT (s.lastActivity = $last_activity AND s.id >= $id)
+RETURN s.id AS id, s.lastActivity AS lastActivity, s.messageCount AS messageCount, s.preview AS preview
+ORDER BY s.lastActivity DESC, s.id DESC
+LIMIT $limit
+"""
+
+SESSION_COUNT_QUERY = "MATCH (s:Session) RETURN count(s) AS count"
+
+
+def session_summary_updates(session_var: str = "s") -> str:
+    """
+    SET clause that keeps a Session's summary fields current when a message
+    ($type, $content) is written. Used by the chat history write query.
+    """
+    return (
+        f"SET {session_var}.lastActivity = timestamp(), "
+        f"{session_var}.messageCount = coalesce({session_var}.messageCount, 0) + 1, "
+        f"{session_var}.preview = coalesce({session_var}.preview, "
+        f"CASE WHEN $type = 'human' THEN left($content, {PREVIEW_LENGTH}) END) "
+    )
+
+
+@lazy_resource("History schema")
+def prepare_history_schema():
+    """Creates the Session constraint and index and backfills old sessions, once per process"""
+    graph = get_graph()
+    if graph is None:
+        raise RuntimeError("Neo4j connection is not available")
+
+    for query in SCHEMA_QUERIES:
+        try:
+            graph.query(query)
+        except Exception as e:
+            # Örneğin aynı id'ye sahip eski oturumlar kısıtı engelleyebilir
+            print(f"⚠️ History schema statement failed: {e}")
+
+    # CALL {} IN TRANSACTIONS yalnızca örtük (auto-commit) işlemde çalışır
+    with graph._driver.session(database=graph._database) as session:
+        summary = session.run(BACKFILL_QUERY, {"preview_length": PREVIEW_LENGTH, "batch_size": 500}).consume()
+    if summary.counters.properties_set:
+        print(f"✅ Backfilled session summaries ({summary.counters.properties_set} properties)")
+    graph.query(BACKFILL_TIMESTAMP_QUERY)
+    return True
+
+
+def list_sessions(graph, limit: int = 20, cursor: dict = None):
+    """
+    Returns one page of sessions, most recently active first, and the cursor
+    of the next page (None on the last page). Uses keyset pagination on
+    (lastActivity, id), so every page costs the same however many sessions exist.
+    """
+    cursor = cursor or FIRST_PAGE_CURSOR
+    rows = graph.query(SESSIONS_PAGE_QUERY, {
+        "last_activity": cursor["last_activity"],
+        "id": cursor["id"],
+        "limit": limit + 1,
+    })
+    sessions = [
+        {
+            "id": row["id"],
+            "last_activity": row["lastActivity"],
+            "message_count": row["messageCount"] or 0,
+            "preview": row["preview"],
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = sessions[-1]
+        next_cursor = {"last_activity": last["last_activity"], "id": last["id"]}
+    return sessions, next_cursor
+
+
+def count_sessions(graph) -> int:
+    """Number of sessions (served from Neo4j's count store)"""
+    rows = graph.query(SESSION_COUNT_QUERY)
+    return rows[0]["count"] if rows else 0
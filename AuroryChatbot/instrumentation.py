@@ -0,0 +1,266 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables.config import var_child_runnable_config
+
+# O an yanıtlanan tur; araçlar ve Neo4j çağrıları ölçümlerini buraya yazar
+_current_turn = ContextVar("aurory_current_turn", default=None)
+
+STAGES = ("llm", "tool", "retriever", "neo4j", "embedding")
+
+
+class TurnRecorder:
+    """
+    Collects the timed spans, token counts and cache events of one chat turn.
+
+    Spans nest (an LLM call inside the Cypher tool, a Neo4j query inside the
+    retriever), so each span also gets a self time: its duration minus that
+    of the spans recorded under it. Stage totals add up self times and so
+    never count the same wall time twice.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.spans = []
+        self.events = defaultdict(int)
+        self._parents = {}  # LangChain run_id -> parent run_id (her çalıştırma türü için)
+        self._lock = threading.Lock()
+
+    def add_span(self, kind, name, duration, prompt_tokens=0, completion_tokens=0, error=None,
+                 run_id=None, parent_run_id=None):
+        with self._lock:
+            self.spans.append({
+                "kind": kind,
+                "name": name,
+                "ms": round(duration * 1000, 1),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "error": error,
+                "run_id": run_id,
+                "parent_run_id": parent_run_id,
+            })
+
+    def link_run(self, run_id, parent_run_id):
+        """Remembers a LangChain run's parent, so spans can be attributed to their nearest recorded ancestor"""
+        if parent_run_id is not None:
+            with self._lock:
+                self._parents[run_id] = parent_run_id
+
+    def _with_self_times(self, spans, parents):
+        span_by_run = {span["run_id"]: span for span in spans if span["run_id"] is not None}
+        self_ms = {id(span): span["ms"] for span in spans}
+        for span in spans:
+            parent = span["parent_run_id"]
+            while parent is not None and parent not in span_by_run:
+                parent = parents.get(parent)
+            if parent is not None:
+                self_ms[id(span_by_run[parent])] -= span["ms"]
+        # Paralel alt çalıştırmalar üst aralığı aşabilir; öz süre sıfırın altına inmez
+        return [{**span, "self_ms": round(max(0.0, self_ms[id(span)]), 1)} for span in spans]
+
+    def add_event(self, name, count=1):
+        with self._lock:
+            self.events[name] += count
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+            events = dict(self.events)
+            parents = dict(self._parents)
+        spans = self._with_self_times(spans, parents)
+        end = self.finished_at or time.perf_counter()
+
+        stages = {kind: {"count": 0, "ms": 0.0} for kind in STAGES}
+        for span in spans:
+            stage = stages.setdefault(span["kind"], {"count": 0, "ms": 0.0})
+            stage["count"] += 1
+            stage["ms"] += span["self_ms"]
+        return {
+            "total_ms": round((end - self.started_at) * 1000, 1),
+            "stages": stages,
+            "prompt_tokens": sum(span["prompt_tokens"] for span in spans),
+            "completion_tokens": sum(span["completion_tokens"] for span in spans),
+            "events": events,
+            "spans": spans,
+        }
+
+
+@contextmanager
+def recording_turn():
+    """Makes a new TurnRecorder the current one for the duration of a turn"""
+    recorder = TurnRecorder()
+    token = _current_turn.set(recorder)
+    try:
+        yield recorder
+    finally:
+        recorder.finish()
+        _current_turn.reset(token)
+
+
+def current_turn():
+    return _current_turn.get()
+
+
+def _current_run_id():
+    """Innermost LangChain run the calling code executes in, if any"""
+    config = var_child_runnable_config.get() or {}
+    return getattr(config.get("callbacks"), "parent_run_id", None)
+
+
+def record_span(kind, name, duration, **tokens):
+    """Adds a span to the current turn, if one is being recorded, under the LangChain run it happened in"""
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.add_span(kind, name, duration, parent_run_id=_current_run_id(), **tokens)
+
+
+def record_event(name, count=1):
+    """Counts an event such as a cache hit on the current turn"""
+    recorder = _current_turn.get()
+    if recorder is not None:
+        recorder.add_event(name, count)
+
+
+def _token_usage(response):
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    if prompt_tokens or completion_tokens:
+        return prompt_tokens, completion_tokens
+
+    # Streaming yanıtlarda kullanım bilgisi mesajın usage_metadata alanındadır
+    for generations in response.generations:
+        for generation in generations:
+            usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += usage_metadata.get("input_tokens", 0)
+            completion_tokens += usage_metadata.get("output_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """Times LLM, tool and retriever runs and records their token usage on a TurnRecorder"""
+
+    def __init__(self, recorder: TurnRecorder):
+        self.recorder = recorder
+        self._runs = {}
+
+    def _start(self, run_id, kind, serialized, kwargs, default_name):
+        name = kwargs.get("name") or (serialized or {}).get("name") or default_name
+        self.recorder.link_run(run_id, kwargs.get("parent_run_id"))
+        self._runs[run_id] = (kind, name, time.perf_counter(), kwargs.get("parent_run_id"))
+
+    def _end(self, run_id, error=None, **tokens):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            kind, name, started_at, parent_run_id = run
+            self.recorder.add_span(kind, name, time.perf_counter() - started_at, error=error,
+                                   run_id=run_id, parent_run_id=parent_run_id, **tokens)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        # Zincirler ölçülmez; yalnızca iç içe çalıştırmaların üst zinciri için kaydedilir
+        self.recorder.link_run(run_id, parent_run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm", serialized, kwargs, "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm", serialized, kwargs, "llm")
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt_tokens, completion_tokens = _token_usage(response)
+        self._end(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, "tool", serialized, kwargs, "tool")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retriever", serialized, kwargs, "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=str(error))
+
+
+def _empty_totals():
+    return {
+        "turns": 0,
+        "total_ms": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "stages": {kind: {"count": 0, "ms": 0.0} for kind in STAGES},
+        "events": defaultdict(int),
+    }
+
+
+def _add_turn(totals, summary):
+    totals["turns"] += 1
+    totals["total_ms"] += summary["total_ms"]
+    totals["prompt_tokens"] += summary["prompt_tokens"]
+    totals["completion_tokens"] += summary["completion_tokens"]
+    for kind, stage in summary["stages"].items():
+        total_stage = totals["stages"].setdefault(kind, {"count": 0, "ms": 0.0})
+        total_stage["count"] += stage["count"]
+        total_stage["ms"] += stage["ms"]
+    for name, count in summary["events"].items():
+        totals["events"][name] += count
+
+
+def _view(totals) -> dict:
+    turns = totals["turns"]
+    return {
+        "turns": turns,
+        "avg_turn_ms": totals["total_ms"] / turns if turns else 0.0,
+        "prompt_tokens": totals["prompt_tokens"],
+        "completion_tokens": totals["completion_tokens"],
+        "stages": {kind: dict(stage) for kind, stage in totals["stages"].items()},
+        "events": dict(totals["events"]),
+    }
+
+
+class UsageStats:
+    """Per-session and per-process totals of recorded turns (in memory, per process)"""
+
+    def __init__(self, max_sessions=500):
+        self.max_sessions = max_sessions
+        self._process = _empty_totals()
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, session_id, summary: dict):
+        with self._lock:
+            _add_turn(self._process, summary)
+            totals = self._sessions.pop(session_id, None) or _empty_totals()
+            _add_turn(totals, summary)
+            self._sessions[session_id] = totals
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def session(self, session_id) -> dict:
+        with self._lock:
+            return _view(self._sessions.get(session_id) or _empty_totals())
+
+    def process(self) -> dict:
+        with self._lock:
+            return {**_view(self._process), "sessions": len(self._sessions)}
+
+
+usage_stats = UsageStats()
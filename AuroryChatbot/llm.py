@@ -6,12 +6,24 @@ from langchain_openai import ChatOpenAI
 llm = ChatOpenAI(
     openai_api_key=st.secrets["OPENAI_API_KEY"],
     model=st.secrets["OPENAI_MODEL"],
+    # Final cevap token'larının arayüze akabilmesi için
+    streaming=True,
+    # Streaming yanıtlarda da gerçek token sayıları gelsin
+    stream_usage=True,
 )
 
 # Create the Embedding model
 
 from langchain_openai import OpenAIEmbeddings
+from embedding_store import DEFAULT_STORE_PATH, CachedEmbeddings, EmbeddingStore
+from utils import get_setting
 
-embeddings = OpenAIEmbeddings(
+openai_embeddings = OpenAIEmbeddings(
     openai_api_key=st.secrets["OPENAI_API_KEY"]
-)
\ No newline at end of file
+)
+
+# Aynı metin (sorgu veya belge) bir kez gömülür; veri hattıyla aynı disk deposu paylaşılır
+embeddings = CachedEmbeddings(
+    openai_embeddings,
+    EmbeddingStore(openai_embeddings.model, get_setting("EMBEDDING_STORE_PATH", DEFAULT_STORE_PATH)),
+)
@@ -0,0 +1,201 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import get_setting
+
+AURORY_COLLECTIONS = {
+    "Aurorians": "aurory"
+}
+
+MAGIC_EDEN_URL = "https://api-mainnet.magiceden.dev/v2/collections/{symbol}/stats"
+COINGECKO_SOL_URL = "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd"
+
+MARKET_TTL_SECONDS = int(get_setting("MARKET_TTL_SECONDS", 300))
+# (bağlantı, okuma) zaman aşımı; sayfa beklemediği için yalnızca arka plan işini sınırlar
+HTTP_TIMEOUT = (3, 10)
+
+
+def build_http_session() -> requests.Session:
+    """A pooled HTTP session with one short retry for transient upstream errors"""
+    session = requests.Session()
+    retry = Retry(total=1, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` consecutive failures.
+    After `reset_timeout` seconds one trial call is let through (half-open);
+    its success closes the breaker again, its failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=120):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                if self.opened_at is None:
+                    print(f"⚠️ Circuit breaker opened for {self.name}")
+                self.opened_at = time.monotonic()
+
+
+def fetch_collection_stats(session, symbol):
+    response = session.get(MAGIC_EDEN_URL.format(symbol=symbol), timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    return {
+        "collection": symbol,
+        "floor_price_SOL": data.get("floorPrice", 0) / 1e9 if data.get("floorPrice") else None,
+        "trade_volume_SOL": data.get("volumeAll", 0) / 1e9 if data.get("volumeAll") else None,
+        "listed_count": data.get("listedCount", 0),
+        "avg_price_24h": data.get("avgPrice24hr", 0) / 1e9 if data.get("avgPrice24hr") else None,
+        "volume_change_24h": None,
+    }
+
+
+def fetch_sol_price(session):
+    response = session.get(COINGECKO_SOL_URL, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    return response.json().get("solana", {}).get("usd", 0)
+
+
+class MarketDataService:
+    """
+    Stale-while-revalidate cache for market data.
+
+    Reads never wait for the network: they return the last known value
+    (or None before the first fetch) and, when it is older than
+    `ttl_seconds`, start a background refresh. Refreshes of all keys run
+    concurrently over one pooled HTTP session, and each upstream has its
+    own circuit breaker so a failing API is not called on every refresh.
+    """
+
+    def __init__(self, collections, ttl_seconds=MARKET_TTL_SECONDS, max_workers=4):
+        self.collections = dict(collections)
+        self.ttl_seconds = ttl_seconds
+        self.session = build_http_session()
+        self.breakers = {
+            "magiceden": CircuitBreaker("Magic Eden"),
+            "coingecko": CircuitBreaker("CoinGecko"),
+        }
+        self._entries = {}  # key -> {"value", "updated_at", "error"}
+        self._in_flight = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="market-data")
+
+    def _sources(self):
+        sources = {("sol_price",): ("coingecko", fetch_sol_price, ())}
+        for symbol in self.collections.values():
+            sources[("collection", symbol)] = ("magiceden", fetch_collection_stats, (symbol,))
+        return sources
+
+    def add_listener(self, callback):
+        """callback(key, value, fetched_at) is called after every successful fetch"""
+        self._listeners.append(callback)
+
+    def _refresh(self, key, upstream, fetch, args):
+        breaker = self.breakers[upstream]
+        try:
+            if not breaker.allow():
+                self._set_error(key, f"{breaker.name} is unavailable (circuit open)")
+                return
+            try:
+                value = fetch(self.session, *args)
+            except Exception as e:
+                breaker.record_failure()
+                self._set_error(key, str(e))
+                return
+            breaker.record_success()
+
+            fetched_at = time.time()
+            with self._lock:
+                self._entries[key] = {"value": value, "updated_at": fetched_at, "error": None}
+            for listener in self._listeners:
+                try:
+                    listener(key, value, fetched_at)
+                except Exception as e:
+                    print(f"⚠️ Market data listener failed: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def _set_error(self, key, error):
+        with self._lock:
+            # Eski değer korunur, yalnızca hata bilgisi güncellenir
+            entry = self._entries.setdefault(key, {"value": None, "updated_at": None, "error": None})
+            entry["error"] = error
+
+    def refresh(self, force=False):
+        """Starts background refreshes for every stale (or, with force, every) key"""
+        now = time.time()
+        for key, (upstream, fetch, args) in self._sources().items():
+            with self._lock:
+                entry = self._entries.get(key)
+                fresh = entry is not None and entry["updated_at"] is not None and now - entry["updated_at"] < self.ttl_seconds
+                if key in self._in_flight or (fresh and not force):
+                    continue
+                self._in_flight.add(key)
+            self._executor.submit(self._refresh, key, upstream, fetch, args)
+
+    def _read(self, key):
+        self.refresh()
+        with self._lock:
+            entry = dict(self._entries.get(key) or {"value": None, "updated_at": None, "error": None})
+            entry["refreshing"] = key in self._in_flight
+        entry["age_seconds"] = time.time() - entry["updated_at"] if entry["updated_at"] else None
+        entry["stale"] = entry["age_seconds"] is None or entry["age_seconds"] >= self.ttl_seconds
+        return entry
+
+    def sol_price(self) -> dict:
+        return self._read(("sol_price",))
+
+    def collection_stats(self, symbol) -> dict:
+        return self._read(("collection", symbol))
+
+    def status(self) -> dict:
+        return {breaker.name: breaker.state for breaker in self.breakers.values()}
+
+
+market_data = MarketDataService(AURORY_COLLECTIONS)
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils import get_setting
+
+MARKET_HISTORY_PATH = get_setting(
+    "MARKET_HISTORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_history.sqlite3")
+)
+# Ham örnekler aylık tablolarda tutulur; süresi dolan ay tablo olarak silinir
+RAW_RETENTION_DAYS = int(get_setting("MARKET_RAW_RETENTION_DAYS", 30))
+MARKET_SAMPLE_SECONDS = int(get_setting("MARKET_SAMPLE_SECONDS", 300))
+
+# Koleksiyon istatistiklerinden saklanan alanlar
+COLLECTION_FIELDS = ("floor_price_SOL", "trade_volume_SOL", "listed_count", "avg_price_24h")
+
+ROLLUPS = {"1h": 3600, "1d": 86400}
+# Aralık uzunluğuna göre otomatik çözünürlük: (en uzun aralık, katman)
+AUTO_RESOLUTION = ((2 * 86400, "raw"), (60 * 86400, "1h"))
+
+ROLLUP_UPSERT = """
+INSERT INTO rollup_{name} (series, bucket, count, sum, min, max, last, last_ts)
+VALUES (?, ?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT(series, bucket) DO UPDATE SET
+    count = count + 1,
+    sum = sum + excluded.sum,
+    min = min(min, excluded.min),
+    max = max(max, excluded.max),
+    last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last ELSE last END,
+    last_ts = max(last_ts, excluded.last_ts)
+"""
+
+
+def collection_series(symbol: str, field: str) -> str:
+    return f"{symbol}.{field}"
+
+
+def _month(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y%m")
+
+
+def _months_between(start: float, end: float) -> list:
+    months, current = [], datetime.fromtimestamp(start, tz=timezone.utc).replace(day=1)
+    last = _month(end)
+    while True:
+        month = current.strftime("%Y%m")
+        months.append(month)
+        if month >= last:
+            return months
+        current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+
+
+class MarketHistory:
+    """
+    Append-only time-series store for market snapshots in SQLite.
+
+    Raw samples go to one table per month (raw_YYYYMM, clustered on
+    (series, ts)), so range queries are index range scans and old data is
+    dropped a whole partition at a time. Every append also updates hourly
+    and daily rollups (count, sum, min, max, last) in the same transaction,
+    so long ranges are read from a few hundred rows instead of all samples.
+    """
+
+    def __init__(self, path: str = MARKET_HISTORY_PATH, raw_retention_days: int = RAW_RETENTION_DAYS):
+        self.path = path
+        self.raw_retention_days = raw_retention_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for name in ROLLUPS:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS rollup_{name} ("
+                "series TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, sum REAL NOT NULL, "
+                "min REAL NOT NULL, max REAL NOT NULL, last REAL NOT NULL, last_ts INTEGER NOT NULL, "
+                "PRIMARY KEY (series, bucket)) WITHOUT ROWID"
+            )
+        self._partitions = self._existing_partitions()
+
+    def _existing_partitions(self) -> set:
+        rows = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'raw\\_%' ESCAPE '\\'"
+        ).fetchall()
+        return {name[len("raw_"):] for (name,) in rows}
+
+    def _ensure_partition(self, month: str):
+        if month not in self._partitions:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS raw_{month} ("
+                "series TEXT NOT NULL, ts INTEGER NOT NULL, value REAL NOT NULL, "
+                "PRIMARY KEY (series, ts)) WITHOUT ROWID"
+            )
+            self._partitions.add(month)
+
+    def append(self, values: dict, ts: float = None):
+        """Stores {series: value} sampled at ts (default now); None values are skipped"""
+        ts = int(ts if ts is not None else time.time())
+        rows = [(series, float(value)) for series, value in values.items() if value is not None]
+        if not rows:
+            return
+        month = _month(ts)
+        with self._lock:
+            self._ensure_partition(month)
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO raw_{month} (series, ts, value) VALUES (?, ?, ?)",
+                    [(series, ts, value) for series, value in rows],
+                )
+                for name, seconds in ROLLUPS.items():
+                    bucket = ts - ts % seconds
+                    self._conn.executemany(
+                        ROLLUP_UPSERT.format(name=name),
+                        [(series, bucket, value, value, value, value, ts) for series, value in rows],
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def resolution_for(self, start: float, end: float) -> str:
+        for max_span, resolution in AUTO_RESOLUTION:
+            if end - start <= max_span:
+                return resolution
+        return "1d"
+
+    def range(self, series: str, start: float, end: float = None, resolution: str = "auto") -> list:
+        """
+        Returns [(ts, value), ...] of a series in [start, end], oldest first.
+        Rollup resolutions ("1h", "1d") return the bucket start and average.
+        """
+        end = end if end is not None else time.time()
+        if resolution == "auto":
+            resolution = self.resolution_for(start, end)
+
+        with self._lock:
+            if resolution == "raw":
+                months = [month for month in _months_between(start, end) if month in self._partitions]
+                if not months:
+                    return []
+                query = " UNION ALL ".join(
+                    f"SELECT ts, value FROM raw_{month} WHERE series = ? AND ts BETWEEN ? AND ?" for month in months
+                ) + " ORDER BY ts"
+                params = [param for _ in months for param in (series, int(start), int(end))]
+            elif resolution in ROLLUPS:
+                seconds = ROLLUPS[resolution]
+                query = (
+                    f"SELECT bucket, sum / count FROM rollup_{resolution} "
+                    "WHERE series = ? AND bucket BETWEEN ? AND ? ORDER BY bucket"
+                )
+                params = [series, int(start) - int(start) % seconds, int(end)]
+            else:
+                raise ValueError(f"Unknown resolution: {resolution}")
+            return self._conn.execute(query, params).fetchall()
+
+    def value_at(self, series: str, ts: float, max_age: float = 2 * 3600):
+        """The last value recorded at or before ts (and at most max_age older), or None"""
+        ts = int(ts)
+        with self._lock:
+            # Önce ham veriler (ts'nin ayı ve bir önceki ay), sonra saatlik özetler
+            for month in sorted({_month(ts), _month(ts - max_age)}, reverse=True):
+                if month not in self._partitions:
+                    continue
+                row = self._conn.execute(
+                    f"SELECT ts, value FROM raw_{month} WHERE series = ? AND ts BETWEEN ? AND ? "
+                    "ORDER BY ts DESC LIMIT 1",
+                    (series, ts - max_age, ts),
+                ).fetchone()
+                if row:
+                    return row[1]
+            row = self._conn.execute(
+                "SELECT last FROM rollup_1h WHERE series = ? AND last_ts BETWEEN ? AND ? "
+                "ORDER BY bucket DESC LIMIT 1",
+                (series, ts - max_age, ts),
+            ).fetchone()
+        return row[0] if row else None
+
+    def drop_expired_partitions(self, now: float = None) -> list:
+        """Drops raw partitions whose whole month is older than the retention period"""
+        cutoff = _month((now or time.time()) - self.raw_retention_days * 86400)
+        dropped = []
+        with self._lock:
+            for month in sorted(self._partitions):
+                if month < cutoff:
+                    self._conn.execute(f"DROP TABLE IF EXISTS raw_{month}")
+                    self._partitions.discard(month)
+                    dropped.append(month)
+        return dropped
+
+
+market_history = MarketHistory()
+
+
+def record_market_update(key, value, fetched_at):
+    """market_data listener: stores every successful fetch"""
+    if key == ("sol_price",):
+        market_history.append({"sol_price": value}, fetched_at)
+    elif key[0] == "collection":
+        symbol = key[1]
+        market_history.append(
+            {collection_series(symbol, field): value.get(field) for field in COLLECTION_FIELDS}, fetched_at
+        )
+
+
+_sampler_lock = threading.Lock()
+_sampler_thread = None
+
+def _sampler_loop(market_data):
+    while True:
+        try:
+            # Tüm anahtarlar yenilenir: örnekleme aralığı TTL'ye eşitken yalnız bayat olanları
+            # yenilemek aralığı ~2 katına çıkarırdı. Kayıt dinleyici üzerinden yapılır
+            market_data.refresh(force=True)
+            market_history.drop_expired_partitions()
+        except Exception as e:
+            print(f"⚠️ Market sampling failed: {e}")
+        time.sleep(MARKET_SAMPLE_SECONDS)
+
+def start_market_sampler(market_data):
+    """
+    Records every market data fetch and keeps sampling in the background
+    (every MARKET_SAMPLE_SECONDS), so the history has no gaps while nobody
+    has the Market page open. Once per process.
+    """
+    global _sampler_thread
+    with _sampler_lock:
+        if _sampler_thread is None:
+            market_data.add_listener(record_market_update)
+            if MARKET_SAMPLE_SECONDS > 0:
+                _sampler_thread = threading.Thread(
+                    target=_sampler_loop, args=(market_data,), name="market-sampler", daemon=True
+                )
+                _sampler_thread.start()
+            else:
+                _sampler_thread = False
+    return _sampler_thread
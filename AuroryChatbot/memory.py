@@ -0,0 +1,228 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string, messages_from_dict
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_neo4j import Neo4jChatMessageHistory
+
+from graph import aquery
+from history import session_summary_updates
+from utils import get_setting
+
+MEMORY_WINDOW_TURNS = int(get_setting("MEMORY_WINDOW_TURNS", 3))
+MEMORY_TOKEN_BUDGET = int(get_setting("MEMORY_TOKEN_BUDGET", 1500))
+# Bir özetleme çağrısında en fazla kaç eski mesaj işlenir
+SUMMARY_BATCH_MESSAGES = int(get_setting("MEMORY_SUMMARY_BATCH", 20))
+
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a conversation with the Aurory Economic Strategy Assistant.\n"
+     "Extend the current summary with the new lines. Keep facts, numbers, tokens, proposals and the user's goals; "
+     "drop small talk. Reply with the new summary only, in at most 150 words."),
+    ("human", "Current summary:\n{summary}\n\nNew lines:\n{new_lines}"),
+])
+
+# Özetler kullanıcıyı bekletmeden arka planda güncellenir
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+_summarizing_sessions = set()
+_summarizing_lock = threading.Lock()
+
+
+def build_summarizer(llm):
+    """Returns a chain that folds evicted messages into the running summary"""
+    return summary_prompt | llm | StrOutputParser()
+
+
+def estimate_tokens(text: str) -> int:
+    # Yaklaşık değer: İngilizce metinde ~4 karakter bir token
+    return len(text) // 4 + 4
+
+
+class Neo4jSessionHistory(Neo4jChatMessageHistory):
+    """
+    Neo4jChatMessageHistory that shares the app's graph driver and has
+    native async reads and writes.
+
+    Reads return at most the last `window` turns, trimmed to `max_tokens`,
+    preceded by a SystemMessage with the running summary of everything
+    older. With a summarizer, messages that leave the window are folded
+    into `summary` on the Session node in the background, so the prompt
+    size stays constant however long the session gets. `full_messages`
+    reads the whole stored chain, for the history viewer.
+
+    Unlike the base class it creates the Session node with the first
+    message instead of in the constructor, and it never closes the
+    shared driver when it is garbage collected.
+    """
+
+    def __init__(self, session_id, graph, window: int = MEMORY_WINDOW_TURNS, node_label: str = "Session",
+                 max_tokens: int = MEMORY_TOKEN_BUDGET, summarizer=None):
+        if not session_id:
+            raise ValueError("Please ensure that the session_id parameter is provided")
+        self._driver = graph._driver
+        self._database = graph._database
+        self._session_id = session_id
+        self._node_label = node_label
+        self._window = window
+        self._max_tokens = max_tokens
+        self._summarizer = summarizer
+
+    def _messages_query(self) -> str:
+        return (
+            f"MATCH (s:`{self._node_label}`) WHERE s.id = $session_id "
+            "OPTIONAL MATCH (s)-[:LAST_MESSAGE]->(last_message) "
+            f"OPTIONAL MATCH p=(last_message)<-[:NEXT*0..{max(self._window * 2 - 1, 0)}]-() "
+            "WITH s, p ORDER BY length(p) DESC LIMIT 1 "
+            "RETURN s.summary AS summary, "
+            "[node IN reverse(nodes(p)) | {data:{content: node.content}, type:node.type}] AS messages"
+        )
+
+    def _full_messages_query(self) -> str:
+        # Geçmiş görüntüleyici için tüm zincir: pencere, özet ve token bütçesi yok
+        return (
+            f"MATCH (s:`{self._node_label}`)-[:LAST_MESSAGE]->(last_message) WHERE s.id = $session_id "
+            "MATCH p=(last_message)<-[:NEXT*0..]-(first_message) WHERE NOT ()-[:NEXT]->(first_message) "
+            "RETURN [node IN reverse(nodes(p)) | {data:{content: node.content}, type:node.type}] AS messages"
+        )
+
+    def _add_message_query(self) -> str:
+        return (
+            f"MERGE (s:`{self._node_label}` {{id: $session_id}}) "
+            # Geçmiş listesi için son aktivite, mesaj sayısı ve önizleme
+            + session_summary_updates("s") +
+            "WITH s OPTIONAL MATCH (s)-[lm:LAST_MESSAGE]->(last_message) "
+            "CREATE (s)-[:LAST_MESSAGE]->(new:Message) "
+            "SET new += {type:$type, content:$content} "
+            "WITH new, lm, last_message WHERE last_message IS NOT NULL "
+            "CREATE (last_message)-[:NEXT]->(new) "
+            "DELETE lm"
+        )
+
+    def _evicted_messages_query(self) -> str:
+        # Pencerenin dışındaki, henüz özete katılmamış en eski $limit mesaj (eskiden yeniye);
+        # eski/uzun oturumlarda pencereden çok geride kalmış mesajlar da dahil
+        return (
+            f"MATCH (s:`{self._node_label}`)-[:LAST_MESSAGE]->(last_message) WHERE s.id = $session_id "
+            f"MATCH p=(last_message)<-[:NEXT*{self._window * 2}..]-(m) "
+            "WHERE coalesce(m.summarized, false) = false "
+            "WITH s, m, length(p) AS distance ORDER BY distance DESC LIMIT $limit "
+            "RETURN elementId(m) AS id, m.type AS type, m.content AS content, s.summary AS summary "
+            "ORDER BY distance DESC"
+        )
+
+    def _store_summary_query(self) -> str:
+        return (
+            f"MATCH (s:`{self._node_label}`) WHERE s.id = $session_id "
+            "SET s.summary = $summary "
+            "WITH s UNWIND $message_ids AS message_id "
+            "MATCH (m:Message) WHERE elementId(m) = message_id "
+            "SET m.summarized = true"
+        )
+
+    def _message_params(self, message: BaseMessage) -> dict:
+        return {"type": message.type, "content": message.content, "session_id": self._session_id}
+
+    def _to_messages(self, records) -> List[BaseMessage]:
+        if not records:
+            return []
+        summary = records[0]["summary"]
+        messages = messages_from_dict(records[0]["messages"] or [])
+
+        budget = self._max_tokens - (estimate_tokens(summary) if summary else 0)
+        used = sum(estimate_tokens(message.content) for message in messages)
+        # Bütçe aşılırsa en eski mesajlar düşer; son soru-cevap çifti her zaman kalır
+        while len(messages) > 2 and used > budget:
+            used -= estimate_tokens(messages.pop(0).content)
+        if messages and messages[0].type == "ai" and len(messages) > 1:
+            messages.pop(0)
+
+        if summary:
+            messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return messages
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        records, _, _ = self._driver.execute_query(
+            self._messages_query(), {"session_id": self._session_id}, database_=self._database
+        )
+        return self._to_messages(records)
+
+    def full_messages(self) -> List[BaseMessage]:
+        """Every stored message of the session, oldest first (for the history viewer, not for prompts)"""
+        records, _, _ = self._driver.execute_query(
+            self._full_messages_query(), {"session_id": self._session_id}, database_=self._database
+        )
+        return messages_from_dict(records[0]["messages"]) if records else []
+
+    @messages.setter
+    def messages(self, messages: List[BaseMessage]) -> None:
+        raise NotImplementedError("Use add_messages instead.")
+
+    def add_message(self, message: BaseMessage) -> None:
+        self._driver.execute_query(
+            self._add_message_query(), self._message_params(message), database_=self._database
+        )
+        if message.type == "ai":
+            self._schedule_summary()
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        return self._to_messages(await aquery(self._messages_query(), {"session_id": self._session_id}))
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        # Mesaj zinciri sıralı olmalı, bu yüzden tek tek yazılır
+        for message in messages:
+            await aquery(self._add_message_query(), self._message_params(message))
+        if any(message.type == "ai" for message in messages):
+            self._schedule_summary()
+
+    def _schedule_summary(self):
+        if self._summarizer is None:
+            return
+        with _summarizing_lock:
+            # Aynı oturum için aynı anda tek özetleme
+            if self._session_id in _summarizing_sessions:
+                return
+            _summarizing_sessions.add(self._session_id)
+        _summary_executor.submit(self._summarize_evicted)
+
+    def _summarize_evicted(self):
+        try:
+            # Birikmiş mesajlar SUMMARY_BATCH_MESSAGES'lık partiler halinde, eskiden yeniye katlanır
+            folded = set()
+            while True:
+                records, _, _ = self._driver.execute_query(
+                    self._evicted_messages_query(),
+                    {"session_id": self._session_id, "limit": SUMMARY_BATCH_MESSAGES},
+                    database_=self._database,
+                )
+                # İşaretlenemeyen mesajlar tekrar gelirse döngü kırılır
+                if not records or records[0]["id"] in folded:
+                    return
+                folded.update(record["id"] for record in records)
+
+                evicted = messages_from_dict([
+                    {"type": record["type"], "data": {"content": record["content"]}} for record in records
+                ])
+                summary = self._summarizer.invoke({
+                    "summary": records[0]["summary"] or "(empty)",
+                    "new_lines": get_buffer_string(evicted),
+                })
+                self._driver.execute_query(
+                    self._store_summary_query(),
+                    {"session_id": self._session_id, "summary": summary,
+                     "message_ids": [record["id"] for record in records]},
+                    database_=self._database,
+                )
+                if len(records) < SUMMARY_BATCH_MESSAGES:
+                    return
+        except Exception as e:
+            print(f"⚠️ Chat history summary failed for {self._session_id}: {e}")
+        finally:
+            with _summarizing_lock:
+                _summarizing_sessions.discard(self._session_id)
+
+    def __del__(self) -> None:
+        # Sürücü uygulama genelinde paylaşılıyor, burada kapatılmamalı
+        pass
@@ -0,0 +1,175 @@
+import functools
+import threading
+import time
+import weakref
+
+import neo4j
+
+from instrumentation import record_span
+from utils import get_setting
+
+
+def driver_config() -> dict:
+    """Connection pool settings shared by every Neo4j driver the app creates"""
+    return {
+        "max_connection_pool_size": int(get_setting("NEO4J_MAX_POOL_SIZE", 50)),
+        "connection_acquisition_timeout": float(get_setting("NEO4J_ACQUISITION_TIMEOUT", 30)),
+        "max_connection_lifetime": float(get_setting("NEO4J_MAX_CONNECTION_LIFETIME", 3600)),
+    }
+
+
+# Sürücü havuz ölçümü için herkese açık bir API sunmuyor; aşağıdaki özel öznitelikler
+# requirements.txt'teki sürümle (neo4j==5.27.0) denendi
+TESTED_DRIVER_VERSION = "5.27.0"
+_POOL_ATTRIBUTES = ("acquire", "release", "connections", "pool_config")
+
+
+def _pool_of(driver):
+    """The driver's connection pool, or None if its private API is not the tested one (metrics are optional)"""
+    pool = getattr(driver, "_pool", None)
+    missing = [name for name in _POOL_ATTRIBUTES if not hasattr(pool, name)] if pool is not None else ["_pool"]
+    if missing or not hasattr(pool.pool_config, "max_connection_pool_size"):
+        print(
+            f"⚠️ Neo4j pool metrics disabled: private driver attributes ({', '.join(missing) or 'pool_config'}) "
+            f"are missing in neo4j {neo4j.__version__} (tested with {TESTED_DRIVER_VERSION})"
+        )
+        return None
+    if neo4j.__version__ != TESTED_DRIVER_VERSION:
+        print(f"⚠️ Neo4j pool metrics were tested with neo4j {TESTED_DRIVER_VERSION}, running {neo4j.__version__}")
+    return pool
+
+
+class PoolMetrics:
+    """
+    Counts connection acquisitions of instrumented drivers and how long
+    callers waited for a connection. How long a connection was held is
+    recorded as a "neo4j" span of the current turn (see instrumentation).
+    The pool itself is read at snapshot time for its size and the
+    connections currently in use.
+
+    The driver also releases connections it acquired internally (routing
+    table fetches), so only releases of connections counted by our acquire
+    change the counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._drivers = weakref.WeakSet()
+        self.acquisitions = 0
+        self.acquire_failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.peak_in_use = 0
+        self._held_since = {}  # id(connection) -> acquire time, for connections acquired through the wrapper
+        self.unavailable = None  # ölçülemeyen bir sürücü varsa nedeni
+
+    def _acquired(self, connection, wait: float):
+        with self._lock:
+            self._held_since[id(connection)] = time.perf_counter()
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.peak_in_use = max(self.peak_in_use, len(self._held_since))
+
+    def _failed(self, wait: float):
+        with self._lock:
+            self.acquire_failures += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def _released(self, connections):
+        now = time.perf_counter()
+        with self._lock:
+            held_since = [self._held_since.pop(id(connection), None) for connection in connections]
+        # Bağlantının tutulduğu süre, sorgunun (veya işlemin) süresidir
+        for started_at in held_since:
+            if started_at is not None:
+                record_span("neo4j", "query", now - started_at)
+
+    def instrument(self, driver):
+        """Wraps acquire/release of a sync driver's pool; leaves the driver as is if the pool can't be wrapped"""
+        pool = _pool_of(driver)
+        if pool is None:
+            self.unavailable = f"unsupported neo4j driver {neo4j.__version__}"
+            return driver
+        acquire, release = pool.acquire, pool.release
+
+        @functools.wraps(acquire)
+        def timed_acquire(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                connection = acquire(*args, **kwargs)
+            except Exception:
+                self._failed(time.perf_counter() - start)
+                raise
+            self._acquired(connection, time.perf_counter() - start)
+            return connection
+
+        @functools.wraps(release)
+        def counted_release(*connections):
+            self._released(connections)
+            return release(*connections)
+
+        pool.acquire, pool.release = timed_acquire, counted_release
+        self._drivers.add(driver)
+        return driver
+
+    def instrument_async(self, driver):
+        """Async counterpart of instrument (the async pool's methods are coroutines)"""
+        pool = _pool_of(driver)
+        if pool is None:
+            self.unavailable = f"unsupported neo4j driver {neo4j.__version__}"
+            return driver
+        acquire, release = pool.acquire, pool.release
+
+        @functools.wraps(acquire)
+        async def timed_acquire(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                connection = await acquire(*args, **kwargs)
+            except Exception:
+                self._failed(time.perf_counter() - start)
+                raise
+            self._acquired(connection, time.perf_counter() - start)
+            return connection
+
+        @functools.wraps(release)
+        async def counted_release(*connections):
+            self._released(connections)
+            return await release(*connections)
+
+        pool.acquire, pool.release = timed_acquire, counted_release
+        self._drivers.add(driver)
+        return driver
+
+    def snapshot(self) -> dict:
+        """Pool size, utilization and acquisition wait times over all instrumented drivers"""
+        open_connections = busy_connections = max_size = 0
+        for driver in list(self._drivers):
+            pool = driver._pool
+            max_size += pool.pool_config.max_connection_pool_size
+            # Sürücünün kendi kilidine girmeden anlık görüntü almak yeterli
+            for connections in list(pool.connections.values()):
+                connections = list(connections)
+                open_connections += len(connections)
+                busy_connections += sum(1 for connection in connections if connection.in_use)
+
+        with self._lock:
+            attempts = self.acquisitions + self.acquire_failures
+            return {
+                "available": self.unavailable is None,
+                "unavailable_reason": self.unavailable,
+                "drivers": len(self._drivers),
+                "max_pool_size": max_size,
+                "open_connections": open_connections,
+                "in_use": busy_connections,
+                "utilization": busy_connections / max_size if max_size else 0.0,
+                "peak_in_use": self.peak_in_use,
+                "acquisitions": self.acquisitions,
+                "acquire_failures": self.acquire_failures,
+                "avg_wait_ms": 1000 * self.total_wait / attempts if attempts else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+            }
+
+
+pool_metrics = PoolMetrics()
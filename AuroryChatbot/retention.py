@@ -0,0 +1,203 @@
+import threading
+import time
+
+from graph import get_graph
+from utils import get_setting
+
+RETENTION_MAX_AGE_DAYS = float(get_setting("RETENTION_MAX_AGE_DAYS", 90))
+RETENTION_MAX_SESSIONS = int(get_setting("RETENTION_MAX_SESSIONS", 5000))
+RETENTION_MAX_MESSAGES = int(get_setting("RETENTION_MAX_MESSAGES_PER_SESSION", 500))
+RETENTION_INTERVAL_SECONDS = int(get_setting("RETENTION_INTERVAL_SECONDS", 3600))
+DELETE_BATCH_SIZE = int(get_setting("RETENTION_DELETE_BATCH_SIZE", 1000))
+SESSION_BATCH_SIZE = 100
+
+# Mesaj id'leri önce toplanır (collect eager'dır), sonra parçalar halinde silinir
+PURGE_SESSION_MESSAGES_QUERY = """
+UNWIND $session_ids AS session_id
+MATCH (:Session {id: session_id})-[:LAST_MESSAGE]->(last_message:Message)
+MATCH (last_message)<-[:NEXT*0..]-(m:Message)
+WITH collect(elementId(m)) AS message_ids
+UNWIND message_ids AS message_id
+CALL {
+    WITH message_id
+    MATCH (m:Message) WHERE elementId(m) = message_id
+    DETACH DELETE m
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+DELETE_SESSIONS_QUERY = """
+UNWIND $session_ids AS session_id
+MATCH (s:Session {id: session_id})
+DETACH DELETE s
+"""
+
+# Son aktivitesi bilinmeyen eski oturumlar (lastActivity = 0) doldurulma anından itibaren yaşlanır
+EXPIRED_SESSIONS_QUERY = """
+MATCH (s:Session)
+WHERE 0 < s.lastActivity < $cutoff
+   OR (s.lastActivity = 0 AND s.backfilledAt < $cutoff)
+RETURN s.id AS id
+ORDER BY s.lastActivity
+LIMIT $limit
+"""
+
+EXCESS_SESSIONS_QUERY = """
+MATCH (s:Session)
+WHERE s.lastActivity IS NOT NULL
+WITH s ORDER BY s.lastActivity DESC, s.id DESC
+SKIP $max_sessions LIMIT $limit
+RETURN s.id AS id
+"""
+
+# id sırasıyla sayfalanır: henüz özetlenmemiş mesajları olan bir oturum kısaltılamayabilir
+LONG_SESSIONS_QUERY = """
+MATCH (s:Session)
+WHERE s.messageCount > $max_messages AND s.id > $after
+RETURN s.id AS id
+ORDER BY s.id
+LIMIT $limit
+"""
+
+# Oturumu silinmiş (baseline'daki DETACH DELETE gibi) mesaj zincirleri
+ORPHAN_MESSAGES_QUERY = """
+MATCH (tail:Message)
+WHERE NOT (tail)-[:NEXT]->() AND NOT ()-[:LAST_MESSAGE]->(tail)
+MATCH (tail)<-[:NEXT*0..]-(m:Message)
+WITH collect(elementId(m)) AS message_ids
+UNWIND message_ids AS message_id
+CALL {
+    WITH message_id
+    MATCH (m:Message) WHERE elementId(m) = message_id
+    DETACH DELETE m
+} IN TRANSACTIONS OF $batch_size ROWS
+"""
+
+
+def _trim_session_query(keep: int) -> str:
+    # En yeni `keep` mesajdan eski olanların yalnızca özete katılmış (summarized) en eski kesintisiz
+    # kısmı silinir; özetlenmemiş ilk mesajda durulur, böylece hem bağlam kaybolmaz hem zincir kopmaz
+    return f"""
+    MATCH (s:Session {{id: $session_id}})-[:LAST_MESSAGE]->(last_message:Message)
+    MATCH (last_message)<-[:NEXT*{keep}]-(newest_candidate:Message)
+    MATCH p=(newest_candidate)<-[:NEXT*0..]-(first_message:Message)
+    WHERE NOT ()-[:NEXT]->(first_message)
+    WITH reverse(nodes(p)) AS chain
+    WITH chain, [i IN range(0, size(chain) - 1) WHERE coalesce(chain[i].summarized, false) = false] AS unsummarized
+    WITH CASE WHEN size(unsummarized) = 0 THEN chain ELSE chain[0..unsummarized[0]] END AS dropped
+    UNWIND dropped AS m
+    WITH collect(elementId(m)) AS message_ids
+    UNWIND message_ids AS message_id
+    CALL {{
+        WITH message_id
+        MATCH (m:Message) WHERE elementId(m) = message_id
+        DETACH DELETE m
+    }} IN TRANSACTIONS OF $batch_size ROWS
+    """
+
+
+def _run_in_batches(graph, query: str, params: dict) -> int:
+    """Runs a CALL {} IN TRANSACTIONS query (auto-commit only) and returns the deleted node count"""
+    with graph._driver.session(database=graph._database) as session:
+        summary = session.run(query, {**params, "batch_size": DELETE_BATCH_SIZE}).consume()
+    return summary.counters.nodes_deleted
+
+
+def _session_ids(graph, query: str, params: dict) -> list:
+    return [row["id"] for row in graph.query(query, {**params, "limit": SESSION_BATCH_SIZE})]
+
+
+def purge_sessions(graph, session_ids: list) -> int:
+    """Deletes the sessions and their whole message chains; returns the deleted node count"""
+    if not session_ids:
+        return 0
+    deleted = _run_in_batches(graph, PURGE_SESSION_MESSAGES_QUERY, {"session_ids": session_ids})
+    graph.query(DELETE_SESSIONS_QUERY, {"session_ids": session_ids})
+    return deleted + len(session_ids)
+
+
+def trim_session(graph, session_id: str, keep: int = RETENTION_MAX_MESSAGES) -> int:
+    """
+    Deletes the oldest messages of a session beyond the newest `keep`, as far
+    as they are already folded into the session summary
+    """
+    deleted = _run_in_batches(graph, _trim_session_query(int(keep)), {"session_id": session_id})
+    if deleted:
+        graph.query(
+            "MATCH (s:Session {id: $session_id}) SET s.messageCount = s.messageCount - $deleted",
+            {"session_id": session_id, "deleted": deleted},
+        )
+    return deleted
+
+
+def purge_orphan_messages(graph) -> int:
+    """Deletes message chains whose Session node no longer exists"""
+    return _run_in_batches(graph, ORPHAN_MESSAGES_QUERY, {})
+
+
+def run_retention(graph) -> dict:
+    """
+    Applies the retention policy once: sessions idle for longer than
+    RETENTION_MAX_AGE_DAYS, sessions beyond the newest RETENTION_MAX_SESSIONS,
+    summarized messages beyond the newest RETENTION_MAX_MESSAGES_PER_SESSION of
+    a session, and orphaned messages are deleted in batched transactions.
+    """
+    result = {"expired_sessions": 0, "excess_sessions": 0, "trimmed_sessions": 0, "orphan_messages": 0}
+    cutoff = int((time.time() - RETENTION_MAX_AGE_DAYS * 86400) * 1000)
+
+    for key, query, params in (
+        ("expired_sessions", EXPIRED_SESSIONS_QUERY, {"cutoff": cutoff}),
+        ("excess_sessions", EXCESS_SESSIONS_QUERY, {"max_sessions": RETENTION_MAX_SESSIONS}),
+    ):
+        while True:
+            session_ids = _session_ids(graph, query, params)
+            if not session_ids:
+                break
+            purge_sessions(graph, session_ids)
+            result[key] += len(session_ids)
+
+    after = ""
+    while True:
+        session_ids = _session_ids(graph, LONG_SESSIONS_QUERY, {"max_messages": RETENTION_MAX_MESSAGES, "after": after})
+        if not session_ids:
+            break
+        for session_id in session_ids:
+            if trim_session(graph, session_id):
+                result["trimmed_sessions"] += 1
+        after = session_ids[-1]
+
+    result["orphan_messages"] = purge_orphan_messages(graph)
+    return result
+
+
+_retention_lock = threading.Lock()
+_retention_thread = None
+
+def _retention_loop():
+    while True:
+        graph = get_graph()
+        if graph is not None:
+            try:
+                result = run_retention(graph)
+                if any(result.values()):
+                    print(f"🧹 Chat history retention: {result}")
+            except Exception as e:
+                print(f"⚠️ Chat history retention failed: {e}")
+        time.sleep(RETENTION_INTERVAL_SECONDS)
+
+def start_retention_job():
+    """Starts the background retention loop, once per process"""
+    global _retention_thread
+    with _retention_lock:
+        if _retention_thread is None and RETENTION_INTERVAL_SECONDS > 0:
+            _retention_thread = threading.Thread(target=_retention_loop, name="history-retention", daemon=True)
+            _retention_thread.start()
+    return _retention_thread
+
+
+if __name__ == "__main__":
+    # Kullanım: python retention.py  (politikayı bir kez uygular)
+    graph = get_graph()
+    if graph is None:
+        print("❌ Neo4j connection is not available")
+    else:
+        print(run_retention(graph))
@@ -0,0 +1,97 @@
+import json
+import os
+import re
+import sys
+import time
+
+from utils import get_setting
+
+SNAPSHOT_DIR = os.path.join(get_setting("CACHE_DIR", ".cache"), "schema")
+
+
+def _snapshot_path(version: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, re.sub(r"[^\w.-]", "_", version) + ".json")
+
+
+def resolve_dataset_version(default: str = "unversioned") -> str:
+    """
+    Returns the dataset version the snapshot is keyed by: DATASET_VERSION from
+    secrets if set, otherwise the version stamped in Neo4j by the last data load
+    (default when the lookup fails)
+    """
+    version = get_setting("DATASET_VERSION")
+    if version:
+        return str(version)
+    from graph import get_dataset_version
+    return get_dataset_version() or default
+
+
+def save_schema_snapshot(graph, version: str) -> dict:
+    """Introspects the graph schema once and stores it for the given dataset version"""
+    graph.refresh_schema()
+    snapshot = {
+        "version": version,
+        "created_at": time.time(),
+        "schema": graph.schema,
+        "structured_schema": graph.structured_schema,
+    }
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, default=str)
+    os.replace(tmp_path, path)
+    print(f"✅ Schema snapshot saved for dataset version {version}")
+    return snapshot
+
+
+def load_schema_snapshot(graph, version: str) -> dict:
+    """
+    Applies the stored schema for the dataset version to the graph object.
+    The database is only introspected when no snapshot exists for that version.
+    """
+    path = _snapshot_path(version)
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        print(f"✅ Schema snapshot loaded for dataset version {version}")
+    except (FileNotFoundError, json.JSONDecodeError):
+        snapshot = save_schema_snapshot(graph, version)
+
+    graph.schema = snapshot["schema"]
+    graph.structured_schema = snapshot["structured_schema"]
+    return snapshot
+
+
+def invalidate_schema_snapshot(version: str = None):
+    """Deletes the snapshot of one dataset version, or all snapshots when no version is given"""
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return
+    if version is not None:
+        paths = [_snapshot_path(version)]
+    else:
+        paths = [os.path.join(SNAPSHOT_DIR, name) for name in os.listdir(SNAPSHOT_DIR)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"🗑️ Removed schema snapshot {path}")
+
+
+if __name__ == "__main__":
+    # Kullanım: python schema_snapshot.py [invalidate [sürüm] | refresh]
+    command = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    if command == "invalidate":
+        invalidate_schema_snapshot(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif command == "refresh":
+        from graph import get_graph, get_graph_error
+        graph = get_graph()
+        if graph is None:
+            print(f"❌ Neo4j connection failed: {get_graph_error()}")
+            sys.exit(1)
+        current_version = resolve_dataset_version()
+        invalidate_schema_snapshot(current_version)
+        save_schema_snapshot(graph, current_version)
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
@@ -1,6 +1,13 @@
-import streamlit as st
+import asyncio
+import os
+import threading
+import time
 from llm import llm
-from graph import graph
+from graph import get_graph, aquery
+from utils import get_setting, lazy_resource
+from instrumentation import record_event
+from tools.cypher_memo import CypherMemo, schema_fingerprint
+from schema_snapshot import load_schema_snapshot, resolve_dataset_version
 from langchain_neo4j import GraphCypherQAChain
 from langchain.prompts.prompt import PromptTemplate
 
@@ -55,35 +62,163 @@ CYPHER_GENERATION_PROMPT = PromptTemplate(
     input_variables=["schema", "question"]
 )
 
-def validate_graph_connection(graph_obj):
-    """Check if graph object is valid Neo4j connection"""
-    if isinstance(graph_obj, str):
-        st.error(f"❌ Graph connection error: {graph_obj}")
-        return False
-    try:
-        # Simple validation query
-        graph_obj.query("RETURN 1 AS test")
-        return True
-    except Exception as e:
-        st.error(f"🔌 Neo4j Connection Failed: {str(e)}")
-        return False
-
-# Chain initialization with LangChain's built-in schema
-if validate_graph_connection(graph):
-    try:
-        cypher_qa = GraphCypherQAChain.from_llm(
-            llm=llm,
-            graph=graph,
-            cypher_prompt=CYPHER_GENERATION_PROMPT,
-            verbose=True,
-            return_intermediate_steps=True,
-            allow_dangerous_requests=True,
-        )
-        print("✅ Cypher QA Chain initialized successfully with built-in schema")
-    except Exception as e:
-        st.error(f"Failed to initialize Cypher QA chain: {str(e)}")
-        print(f"Chain initialization error: {e}")
-        cypher_qa = None
-else:
-    st.error("Cannot initialize Cypher QA chain due to graph connection issues")
-    cypher_qa = None
\ No newline at end of file
+# Zincir ve memo, kuruldukları veri sürümünün şemasını taşır; sürüm değişince ikisi de yeniden kurulur
+VERSION_CHECK_INTERVAL = 60
+_chain_version = None
+_version_checked_at = 0.0
+_version_lock = threading.Lock()
+
+
+@lazy_resource("Cypher QA chain")
+def get_cypher_qa():
+    """Builds the Cypher QA chain with the schema snapshot of the current dataset version"""
+    global _chain_version, _version_checked_at
+    graph = get_graph()
+    if graph is None:
+        raise RuntimeError("Neo4j connection is not available")
+
+    version = resolve_dataset_version()
+    load_schema_snapshot(graph, version)
+    cypher_qa = GraphCypherQAChain.from_llm(
+        llm=llm,
+        graph=graph,
+        cypher_prompt=CYPHER_GENERATION_PROMPT,
+        verbose=True,
+        return_intermediate_steps=True,
+        allow_dangerous_requests=True,
+    )
+    _chain_version, _version_checked_at = version, time.monotonic()
+    print(f"✅ Cypher QA Chain initialized successfully with schema snapshot ({version})")
+    return cypher_qa
+
+
+# Aynı yapıdaki sorular için Cypher üretim çağrısını atlamak için kalıcı önbellek
+@lazy_resource("Cypher memo")
+def get_cypher_memo():
+    cypher_qa = get_cypher_qa()
+    if cypher_qa is None:
+        raise RuntimeError("Cypher QA chain is not available")
+    return CypherMemo(
+        os.path.join(get_setting("CACHE_DIR", ".cache"), "cypher_memo.sqlite3"),
+        schema_fingerprint(cypher_qa.graph_schema, CYPHER_GENERATION_TEMPLATE),
+    )
+
+
+def _check_dataset_version():
+    """Drops the cached chain and memo when the dataset version moved past the one they were built for"""
+    global _chain_version, _version_checked_at
+    with _version_lock:
+        now = time.monotonic()
+        if _chain_version is None or now - _version_checked_at < VERSION_CHECK_INTERVAL:
+            return
+        _version_checked_at = now
+        # Sürüm okunamazsa (Neo4j geçici olarak erişilemez) mevcut zincir korunur
+        version = resolve_dataset_version(default=None)
+        if version is None or version == _chain_version:
+            return
+        print(f"♻️ Dataset version changed ({_chain_version} -> {version}), rebuilding Cypher QA chain and memo")
+        _chain_version = None
+        get_cypher_memo.clear()
+        get_cypher_qa.clear()
+
+
+def _memo_response(cypher_qa, question, cypher, params, context, result):
+    return {
+        "query": question,
+        "result": result[cypher_qa.qa_chain.output_key],
+        "intermediate_steps": [{"query": cypher, "params": params}, {"context": context}],
+        "generated_cypher_query": cypher,
+        "memo_hit": True,
+    }
+
+
+def _answer_from_memo(cypher_qa, question, cypher, params):
+    """
+    Executes a memoized query and only runs the answer step of the chain.
+    Returns None when the query finds nothing, so the question is regenerated.
+    """
+    context = cypher_qa.graph.query(cypher, params)[: cypher_qa.top_k]
+    if not context:
+        return None
+    result = cypher_qa.qa_chain.invoke({"question": question, "context": context})
+    return _memo_response(cypher_qa, question, cypher, params, context, result)
+
+
+async def _aanswer_from_memo(cypher_qa, question, cypher, params):
+    context = (await aquery(cypher, params))[: cypher_qa.top_k]
+    if not context:
+        return None
+    result = await cypher_qa.qa_chain.ainvoke({"question": question, "context": context})
+    return _memo_response(cypher_qa, question, cypher, params, context, result)
+
+
+def _remember_generated(cypher_memo, question, response):
+    steps = response.get("intermediate_steps", [])
+    generated_cypher = steps[0].get("query") if steps else None
+    context = steps[1].get("context") if len(steps) > 1 else None
+
+    # Yalnızca sonuç döndüren sorguları sakla
+    if cypher_memo is not None and generated_cypher and context:
+        cypher_memo.remember(question, generated_cypher)
+
+    return {**response, "generated_cypher_query": generated_cypher, "memo_hit": False}
+
+
+def invoke_cypher_qa(question):
+    """
+    Answers a question with the Cypher QA chain. Known question shapes reuse
+    their memoized Cypher and skip the generation LLM call.
+    """
+    if isinstance(question, dict):
+        question = question.get("query", "")
+
+    _check_dataset_version()
+    cypher_qa, cypher_memo = get_cypher_qa(), get_cypher_memo()
+    if cypher_qa is None:
+        raise RuntimeError("Cypher QA chain is not available")
+
+    if cypher_memo is not None:
+        memoized = cypher_memo.lookup(question)
+        record_event("cypher_memo_hit" if memoized is not None else "cypher_memo_miss")
+        if memoized is not None:
+            cypher, params = memoized
+            try:
+                response = _answer_from_memo(cypher_qa, question, cypher, params)
+            except Exception as e:
+                print(f"⚠️ Memoized Cypher failed, regenerating: {e}")
+                response = None
+            if response is not None:
+                return response
+            # Hata veren ya da sonuç döndürmeyen şablon silinir ve sorgu yeniden üretilir
+            cypher_memo.forget(question)
+
+    return _remember_generated(cypher_memo, question, cypher_qa.invoke({"query": question}))
+
+
+async def ainvoke_cypher_qa(question):
+    """Async counterpart of invoke_cypher_qa"""
+    if isinstance(question, dict):
+        question = question.get("query", "")
+
+    # Sürüm sorgusu senkron bir Neo4j çağrısıdır
+    await asyncio.to_thread(_check_dataset_version)
+    cypher_qa, cypher_memo = get_cypher_qa(), get_cypher_memo()
+    if cypher_qa is None:
+        raise RuntimeError("Cypher QA chain is not available")
+
+    if cypher_memo is not None:
+        memoized = cypher_memo.lookup(question)
+        record_event("cypher_memo_hit" if memoized is not None else "cypher_memo_miss")
+        if memoized is not None:
+            cypher, params = memoized
+            try:
+                response = await _aanswer_from_memo(cypher_qa, question, cypher, params)
+            except Exception as e:
+                print(f"⚠️ Memoized Cypher failed, regenerating: {e}")
+                response = None
+            if response is not None:
+                return response
+            cypher_memo.forget(question)
+
+    # Zincir kendi içinde senkron çalışır; ainvoke onu event loop dışında yürütür
+    return _remember_generated(cypher_memo, question, await cypher_qa.ainvoke({"query": question}))
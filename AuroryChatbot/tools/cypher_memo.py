@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Sorulardan parametre olarak ayıklanan değerler (sıra önemli: adresler sayılardan önce)
+KNOWN_TOKENS = ["xaury", "aury", "nerite", "ember", "wisdom"]
+
+PARAMETER_PATTERNS = [
+    ("address", re.compile(r"\b[1-9A-HJ-NP-Za-km-z]{32,44}\b")),
+    ("text", re.compile(r"'([^']+)'|\"([^\"]+)\"")),
+    ("token", re.compile(r"\b(" + "|".join(KNOWN_TOKENS) + r")\b", re.IGNORECASE)),
+    ("number", re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")),
+]
+
+# Üretilen sorgudaki tırnaklı metinler (kaçış karakterleriyle)
+QUOTED_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+
+
+def schema_fingerprint(*parts: str) -> str:
+    """Hashes the schema text (and anything else the generated Cypher depends on)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _normalize(text: str) -> str:
+    text = re.sub(r"[^\w\s<>#]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def extract_template(question: str):
+    """
+    Replaces entity values in the question with typed placeholders.
+    "holders of AURY" -> ("holders of <token>", {"token_0": "AURY"})
+    """
+    params = {}
+    template = question
+    for kind, pattern in PARAMETER_PATTERNS:
+        counter = 0
+
+        def replace(match):
+            nonlocal counter
+            value = next((group for group in match.groups() if group), match.group(0))
+            params[f"{kind}_{counter}"] = value
+            counter += 1
+            return f" <{kind}> "
+
+        template = pattern.sub(replace, template)
+    return _normalize(template), params
+
+
+def _apply_case(value: str, case: str) -> str:
+    if case == "lower":
+        return value.lower()
+    if case == "upper":
+        return value.upper()
+    return value
+
+
+def _literal_case(literal: str, value: str) -> str:
+    if literal == value.lower():
+        return "lower"
+    if literal == value.upper():
+        return "upper"
+    return "exact"
+
+
+def lift_parameters(cypher: str, params: dict):
+    """
+    Turns the literal values of a generated query into $parameters.
+
+    Every value must appear exactly once in the query, otherwise the
+    query can't be safely reused for other values and None is returned.
+    A number quoted on its own ('12') is lifted with its quotes as a string
+    parameter; a number inside a longer literal can't be lifted either.
+    """
+    bindings = []
+    for name, value in params.items():
+        kind = name.rsplit("_", 1)[0]
+        if kind == "number":
+            spans = _number_spans(cypher, value)
+            if spans is None or len(spans) != 1:
+                return None
+            start, end, quoted = spans[0]
+            binding = {"name": name, "kind": "text", "case": "exact"} if quoted else {"name": name, "kind": kind, "case": None}
+        else:
+            pattern = re.compile(r"(['\"])(" + re.escape(value) + r")\1", re.IGNORECASE)
+            matches = list(pattern.finditer(cypher))
+            if len(matches) != 1:
+                return None
+            start, end = matches[0].span()
+            binding = {"name": name, "kind": kind, "case": _literal_case(matches[0].group(2), value)}
+
+        cypher = cypher[:start] + f"${name}" + cypher[end:]
+        bindings.append(binding)
+    return cypher, bindings
+
+
+def _number_spans(cypher: str, value: str):
+    """
+    (start, end, quoted) of every occurrence of the number in the query;
+    quoted spans include the quotes. None if it occurs inside a longer literal.
+    """
+    literals = [match.span() for match in QUOTED_LITERAL.finditer(cypher)]
+    spans = []
+    for match in re.finditer(rf"(?<![\w.$]){re.escape(value)}(?![\w.])", cypher):
+        literal = next((span for span in literals if span[0] < match.start() < span[1]), None)
+        if literal is None:
+            spans.append((match.start(), match.end(), False))
+        elif literal == (match.start() - 1, match.end() + 1):
+            spans.append((literal[0], literal[1], True))
+        else:
+            return None
+    return spans
+
+
+def bind_parameters(bindings: list, params: dict) -> dict:
+    bound = {}
+    for binding in bindings:
+        value = params[binding["name"]]
+        if binding["kind"] == "number":
+            bound[binding["name"]] = float(value) if "." in value else int(value)
+        else:
+            bound[binding["name"]] = _apply_case(value, binding["case"])
+    return bound
+
+
+class CypherMemo:
+    """
+    Persistent question -> Cypher memo, stored in SQLite and keyed by the
+    schema fingerprint and the normalized question.
+
+    Questions are stored as templates when their entity values can be
+    lifted into query parameters, so "holders of AURY" and "holders of
+    NERITE" share one entry. Otherwise the exact question is memoized.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS cypher_memo (
+                schema_fingerprint TEXT NOT NULL,
+                question_key TEXT NOT NULL,
+                cypher TEXT NOT NULL,
+                bindings TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (schema_fingerprint, question_key)
+            )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _keys(self, question: str):
+        template, params = extract_template(question)
+        return ("template:" + template, params), ("exact:" + _normalize(question), {})
+
+    def lookup(self, question: str):
+        """Returns (cypher, params) for a memoized question shape, or None"""
+        with self._connect() as conn:
+            for key, params in self._keys(question):
+                row = conn.execute(
+                    "SELECT cypher, bindings FROM cypher_memo WHERE schema_fingerprint = ? AND question_key = ?",
+                    (self.fingerprint, key),
+                ).fetchone()
+                if row is None:
+                    continue
+                cypher, bindings = row[0], json.loads(row[1])
+                try:
+                    bound = bind_parameters(bindings, params)
+                except (KeyError, ValueError):
+                    continue
+                conn.execute(
+                    "UPDATE cypher_memo SET hits = hits + 1, last_used_at = ? WHERE schema_fingerprint = ? AND question_key = ?",
+                    (time.time(), self.fingerprint, key),
+                )
+                self.hits += 1
+                return cypher, bound
+        self.misses += 1
+        return None
+
+    def remember(self, question: str, cypher: str):
+        """Stores the Cypher generated for the question"""
+        (template_key, params), (exact_key, _) = self._keys(question)
+        lifted = lift_parameters(cypher, params) if params else None
+        if lifted is not None:
+            key, (cypher, bindings) = template_key, lifted
+        else:
+            key, bindings = exact_key, []
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cypher_memo "
+                "(schema_fingerprint, question_key, cypher, bindings, hits, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (self.fingerprint, key, cypher, json.dumps(bindings), now, now),
+            )
+
+    def forget(self, question: str):
+        """Removes the memoized entries for the question (e.g. when the stored query failed)"""
+        keys = [key for key, _ in self._keys(question)]
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM cypher_memo WHERE schema_fingerprint = ? AND question_key = ?",
+                [(self.fingerprint, key) for key in keys],
+            )
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries = conn.execute(
+                "SELECT count(*) FROM cypher_memo WHERE schema_fingerprint = ?", (self.fingerprint,)
+            ).fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_neo4j.vectorstores.neo4j_vector import remove_lucene_chars
+
+from graph import aquery
+from utils import get_setting
+
+KEYWORD_INDEX_NAME = "aurory_docs_keyword"
+KEYWORD_INDEX_QUERY = (
+    f"CREATE FULLTEXT INDEX {KEYWORD_INDEX_NAME} IF NOT EXISTS "
+    "FOR (n:Document) ON EACH [n.content, n.title]"
+)
+
+RETRIEVER_K = int(get_setting("RETRIEVER_K", 4))
+HYBRID_FETCH_K = int(get_setting("HYBRID_FETCH_K", 20))
+HYBRID_VECTOR_WEIGHT = float(get_setting("HYBRID_VECTOR_WEIGHT", 1.0))
+HYBRID_KEYWORD_WEIGHT = float(get_setting("HYBRID_KEYWORD_WEIGHT", 1.0))
+HYBRID_RRF_K = int(get_setting("HYBRID_RRF_K", 60))
+
+# Anahtar kelime ve vektör aramaları paralel çalışır
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-search")
+
+
+def document_key(document: Document):
+    """Identity of a retrieved node, so the same hit from both searches is fused"""
+    return document.metadata.get("node_id") or (document.metadata.get("source"), document.page_content)
+
+
+def reciprocal_rank_fusion(ranked_lists: List[Tuple[float, List[Document]]], k: int, rrf_k: int = HYBRID_RRF_K) -> List[Document]:
+    """
+    Fuses ranked result lists: every document scores sum(weight / (rrf_k + rank))
+    over the lists it appears in (rank starts at 1). Returns the top k, with the
+    fused score in metadata["rrf_score"].
+    """
+    scores, documents = {}, {}
+    for weight, ranked in ranked_lists:
+        for rank, document in enumerate(ranked, start=1):
+            key = document_key(document)
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            documents.setdefault(key, document)
+
+    fused = []
+    for key in sorted(scores, key=scores.get, reverse=True)[:k]:
+        document = documents[key]
+        fused.append(Document(page_content=document.page_content,
+                              metadata={**document.metadata, "rrf_score": scores[key]}))
+    return fused
+
+
+def _to_document(record: dict) -> Document:
+    # Neo4jVector ile aynı dönüşüm: boş metadata alanları atılır
+    metadata = {key: value for key, value in (record["metadata"] or {}).items() if value is not None}
+    return Document(page_content=record["text"], metadata=metadata)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Runs a full-text (BM25) query and a vector similarity query in parallel
+    and fuses their rankings with reciprocal rank fusion. Both queries end
+    with the same retrieval query, so hits have the same metadata either way.
+    A weight of 0 skips that query.
+    """
+
+    vector_store: Any
+    graph: Any
+    retrieval_query: str
+    keyword_index: str = KEYWORD_INDEX_NAME
+    k: int = RETRIEVER_K
+    fetch_k: int = HYBRID_FETCH_K
+    vector_weight: float = HYBRID_VECTOR_WEIGHT
+    keyword_weight: float = HYBRID_KEYWORD_WEIGHT
+    rrf_k: int = HYBRID_RRF_K
+
+    def _keyword_query(self) -> str:
+        return (
+            "CALL db.index.fulltext.queryNodes($keyword_index, $query, {limit: $k}) "
+            "YIELD node, score "
+            + self.retrieval_query
+        )
+
+    def _keyword_params(self, query: str):
+        text = remove_lucene_chars(query)
+        if not text:
+            return None
+        return {"keyword_index": self.keyword_index, "query": text, "k": self.fetch_k}
+
+    def _vector_search(self, query: str) -> List[Document]:
+        return [document for document, _ in self.vector_store.similarity_search_with_score(query, k=self.fetch_k)]
+
+    def _keyword_search(self, query: str) -> List[Document]:
+        params = self._keyword_params(query)
+        if params is None:
+            return []
+        return [_to_document(record) for record in self.graph.query(self._keyword_query(), params)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        searches = []
+        if self.vector_weight > 0:
+            searches.append((self.vector_weight, self._vector_search))
+        if self.keyword_weight > 0:
+            searches.append((self.keyword_weight, self._keyword_search))
+
+        # Süre ölçümleri (instrumentation) iş parçacığında da aynı tura yazılsın
+        futures = [
+            (weight, _search_executor.submit(contextvars.copy_context().run, search, query))
+            for weight, search in searches
+        ]
+        return reciprocal_rank_fusion([(weight, future.result()) for weight, future in futures], self.k, self.rrf_k)
+
+    async def _akeyword_search(self, query: str) -> List[Document]:
+        params = self._keyword_params(query)
+        if params is None:
+            return []
+        return [_to_document(record) for record in await aquery(self._keyword_query(), params)]
+
+    async def _avector_search(self, query: str) -> List[Document]:
+        results = await self.vector_store.asimilarity_search_with_score(query, k=self.fetch_k)
+        return [document for document, _ in results]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        weights, searches = [], []
+        if self.vector_weight > 0:
+            weights.append(self.vector_weight)
+            searches.append(self._avector_search(query))
+        if self.keyword_weight > 0:
+            weights.append(self.keyword_weight)
+            searches.append(self._akeyword_search(query))
+        results = await asyncio.gather(*searches)
+        return reciprocal_rank_fusion(list(zip(weights, results)), self.k, self.rrf_k)
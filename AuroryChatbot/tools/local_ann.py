@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, List, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils import get_setting
+
+LOCAL_ANN_ENABLED = str(get_setting("LOCAL_ANN_ENABLED", "false")).lower() in ("1", "true", "yes")
+LOCAL_ANN_PATH = get_setting(
+    "LOCAL_ANN_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "local_ann")
+)
+LOCAL_ANN_SYNC_SECONDS = int(get_setting("LOCAL_ANN_SYNC_SECONDS", 300))
+SYNC_BATCH_SIZE = 500
+# Mezar taşı satırları bu oranı aşınca vektör dosyası yeniden yazılır
+COMPACT_DEAD_RATIO = 0.25
+
+# Zaman damgası olmayan (eski) belgeler ilk tam eşitlemede updatedAt = 0 ile gelir
+CHANGED_DOCUMENTS_QUERY = """
+MATCH (d:Document)
+WHERE d.embedding IS NOT NULL
+  AND (coalesce(d.updatedAt, 0) > $since OR (coalesce(d.updatedAt, 0) = $since AND elementId(d) > $after_id))
+RETURN elementId(d) AS id, coalesce(d.updatedAt, 0) AS updated_at, d.embedding AS embedding
+ORDER BY updated_at, id
+LIMIT $limit
+"""
+
+DOCUMENT_COUNT_QUERY = "MATCH (d:Document) WHERE d.embedding IS NOT NULL RETURN count(d) AS count"
+DOCUMENT_IDS_QUERY = "MATCH (d:Document) WHERE d.embedding IS NOT NULL RETURN elementId(d) AS id"
+
+DOCUMENTS_BY_ID_QUERY = """
+MATCH (d:Document) WHERE elementId(d) IN $ids
+RETURN elementId(d) AS id, coalesce(d.updatedAt, 0) AS updated_at, d.embedding AS embedding
+"""
+
+HYDRATE_QUERY = """
+UNWIND $hits AS hit
+MATCH (node:Document) WHERE elementId(node) = hit.id
+WITH node, hit.score AS score
+"""
+
+
+class LocalVectorIndex:
+    """
+    Exact in-process nearest-neighbour index over the Document embeddings.
+
+    Vectors are kept L2-normalized in a float32 file that is memory-mapped
+    read-only, so a search is one BLAS matrix-vector product plus a partial
+    sort. `sync` mirrors Neo4j incrementally: documents changed since the
+    last sync (by updatedAt) are fetched in pages and appended as new rows,
+    and the rows they replace or that were deleted become tombstones (id
+    None). Deletions are looked for by comparing the document count, so
+    the id list is only read when the counts differ. The vectors file is
+    rewritten only on compaction, once tombstones exceed COMPACT_DEAD_RATIO
+    of the rows.
+    """
+
+    def __init__(self, path: str = LOCAL_ANN_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.ids = []
+        self.updated_at = []
+        self.synced_until = (0, "")
+        self.matrix = None
+        self.live = np.zeros(0, dtype=bool)
+        self.dim = 0
+        self._vectors_file = None
+        self._load()
+
+    @property
+    def _rows_path(self):
+        return os.path.join(self.path, "rows.json")
+
+    def __len__(self):
+        return int(self.live.sum())
+
+    @staticmethod
+    def _live_mask(ids) -> np.ndarray:
+        return np.fromiter((doc_id is not None for doc_id in ids), dtype=bool, count=len(ids))
+
+    def _map(self, vectors_file, rows, dim):
+        if not rows:
+            return None
+        return np.memmap(os.path.join(self.path, vectors_file), dtype=np.float32, mode="r", shape=(rows, dim))
+
+    def _load(self):
+        if not os.path.exists(self._rows_path):
+            return
+        try:
+            with open(self._rows_path, encoding="utf-8") as f:
+                rows = json.load(f)
+            matrix = self._map(rows["vectors_file"], len(rows["ids"]), rows["dim"])
+            self.ids, self.updated_at = rows["ids"], rows["updated_at"]
+            self.synced_until = tuple(rows["synced_until"])
+            self.matrix, self.dim, self._vectors_file = matrix, rows["dim"], rows["vectors_file"]
+            self.live = self._live_mask(self.ids)
+        except Exception as e:
+            print(f"⚠️ Local vector index could not be loaded, it will be rebuilt: {e}")
+
+    def _commit(self, ids, updated_at, vectors_file, dim, synced_until):
+        """Swaps rows.json atomically and then the in-memory state; searches keep the old mapping until then"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._rows_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "updated_at": updated_at, "dim": dim,
+                       "vectors_file": vectors_file, "synced_until": list(synced_until)}, f)
+        os.replace(self._rows_path + ".tmp", self._rows_path)
+
+        mapped = self._map(vectors_file, len(ids), dim)
+        live = self._live_mask(ids)
+        with self._lock:
+            self.ids, self.updated_at, self.matrix, self.live = ids, updated_at, mapped, live
+            self.dim, self._vectors_file, self.synced_until = dim, vectors_file, synced_until
+
+    def _save(self, ids, updated_at, matrix, synced_until):
+        """
+        Compaction: writes the given rows to a new generation file and swaps
+        rows.json to it. Searches keep using the old mapping until the swap.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        # Eski dosya hâlâ eşlenmiş olabilir (Windows'ta üzerine yazılamaz), bu yüzden yeni ad
+        vectors_file = f"vectors-{time.time_ns()}.f32"
+        matrix.tofile(os.path.join(self.path, vectors_file))
+        self._commit(ids, updated_at, vectors_file, int(matrix.shape[1]) if matrix.size else 0, synced_until)
+
+        for name in os.listdir(self.path):
+            if name.startswith("vectors-") and name != vectors_file:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    # Hâlâ eşlenmiş dosya bir sonraki sıkıştırmada silinir
+                    pass
+
+    def _append(self, ids, updated_at, vectors, synced_until):
+        """Writes the new rows after the current ones in the same vectors file and swaps rows.json"""
+        if vectors.size:
+            with open(os.path.join(self.path, self._vectors_file), "r+b") as f:
+                # Önceki yarıda kalmış bir eklemenin artığının üzerine yazılır
+                end = len(self.ids) * 4 * self.dim
+                f.seek(end)
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                end += vectors.nbytes
+                if os.fstat(f.fileno()).st_size > end:
+                    f.truncate(end)
+        self._commit(ids, updated_at, self._vectors_file, self.dim, synced_until)
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def sync(self, graph) -> dict:
+        """Brings the mirror up to date with Neo4j; returns the number of upserted and removed rows"""
+        with self._sync_lock:
+            with self._lock:
+                ids = list(self.ids)
+                updated_at = list(self.updated_at)
+                since, after_id = self.synced_until
+            rows = {doc_id: i for i, doc_id in enumerate(ids) if doc_id is not None}
+
+            changed = {}
+            while True:
+                page = graph.query(CHANGED_DOCUMENTS_QUERY, {"since": since, "after_id": after_id, "limit": SYNC_BATCH_SIZE})
+                for record in page:
+                    changed[record["id"]] = record
+                if len(page) < SYNC_BATCH_SIZE:
+                    break
+                since, after_id = page[-1]["updated_at"], page[-1]["id"]
+            if changed:
+                last = max(changed.values(), key=lambda record: (record["updated_at"], record["id"]))
+                since, after_id = max((since, after_id), (last["updated_at"], last["id"]))
+
+            # Silinen belgeler ve updatedAt damgası olmadan eklenenler: yalnız sayılar tutmazsa id listesi okunur
+            removed = []
+            expected = len(rows) + sum(1 for doc_id in changed if doc_id not in rows)
+            if graph.query(DOCUMENT_COUNT_QUERY)[0]["count"] != expected:
+                current_ids = {record["id"] for record in graph.query(DOCUMENT_IDS_QUERY)}
+                removed = [doc_id for doc_id in rows if doc_id not in current_ids]
+                missing = [doc_id for doc_id in current_ids if doc_id not in rows and doc_id not in changed]
+                for start in range(0, len(missing), SYNC_BATCH_SIZE):
+                    for record in graph.query(DOCUMENTS_BY_ID_QUERY, {"ids": missing[start:start + SYNC_BATCH_SIZE]}):
+                        changed[record["id"]] = record
+
+            if not changed and not removed:
+                if (since, after_id) != self.synced_until:
+                    self._commit(ids, updated_at, self._vectors_file, self.dim, (since, after_id))
+                return {"upserted": 0, "removed": 0}
+
+            # Değişen ve silinen belgelerin eski satırları mezar taşı olur
+            for doc_id in list(changed) + removed:
+                if doc_id in rows:
+                    ids[rows[doc_id]] = None
+            records = list(changed.values())
+            vectors = self._normalize([record["embedding"] for record in records]) if records else None
+            ids += [record["id"] for record in records]
+            updated_at += [record["updated_at"] for record in records]
+
+            dead = ids.count(None)
+            new_dim = vectors is not None and vectors.shape[1] != self.dim
+            if self.matrix is None or new_dim or dead > COMPACT_DEAD_RATIO * len(ids):
+                # Sıkıştırma: eski dosyadaki canlı satırlar ve yeni satırlar yeni bir dosyaya yazılır
+                keep = [i for i in sorted(rows.values()) if ids[i] is not None]
+                if new_dim and self.matrix is not None:
+                    # Embedding modeli değişti: eski boyuttaki satırlar karıştırılamaz
+                    print(f"⚠️ Embedding dimension changed ({self.dim} -> {vectors.shape[1]}), dropping old rows")
+                    keep = []
+                blocks = [np.asarray(self.matrix[keep])] if keep else []
+                if vectors is not None:
+                    blocks.append(vectors)
+                first_new = len(ids) - len(records)
+                live = keep + list(range(first_new, len(ids)))
+                matrix = np.vstack(blocks) if blocks else np.zeros((0, 0), np.float32)
+                self._save([ids[i] for i in live], [updated_at[i] for i in live], matrix, (since, after_id))
+            else:
+                self._append(ids, updated_at, vectors if vectors is not None else np.zeros((0, self.dim), np.float32),
+                             (since, after_id))
+            return {"upserted": len(changed), "removed": len(removed)}
+
+    def search(self, embedding, k: int = 4) -> List[Tuple[str, float]]:
+        """Top k (id, cosine similarity) pairs, best first"""
+        with self._lock:
+            matrix, ids, live = self.matrix, self.ids, self.live
+        if matrix is None or not live.any():
+            return []
+        scores = matrix @ self._normalize(embedding)
+        scores[~live] = -np.inf
+        k = min(k, int(live.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+
+class LocalANNRetriever(BaseRetriever):
+    """
+    Vector search against a LocalVectorIndex; Neo4j is only used to hydrate
+    the top k hits with the retrieval query. Also exposes
+    similarity_search_with_score, so it can stand in for Neo4jVector inside
+    the HybridRetriever.
+    """
+
+    index: Any
+    graph: Any
+    embeddings: Any
+    retrieval_query: str
+    k: int = 4
+
+    def _hydrate(self, hits) -> List[Tuple[Document, float]]:
+        if not hits:
+            return []
+        # Neo4j vektör indeksiyle aynı ölçek: (1 + kosinüs) / 2
+        params = {"hits": [{"id": doc_id, "score": (1 + score) / 2} for doc_id, score in hits]}
+        records = self.graph.query(HYDRATE_QUERY + self.retrieval_query, params)
+        documents = [
+            (Document(page_content=record["text"],
+                      metadata={key: value for key, value in record["metadata"].items() if value is not None}),
+             record["score"])
+            for record in records
+        ]
+        return sorted(documents, key=lambda pair: pair[1], reverse=True)
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        embedding = self.embeddings.embed_query(query)
+        return self._hydrate(self.index.search(embedding, k))
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        search = functools.partial(contextvars.copy_context().run, self.similarity_search_with_score, query, k)
+        return await asyncio.get_running_loop().run_in_executor(None, search)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, self.k)]
+
+
+_sync_lock = threading.Lock()
+_sync_thread = None
+
+def _sync_loop(index, get_graph):
+    while True:
+        time.sleep(LOCAL_ANN_SYNC_SECONDS)
+        graph = get_graph()
+        if graph is None:
+            continue
+        try:
+            result = index.sync(graph)
+            if any(result.values()):
+                print(f"✅ Local vector index synced: {result}")
+        except Exception as e:
+            print(f"⚠️ Local vector index sync failed: {e}")
+
+def start_sync_job(index, get_graph):
+    """Keeps the local index in sync in the background (every LOCAL_ANN_SYNC_SECONDS), once per process"""
+    global _sync_thread
+    with _sync_lock:
+        if _sync_thread is None and LOCAL_ANN_SYNC_SECONDS > 0:
+            _sync_thread = threading.Thread(target=_sync_loop, args=(index, get_graph), name="local-ann-sync", daemon=True)
+            _sync_thread.start()
+    return _sync_thread
@@ -1,26 +1,23 @@
 import streamlit as st
 from llm import llm, embeddings
-from graph import graph
+from graph import get_graph
+from utils import lazy_resource
+from tools.hybrid import HybridRetriever, KEYWORD_INDEX_QUERY
+from tools.local_ann import LOCAL_ANN_ENABLED, LocalANNRetriever, LocalVectorIndex, start_sync_job
 
 from langchain_neo4j import Neo4jVector
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains import create_retrieval_chain
 from langchain_core.prompts import ChatPromptTemplate
 
-try:
-    # Create the Neo4jVector with error handling and updated syntax
-    neo4jvector = Neo4jVector.from_existing_index(
-        embeddings,
-        graph=graph,
-        index_name="aurory_docs",
-        node_label="Document",
-        text_node_property="content",
-        embedding_node_property="embedding",
-        retrieval_query="""
+# Belge ilişkileri veri hattında Document üzerine kopyalanır
+# (Data/vector_embedding.py::materialize_retrieval_metadata); burada yalnızca özellik okunur
+RETRIEVAL_QUERY = """
         RETURN
             node.content AS text,
             score,
             {
+                node_id: elementId(node),
                 source: node.source,
                 docType: node.docType,
                 title: node.title,
@@ -28,68 +25,94 @@ try:
                 influenceScore: node.influenceScore,
                 socialImpact: node.socialImpact,
                 eventType: node.eventType,
-                socialImpact: node.socialImpact,
-               
 
-                tokens_mentioned:
-                    [ (token:Token)<-[:DISCUSSES]-(node) | token.name ] +
-                    [ (token:Token)<-[:REFERENCES]-(node) | token.name ] +
-                    [ (token:Token)<-[:POTENTIAL_IMPACT]-(node) | token.name ],
+                tokens_mentioned: coalesce(node.tokensMentioned, []),
 
                 proposals_related:
-                    [ (proposal:Proposal)<-[:DESCRIBES]-(node) | {
-                        id: proposal.proposalId,
-                        title: proposal.title
+                    [ i IN range(0, size(coalesce(node.proposalIds, [])) - 1) | {
+                        id: node.proposalIds[i],
+                        title: node.proposalTitles[i]
                     } ],
 
                 nfts_related:
-                    [ (nftitem:NftItem)<-[:ABOUT]-(node) | {
-                        id: nftitem.id,
-                        status: nftitem.status,
-                        priceSOL: nftitem.priceSOL
+                    [ i IN range(0, size(coalesce(node.nftIds, [])) - 1) | {
+                        id: node.nftIds[i],
+                        status: node.nftStatuses[i],
+                        priceSOL: CASE WHEN node.nftPricesSOL[i] < 0 THEN null ELSE node.nftPricesSOL[i] END
                     } ],
 
                 game_mechanics_related:
-                    [ (gamemechanic:GameMechanic)<-[:MENTIONS]-(node) | {
-                        description: gamemechanic.description,
-                        name: gamemechanic.name
+                    [ i IN range(0, size(coalesce(node.mechanicNames, [])) - 1) | {
+                        description: node.mechanicDescriptions[i],
+                        name: node.mechanicNames[i]
                     } ],
 
-                source_url: CASE
-                    WHEN node.docType = 'news' THEN 'https://aurorydocs.xyz/news/' + node.id
-                    WHEN node.docType = 'tweet' THEN 'https://twitter.com/tweet/' + node.tweet_id
-                    WHEN node.docType = 'dao_proposal' THEN 'https://gov.aurory.io/proposal/' + toString(node.proposalId)
-                    ELSE node.source
-                END
+                source_url: node.sourceUrl
             } AS metadata
         """
-    )
 
-    # Create the retriever
-    retriever = neo4jvector.as_retriever()
+instructions = (
+    "You are the Aurory Economy Strategy Assistant. Use the given context to provide economic insights about the Aurory game ecosystem. "
+    "Focus on token economics, NFT markets, player strategies, and DAO governance. "
+    "If the context doesn't contain relevant Aurory economic data, say you need more specific information. "
+    "Always include risk assessments and strategic recommendations when applicable. "
+    "Context: {context}"
+)
+
+prompt = ChatPromptTemplate.from_messages([
+    ("system", instructions),
+    ("human", "{input}"),
+])
+
+
+def get_vector_search(graph, neo4jvector):
+    """The local ANN mirror when enabled and synced, otherwise the Neo4j vector index"""
+    if not LOCAL_ANN_ENABLED:
+        return neo4jvector
+    try:
+        index = LocalVectorIndex()
+        result = index.sync(graph)
+        print(f"✅ Local vector index ready: {len(index)} documents ({result})")
+    except Exception as e:
+        print(f"⚠️ Local vector index unavailable, using the Neo4j vector index: {e}")
+        return neo4jvector
+    start_sync_job(index, get_graph)
+    return LocalANNRetriever(index=index, graph=graph, embeddings=embeddings, retrieval_query=RETRIEVAL_QUERY)
 
-    instructions = (
-        "You are the Aurory Economy Strategy Assistant. Use the given context to provide economic insights about the Aurory game ecosystem. "
-        "Focus on token economics, NFT markets, player strategies, and DAO governance. "
-        "If the context doesn't contain relevant Aurory economic data, say you need more specific information. "
-        "Always include risk assessments and strategic recommendations when applicable. "
-        "Context: {context}"
-    )
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", instructions),
-        ("human", "{input}"),
-    ])
+@lazy_resource("Document search")
+def get_document_retriever():
+    """Builds the vector store and retrieval chain on first use, None if unavailable"""
+    graph = get_graph()
+    if graph is None:
+        raise RuntimeError("Neo4j connection is not available")
+
+    neo4jvector = Neo4jVector.from_existing_index(
+        embeddings,
+        graph=graph,
+        index_name="aurory_docs",
+        node_label="Document",
+        text_node_property="content",
+        embedding_node_property="embedding",
+        retrieval_query=RETRIEVAL_QUERY
+    )
 
+    # Tam metin indeksi yoksa oluşturulur (ilk oluşturmada arka planda dolar)
+    try:
+        graph.query(KEYWORD_INDEX_QUERY)
+    except Exception as e:
+        print(f"⚠️ Keyword index could not be created: {e}")
 
+    # Create the retriever: keyword + vector, fused with reciprocal rank fusion
+    retriever = HybridRetriever(vector_store=get_vector_search(graph, neo4jvector), graph=graph, retrieval_query=RETRIEVAL_QUERY)
     document_qa_chain = create_stuff_documents_chain(llm, prompt)
-    document_retriever = create_retrieval_chain(retriever, document_qa_chain)
+    return create_retrieval_chain(retriever, document_qa_chain)
 
-except Exception as e:
-    print(f"Error setting up vector search: {e}")
-    document_retriever = None
 
 def get_document(action_input):
+    document_retriever = get_document_retriever()
+    if document_retriever is None:
+        return {"error": "Document search is not available right now."}
     try:
         if isinstance(action_input, str):
             return document_retriever.invoke({"input": action_input})
@@ -99,4 +122,20 @@ def get_document(action_input):
         else:
             return {"error": "Invalid input format for document search."}
     except Exception as e:
-        return {"error": f"Search failed: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Search failed: {str(e)}"}
+
+async def aget_document(action_input):
+    """Async counterpart of get_document"""
+    document_retriever = get_document_retriever()
+    if document_retriever is None:
+        return {"error": "Document search is not available right now."}
+    try:
+        if isinstance(action_input, str):
+            return await document_retriever.ainvoke({"input": action_input})
+        elif isinstance(action_input, dict):
+            query = action_input.get("query", "")
+            return await document_retriever.ainvoke({"input": query})
+        else:
+            return {"error": "Invalid input format for document search."}
+    except Exception as e:
+        return {"error": f"Search failed: {str(e)}"}
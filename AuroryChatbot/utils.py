@@ -1,3 +1,6 @@
+import functools
+import time
+
 import streamlit as st
 from streamlit.runtime.scriptrunner.script_run_context import get_script_run_ctx
 
@@ -15,4 +18,48 @@ def write_message(role, content, save = True):
         st.markdown(content)
 
 def get_session_id():
-    return get_script_run_ctx().session_id
\ No newline at end of file
+    return get_script_run_ctx().session_id
+
+def get_setting(name, default=None):
+    """
+    Reads an optional setting from st.secrets and falls back to the
+    default when the key (or the whole secrets file) is missing
+    """
+    try:
+        return st.secrets[name]
+    except (KeyError, FileNotFoundError):
+        return default
+
+
+# Son kurulum hatası, kaynak adına göre (arayüzde göstermek için)
+resource_errors = {}
+
+def lazy_resource(name, retry_seconds=30):
+    """
+    Turns a builder into a lazily built, process-wide singleton (st.cache_resource).
+    A failed build is not cached: the getter returns None, keeps the error in
+    resource_errors and only retries after retry_seconds.
+    """
+    def decorator(build):
+        cached_build = st.cache_resource(show_spinner=False)(build)
+        failed_at = None
+
+        @functools.wraps(build)
+        def getter():
+            nonlocal failed_at
+            if failed_at is not None and time.monotonic() - failed_at < retry_seconds:
+                return None
+            try:
+                resource = cached_build()
+            except Exception as e:
+                failed_at = time.monotonic()
+                resource_errors[name] = str(e)
+                print(f"❌ {name} unavailable: {e}")
+                return None
+            failed_at = None
+            resource_errors.pop(name, None)
+            return resource
+
+        getter.clear = cached_build.clear
+        return getter
+    return decorator
@@ -1,6 +1,7 @@
 import requests
 import time
 import csv
+import os
 from datetime import datetime
 
 # Koleksiyon tanımları
@@ -68,11 +69,14 @@ def get_magic_eden_stats(collection_symbol):
     return stats
 
 def save_to_csv(data, filename="aurory_nft_stats.csv"):
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
+    # Her çalıştırma dosyanın sonuna eklenir; önceki anlık görüntüler silinmez
+    write_header = not os.path.exists(filename) or os.path.getsize(filename) == 0
+    with open(filename, 'a', newline='', encoding='utf-8') as f:
         fieldnames = ["collection", "floor_price_SOL", "trade_volume_SOL", 
                       "mint_rate_events_per_sec", "last_mint_time", "timestamp"]
         writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+        if write_header:
+            writer.writeheader()
         
         current_time = datetime.utcnow().isoformat()
         for collection, stats in data.items():
@@ -86,7 +90,7 @@ def save_to_csv(data, filename="aurory_nft_stats.csv"):
             }
             writer.writerow(row)
     
-    print(f"\n💾 Veriler {filename} dosyasına kaydedildi")
+    print(f"\n💾 Veriler {filename} dosyasına eklendi")
 
 def format_stat_value(value, format_str=".4f"):
     if value is None:
@@ -0,0 +1,256 @@
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+# Öncelik sırasıyla olay türleri ve anahtar kelimeleri ('nft' ile ilgili sınıflandırma kaldırıldı)
+EVENT_TYPES = (
+    ("partnership", ("partnership", "collaboration", "team up")),
+    ("product_update", ("update", "upgrade", "new feature")),
+    ("tokenomics", ("token", "airdrop", "staking", "aury", "xaury", "nerite", "ember", "wisdom")),
+    ("game_event", ("tournament", "competition", "event")),
+)
+EVENT_TYPE_SCORES = {
+    "partnership": 4,
+    "tokenomics": 5,
+    "product_update": 3,
+    "game_event": 2,
+    "general": 1,
+}
+NEWS_HIGH_IMPACT_WORDS = ("major", "significant", "launch", "million", "billion", "funding", "risk", "threat", "vulnerability")
+
+# Aurory ekosistemine özgü token isimleri
+TOKEN_KEYWORDS = ("aury", "aurory", "token", "coin", "xaury", "nerite", "ember", "wisdom")
+TWEET_HIGH_IMPACT_WORDS = ("price", "market", "value", "pump", "dump", "bullish", "bearish", "risk", "exploit")
+POSITIVE_WORDS = ("good", "great", "buy", "strong", "up", "moon", "bullish")
+NEGATIVE_WORDS = ("bad", "sell", "weak", "down", "bearish", "scam", "rug pull")
+
+KEYWORDS = list(dict.fromkeys(
+    [word for _, words in EVENT_TYPES for word in words]
+    + list(NEWS_HIGH_IMPACT_WORDS) + list(TOKEN_KEYWORDS) + list(TWEET_HIGH_IMPACT_WORDS)
+    + list(POSITIVE_WORDS) + list(NEGATIVE_WORDS)
+))
+KEYWORD_IDS = {word: i for i, word in enumerate(KEYWORDS)}
+
+
+def inflections(word: str) -> list:
+    """The word and its s/es/ed/ing forms; a final 'e' is dropped before ed/ing ('update' -> 'updated', 'updating')"""
+    stem = word[:-1] if word.endswith("e") else word
+    return list(dict.fromkeys([word, word + "s", word + "es", stem + "ed", stem + "ing"]))
+
+
+def _ids(words: Iterable[str]) -> np.ndarray:
+    return np.array([KEYWORD_IDS[word] for word in words])
+
+
+_EVENT_TYPE_IDS = [(name, _ids(words)) for name, words in EVENT_TYPES]
+_NEWS_HIGH_IMPACT_IDS = _ids(NEWS_HIGH_IMPACT_WORDS)
+_TOKEN_IDS = _ids(TOKEN_KEYWORDS)
+_TWEET_HIGH_IMPACT_IDS = _ids(TWEET_HIGH_IMPACT_WORDS)
+_POSITIVE_IDS = _ids(POSITIVE_WORDS)
+_NEGATIVE_IDS = _ids(NEGATIVE_WORDS)
+
+
+# Anahtar kelimeler kelime sınırlarıyla eşleşir ('up', 'update' içinde eşleşmez), çekimli biçimleriyle
+# ("launched", "updated", "pumping"). Eski alt dize aramasından farkı: kelime içi geçişler ("tokenomics" ->
+# "token") ve kökü başka türlü değişen biçimler ("staked" -> "staking") eşleşmez.
+# Her biçim bir tabloda: kelimenin kendisi, çok kelimeli ifadenin ("team up") ilk kelimesi ya da son kelimesi
+_FORMS = {}
+for _word in KEYWORDS:
+    _parts = _word.split()
+    if len(_parts) == 1:
+        for _form in inflections(_word):
+            _FORMS.setdefault(_form, {})["word"] = KEYWORD_IDS[_word]
+    else:
+        assert len(_parts) == 2, f"only two-word keywords are supported: {_word}"
+        _FORMS.setdefault(_parts[0], {})["first"] = KEYWORD_IDS[_word]
+        for _form in inflections(_parts[1]):
+            _FORMS.setdefault(_form, {})["last"] = KEYWORD_IDS[_word]
+
+_FORM_WIDTH = 16  # biçimler 2 × uint64 olarak paketlenir
+assert max(map(len, _FORMS)) <= _FORM_WIDTH and all(form.isascii() for form in _FORMS)
+_FORM_LENGTHS = (min(map(len, _FORMS)), max(map(len, _FORMS)))
+_FORM_WORD_IDS, _FORM_FIRST_IDS, _FORM_LAST_IDS = (
+    np.array([roles.get(role, -1) for roles in _FORMS.values()]) for role in ("word", "first", "last")
+)
+
+# Metin bayt dizisine çevrilir: ASCII küçük harfe katlanır, ASCII olmayan her karakter tek bir bayta iner
+# (kelime karakteri 0x80, boşluk ' ', diğerleri 0x01), böylece kelime sınırları re'nin \\w / \\s tanımıyla aynıdır
+_LOWER_BYTES = np.arange(256, dtype=np.uint8)
+_LOWER_BYTES[ord("A"):ord("Z") + 1] += 32
+_WORD_BYTES = np.zeros(256, dtype=bool)
+_WORD_BYTES[[ord(c) for c in "abcdefghijklmnopqrstuvwxyz0123456789_"]] = True
+_WORD_BYTES[0x80] = True
+_SPACE_BYTES = np.zeros(256, dtype=bool)
+_SPACE_BYTES[[ord(c) for c in map(chr, range(128)) if c.isspace()]] = True
+_ROW_SEPARATOR = "\x00"
+_CHUNK_ROWS = 50_000
+# Boşlukla ayrılan iki kelimeli ifadelerde bundan uzun boşluklar tek tek denetlenir
+_MAX_VECTOR_GAP = 32
+
+# Bir kelimenin ilk k baytını bırakan maskeler (k = 0..8)
+_BYTE_MASKS = np.array([(1 << (8 * k)) - 1 for k in range(9)], dtype=np.uint64)
+
+
+def _pack(data: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    """
+    First 16 bytes of each token as two little-endian uint64 words, zero
+    padded; data must end with at least 16 padding bytes. Reads 8 bytes at
+    every token start through one unaligned uint64 view of the buffer.
+    """
+    at = np.ndarray(shape=(len(data) - 7,), dtype="<u8", buffer=data, strides=(1,))
+    low = at[starts] & _BYTE_MASKS[np.minimum(lengths, 8)]
+    high = at[starts + 8] & _BYTE_MASKS[np.clip(lengths - 8, 0, 8)]
+    return low, high
+
+
+def _form_table():
+    """
+    Packed forms and a collision-free multiplicative hash table over them,
+    so looking a token up is one multiply, one shift and one gather.
+    """
+    forms = list(_FORMS)
+    lengths = np.array([len(form) for form in forms])
+    data = np.frombuffer(b"".join(form.encode("ascii") for form in forms) + bytes(_FORM_WIDTH), dtype=np.uint8)
+    low, high = _pack(data, np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    mixed = low * np.uint64(0x9E3779B97F4A7C15) ^ high
+    bits = max(8, int(np.ceil(np.log2(len(forms)))) + 5)
+    rng = np.random.default_rng(0)
+    for multiplier in rng.integers(1, 1 << 63, size=1000, dtype=np.uint64) * np.uint64(2) + np.uint64(1):
+        slots = (mixed * multiplier) >> np.uint64(64 - bits)
+        if len(np.unique(slots)) == len(forms):
+            table = np.full(1 << bits, -1)
+            table[slots.astype(np.int64)] = np.arange(len(forms))
+            return multiplier, np.uint64(64 - bits), table, low, high
+    raise RuntimeError("no collision-free hash for the keyword forms")
+
+
+_HASH_MULTIPLIER, _HASH_SHIFT, _HASH_TABLE, _FORM_LOWS, _FORM_HIGHS = _form_table()
+
+
+def _text_codes(text: str) -> np.ndarray:
+    """One byte per character of the text, followed by 16 padding bytes"""
+    if text.isascii():
+        raw = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    else:
+        points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        raw = np.minimum(points, 0x80).astype(np.uint8)
+        other = np.flatnonzero(points >= 0x80)
+        chars, inverse = np.unique(points[other], return_inverse=True)
+        classes = np.array([
+            0x80 if ch.isalnum() else 0x20 if ch.isspace() else 0x01 for ch in map(chr, chars.tolist())
+        ], dtype=np.uint8)
+        raw[other] = classes[inverse]
+    codes = np.zeros(len(raw) + _FORM_WIDTH, dtype=np.uint8)
+    codes[:len(raw)] = _LOWER_BYTES[raw]
+    return codes
+
+
+def _whitespace_gaps(codes: np.ndarray, gap_starts: np.ndarray, gap_ends: np.ndarray) -> np.ndarray:
+    """Whether each codes[gap_starts[i]:gap_ends[i]] is whitespace only"""
+    lengths = gap_ends - gap_starts
+    short = lengths <= _MAX_VECTOR_GAP
+    ok = np.ones(len(lengths), dtype=bool)
+    for k in range(int(lengths[short].max(initial=0))):
+        ok &= (lengths <= k) | ~short | _SPACE_BYTES[codes[np.minimum(gap_starts + k, len(codes) - 1)]]
+    for i in np.flatnonzero(~short):
+        ok[i] = _SPACE_BYTES[codes[gap_starts[i]:gap_ends[i]]].all()
+    return ok
+
+
+def _chunk_matrix(texts: List[str], matrix: np.ndarray):
+    codes = _text_codes(_ROW_SEPARATOR.join(texts))
+    text_codes = codes[:-_FORM_WIDTH]
+    separators = np.flatnonzero(text_codes == 0)
+    if len(separators) != len(texts) - 1:
+        # Metnin kendisinde NUL karakteri var
+        return _chunk_matrix([t.replace(_ROW_SEPARATOR, " ") for t in texts], matrix)
+
+    # Kelimeler: kelime baytlarının kesintisiz dizileri
+    is_word = np.zeros(len(codes) + 1, dtype=bool)
+    is_word[1:] = _WORD_BYTES[codes]
+    edges = np.flatnonzero(is_word[1:] != is_word[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    lengths = ends - starts
+    candidates = np.flatnonzero((lengths >= _FORM_LENGTHS[0]) & (lengths <= _FORM_LENGTHS[1]))
+    low, high = _pack(codes, starts[candidates], lengths[candidates])
+    forms = _HASH_TABLE[((low * np.uint64(0x9E3779B97F4A7C15) ^ high) * _HASH_MULTIPLIER >> _HASH_SHIFT).astype(np.int64)]
+    found = forms >= 0
+    found[found] = (_FORM_LOWS[forms[found]] == low[found]) & (_FORM_HIGHS[forms[found]] == high[found])
+    tokens, forms = candidates[found], forms[found]
+    rows = np.searchsorted(separators, starts[tokens])
+
+    words = _FORM_WORD_IDS[forms]
+    matrix[rows[words >= 0], words[words >= 0]] = True
+
+    # İki kelimeli ifadeler: ilk kelimenin hemen ardından (yalnız boşlukla ayrılmış) son kelimesi
+    firsts = np.full(len(starts), -1)
+    lasts = np.full(len(starts), -1)
+    firsts[tokens] = _FORM_FIRST_IDS[forms]
+    lasts[tokens] = _FORM_LAST_IDS[forms]
+    pairs = np.flatnonzero((firsts[:-1] >= 0) & (firsts[:-1] == lasts[1:]))
+    pairs = pairs[_whitespace_gaps(text_codes, ends[pairs], starts[pairs + 1])]
+    matrix[np.searchsorted(separators, starts[pairs]), firsts[pairs]] = True
+
+
+def keyword_matrix(texts: pd.Series) -> np.ndarray:
+    """
+    Boolean (len(texts) x len(KEYWORDS)) matrix of the keywords each text mentions.
+
+    Each chunk of texts is joined into one byte array that is split into
+    words and matched against every keyword form in a single vectorized
+    pass (words are packed into integers and looked up in a perfect hash
+    table of the forms), so there is no per-row regex. Non-ASCII text only
+    lower-cases ASCII letters; the keywords are ASCII.
+    """
+    values = texts.fillna("").astype(str).tolist()
+    matrix = np.zeros((len(values), len(KEYWORDS)), dtype=bool)
+    for start in range(0, len(values), _CHUNK_ROWS):
+        _chunk_matrix(values[start:start + _CHUNK_ROWS], matrix[start:start + _CHUNK_ROWS])
+    return matrix
+
+
+def event_types(matrix: np.ndarray) -> np.ndarray:
+    """First matching event type in priority order, 'general' if none"""
+    return np.select(
+        [matrix[:, ids].any(axis=1) for _, ids in _EVENT_TYPE_IDS],
+        [name for name, _ in _EVENT_TYPE_IDS],
+        default="general",
+    )
+
+
+def news_scores(matrix: np.ndarray, types) -> np.ndarray:
+    """Economic impact 1-5: the event type's score plus one per distinct high impact word, capped at 5"""
+    base = pd.Series(types).map(EVENT_TYPE_SCORES).fillna(1).to_numpy(dtype=np.int64)
+    return np.minimum(5, base + matrix[:, _NEWS_HIGH_IMPACT_IDS].sum(axis=1))
+
+
+def tweet_tokens(matrix: np.ndarray) -> list:
+    """Token keywords mentioned by each tweet"""
+    hits = matrix[:, _TOKEN_IDS]
+    return [[TOKEN_KEYWORDS[j] for j in np.flatnonzero(row)] if row.any() else [] for row in hits]
+
+
+def tweet_scores(matrix: np.ndarray, has_tokens=None) -> np.ndarray:
+    """
+    Economic impact 1-5: 2 with a token mention (else 1), +1 per distinct high
+    impact and positive word (capped at 5), then -1 per negative word (floored at 1)
+    """
+    if has_tokens is None:
+        has_tokens = matrix[:, _TOKEN_IDS].any(axis=1)
+    score = np.where(has_tokens, 2, 1)
+    score = np.minimum(5, score + matrix[:, _TWEET_HIGH_IMPACT_IDS].sum(axis=1) + matrix[:, _POSITIVE_IDS].sum(axis=1))
+    return np.maximum(1, score - matrix[:, _NEGATIVE_IDS].sum(axis=1))
+
+
+def classify_news(texts: pd.Series) -> pd.DataFrame:
+    """event_type and economic_significance columns for a column of news texts"""
+    matrix = keyword_matrix(texts)
+    types = event_types(matrix)
+    return pd.DataFrame({"event_type": types, "economic_significance": news_scores(matrix, types)}, index=texts.index)
+
+
+def classify_tweets(texts: pd.Series) -> pd.DataFrame:
+    """tokens and economic_significance columns for a column of tweet texts"""
+    matrix = keyword_matrix(texts)
+    return pd.DataFrame({"tokens": tweet_tokens(matrix), "economic_significance": tweet_scores(matrix)}, index=texts.index)
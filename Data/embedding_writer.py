@@ -0,0 +1,148 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken yoksa yaklaşık sayım kullanılır
+    _encoding = None
+
+try:
+    import openai
+    TRANSIENT_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+except Exception:
+    TRANSIENT_ERRORS = ()
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def is_transient(error: Exception) -> bool:
+    """Rate limits, timeouts and 5xx responses are retried; anything else fails the batch."""
+    if TRANSIENT_ERRORS and isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return getattr(error, "status_code", None) in (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Token-per-minute budget shared by all embedding requests."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self.available = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        # Bütçeden büyük bir parti tek başına tüm kapasiteyi bekler
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+                wait_seconds = (tokens - self.available) / self.rate
+            time.sleep(wait_seconds)
+
+
+class EmbeddingWriter:
+    """
+    Embeds rows in token-bounded batches, `concurrency` requests at a time
+    under a tokens-per-minute budget, retrying transient errors with
+    exponential backoff. Every finished batch is handed to `write_batch`
+    (on the calling thread) while the following batches are still being
+    embedded, so a failure late in the run keeps everything written so far.
+    """
+
+    def __init__(self, embedding_model, write_batch: Callable[[List[Dict[str, Any]]], None],
+                 max_batch_tokens: int = 8000, max_batch_size: int = 256, concurrency: int = 4,
+                 tokens_per_minute: int = 1_000_000, max_retries: int = 6, text_key: str = "content"):
+        self.embedding_model = embedding_model
+        self.write_batch = write_batch
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.limiter = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.text_key = text_key
+        self.stats = {"docs": 0, "tokens": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+
+    def batches(self, rows):
+        """Groups rows into batches of at most max_batch_tokens tokens and max_batch_size rows."""
+        batch, batch_tokens = [], 0
+        for row in rows:
+            tokens = count_tokens(row[self.text_key])
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(row)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    def _embed(self, batch, tokens):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                embeddings = self.embedding_model.embed_documents([row[self.text_key] for row in batch])
+                break
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                self.stats["retries"] += 1
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                print(f"⚠️ Gömme isteği başarısız ({type(e).__name__}), {delay:.1f}s sonra tekrar denenecek")
+                time.sleep(delay)
+        for row, embedding in zip(batch, embeddings):
+            row["embedding"] = embedding
+        return batch, tokens
+
+    def run(self, rows) -> Dict[str, Any]:
+        """Embeds and writes all rows; returns throughput stats."""
+        start = time.perf_counter()
+        pending = set()
+        batches = self.batches(rows)
+        # Bellek sınırlı kalsın diye en fazla 2 × concurrency parti aynı anda bekler
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding-writer") as executor:
+            try:
+                for batch, tokens in batches:
+                    pending.add(executor.submit(self._embed, batch, tokens))
+                    if len(pending) >= 2 * self.concurrency:
+                        pending = self._write_completed(pending, FIRST_COMPLETED)
+                while pending:
+                    pending = self._write_completed(pending, FIRST_COMPLETED)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+            finally:
+                self.stats["seconds"] = time.perf_counter() - start
+        return self.report()
+
+    def _write_completed(self, pending, return_when):
+        done, pending = wait(pending, return_when=return_when)
+        for future in done:
+            batch, tokens = future.result()
+            self.write_batch(batch)
+            self.stats["docs"] += len(batch)
+            self.stats["tokens"] += tokens
+            self.stats["batches"] += 1
+        return pending
+
+    def report(self) -> Dict[str, Any]:
+        seconds = max(self.stats["seconds"], 1e-9)
+        return {
+            **self.stats,
+            "docs_per_sec": self.stats["docs"] / seconds,
+            "tokens_per_sec": self.stats["tokens"] / seconds,
+        }
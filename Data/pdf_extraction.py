@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+DEFAULT_PDF_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pdf_text")
+# Büyük PDF'ler bu kadar sayfalık görevlere bölünür
+PAGES_PER_TASK = 8
+
+Pages = List[Tuple[int, str]]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_pages(path: str, start: int, end: int) -> Pages:
+    """Text of pages [start, end) of a PDF, as PyPDFLoader extracts it (page numbers start at 0)"""
+    reader = PdfReader(path)
+    return [(page, reader.pages[page].extract_text()) for page in range(start, min(end, len(reader.pages)))]
+
+
+class PdfTextExtractor:
+    """
+    Extracts PDF page text in a process pool, split across files and page
+    ranges, and caches it on disk by content hash. A file whose size and
+    mtime match the last run is not even re-hashed; a touched or renamed
+    file with the same content is still served from the cache.
+    """
+
+    def __init__(self, cache_path: str = DEFAULT_PDF_CACHE_PATH, workers: Optional[int] = None):
+        self.cache_path = cache_path
+        self.workers = workers or os.cpu_count() or 1
+        os.makedirs(cache_path, exist_ok=True)
+        self._index_path = os.path.join(cache_path, "index.json")
+        self._index = {}
+        if os.path.exists(self._index_path):
+            try:
+                with open(self._index_path, encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ PDF metin önbelleği dizini okunamadı, yeniden oluşturulacak: {e}")
+
+    def _content_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        entry = self._index.get(os.path.abspath(path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        sha256 = file_sha256(path)
+        self._index[os.path.abspath(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        return sha256
+
+    def _cached_pages(self, sha256: str) -> Optional[Pages]:
+        try:
+            with open(os.path.join(self.cache_path, f"{sha256}.json"), encoding="utf-8") as f:
+                return [tuple(page) for page in json.load(f)["pages"]]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store_pages(self, sha256: str, pages: Pages):
+        path = os.path.join(self.cache_path, f"{sha256}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"pages": pages}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _save_index(self):
+        with open(self._index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(self._index_path + ".tmp", self._index_path)
+
+    def iter_files(self, paths: List[str]) -> Iterator[Tuple[str, Optional[Pages], Optional[Exception]]]:
+        """
+        Yields (path, pages, error) for every PDF, with pages sorted by page
+        number, or pages None and the error if the file could not be read.
+        Cached files come first; the others as soon as all their pages are done.
+        """
+        uncached, cached = [], 0
+        try:
+            for path in paths:
+                try:
+                    sha256 = self._content_hash(path)
+                    pages = self._cached_pages(sha256)
+                except Exception as e:
+                    yield path, None, e
+                    continue
+                if pages is not None:
+                    cached += 1
+                    yield path, pages, None
+                else:
+                    uncached.append((path, sha256))
+            if uncached:
+                print(f"ℹ️ {cached} PDF önbellekten, {len(uncached)} PDF ayrıştırılacak "
+                      f"({self.workers} süreç)")
+                yield from self._extract(uncached)
+        finally:
+            self._save_index()
+
+    def _extract(self, files: List[Tuple[str, str]]):
+        if self.workers == 1:
+            for path, sha256 in files:
+                try:
+                    pages = extract_pages(path, 0, len(PdfReader(path).pages))
+                except Exception as e:
+                    yield path, None, e
+                    continue
+                self._store_pages(sha256, pages)
+                yield path, pages, None
+            return
+
+        def tasks():
+            for path, sha256 in files:
+                try:
+                    page_count = len(PdfReader(path).pages)
+                except Exception as e:
+                    yield path, sha256, None, e
+                    continue
+                for start in range(0, max(page_count, 1), PAGES_PER_TASK):
+                    yield path, sha256, (start, start + PAGES_PER_TASK, page_count), None
+
+        # Bellek sınırlı kalsın diye en fazla 2 × workers görev aynı anda bekler
+        results: Dict[str, Pages] = {}
+        remaining: Dict[str, int] = {}
+        failed = set()
+        pending = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            def collect(return_when):
+                done, _ = wait(pending, return_when=return_when)
+                for future in done:
+                    path, sha256 = pending.pop(future)
+                    if path in failed:
+                        continue
+                    try:
+                        results[path].extend(future.result())
+                    except Exception as e:
+                        failed.add(path)
+                        results.pop(path, None)
+                        yield path, None, e
+                        continue
+                    remaining[path] -= 1
+                    if remaining[path] == 0:
+                        pages = sorted(results.pop(path))
+                        self._store_pages(sha256, pages)
+                        yield path, pages, None
+
+            for path, sha256, page_range, error in tasks():
+                if error is not None:
+                    yield path, None, error
+                    continue
+                start, end, page_count = page_range
+                if path not in remaining:
+                    remaining[path] = -(-page_count // PAGES_PER_TASK) or 1
+                    results[path] = []
+                pending[executor.submit(extract_pages, path, start, end)] = (path, sha256)
+                if len(pending) >= 2 * self.workers:
+                    yield from collect(FIRST_COMPLETED)
+            while pending:
+                yield from collect(FIRST_COMPLETED)
@@ -0,0 +1,61 @@
+import queue
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Yields lists of at most size items; only one list is held at a time."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def prefetch(iterable: Iterable[T], maxsize: int = 1000) -> Iterator[T]:
+    """
+    Runs the iterable in a background thread and yields its items through a
+    queue of at most maxsize items, so reading and parsing sources overlaps
+    with embedding and writing without the reader running ahead unbounded.
+    An exception in the reader is re-raised in the consumer; if the consumer
+    stops early, the reader thread stops at its next item.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((None, item)):
+                    return
+            put((None, _DONE))
+        except BaseException as e:
+            put((e, None))
+
+    thread = threading.Thread(target=produce, name="ingest-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            error, item = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stop.set()
@@ -1,14 +1,28 @@
+import hashlib
+import itertools
 import os
 import re
+import sys
+import threading
+import uuid
+from collections import OrderedDict
 import pandas as pd
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader
 from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores.neo4j_vector import Neo4jVector
 from langchain.schema import Document
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List
+from classification import (
+    classify_news, classify_tweets, event_types, keyword_matrix, news_scores, tweet_scores, tweet_tokens,
+)
+from embedding_writer import EmbeddingWriter
+from pdf_extraction import DEFAULT_PDF_CACHE_PATH, PdfTextExtractor
+from streaming import batched, prefetch
+
+# Gömme deposu chatbot ile ortak modüldür
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AuroryChatbot"))
+from embedding_store import DEFAULT_STORE_PATH, CachedEmbeddings, EmbeddingStore
 import traceback
 
 # .env dosyasını yükle
@@ -24,14 +38,38 @@ class VectorEmbeddingPipeline:
         self.neo4j_password = os.getenv("NEO4J_PASSWORD")
         openai_api_key = os.getenv("OPENAI_API_KEY")
         
+        # Havuz ayarları chatbot ile aynı değişken adlarıyla okunur
         self.driver = GraphDatabase.driver(
             self.neo4j_uri, 
-            auth=(self.neo4j_user, self.neo4j_password)
+            auth=(self.neo4j_user, self.neo4j_password),
+            max_connection_pool_size=int(os.getenv("NEO4J_MAX_POOL_SIZE", 50)),
+            connection_acquisition_timeout=float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", 30)),
+            max_connection_lifetime=float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", 3600)),
         )
         
-        self.embedding_model = OpenAIEmbeddings(
-            model="text-embedding-ada-002",
-            openai_api_key=openai_api_key
+        # Gömmeler önce chatbot ile paylaşılan disk deposunda aranır; yalnızca eksikler OpenAI'a gider
+        self.embedding_store = EmbeddingStore(
+            "text-embedding-ada-002", os.getenv("EMBEDDING_STORE_PATH", DEFAULT_STORE_PATH)
+        )
+        self.embedding_model = CachedEmbeddings(
+            OpenAIEmbeddings(model="text-embedding-ada-002", openai_api_key=openai_api_key),
+            self.embedding_store,
+        )
+        # Tekrarlanan/şablon sorgular için depodan önce bellekte LRU (sorgu başına disk okuması yok)
+        self.query_embedding_cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+        self._query_embeddings = OrderedDict()
+        self._query_embeddings_lock = threading.Lock()
+        
+        # Okuyucuların bu çalıştırmada gördüğü kaynaklar: "pending" / "complete" / "failed"
+        # Eski parçalar yalnızca tamamen okunan (veya artık diskte olmadığı doğrulanan) kaynaklar için silinir
+        self.source_status = {}
+        # Bu çalıştırmada listelenen PDF klasörleri; bir PDF kaynağının silindiği yalnızca bunlarda doğrulanabilir
+        self.scanned_pdf_folders = []
+        
+        # PDF sayfa metinleri paralel çıkarılır ve içerik özetine göre diskte önbelleklenir
+        self.pdf_extractor = PdfTextExtractor(
+            os.getenv("PDF_CACHE_PATH", DEFAULT_PDF_CACHE_PATH),
+            workers=int(os.getenv("PDF_WORKERS", 0)) or None,
         )
         
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -52,62 +90,75 @@ class VectorEmbeddingPipeline:
             traceback.print_exc()
             return False
 
-    def process_pdf_documents(self, pdf_folder_path: str) -> List[Document]:
+    # CSV dosyaları bu kadar satırlık parçalar halinde okunur
+    CSV_CHUNK_ROWS = 1000
+
+    def iter_pdf_documents(self, pdf_folder_path: str) -> Iterator[Document]:
         """
-       Processes PDF files in the specified folder and returns a list of LangChain Document objects.
+       Yields LangChain Document chunks of the PDF files in the specified folder as their pages are extracted.
        For DAO proposals, it tries to extract the proposal_id from the file name.
         """
-        documents = []
+        count = 0
+        pdf_files = [
+            os.path.join(pdf_folder_path, filename)
+            for filename in sorted(os.listdir(pdf_folder_path)) if filename.endswith('.pdf')
+        ]
+        self.scanned_pdf_folders.append(pdf_folder_path)
+        for file_path in pdf_files:
+            self.source_status[os.path.basename(file_path)] = "pending"
         
-        for filename in os.listdir(pdf_folder_path):
-            if filename.endswith('.pdf'):
-                file_path = os.path.join(pdf_folder_path, filename)
-                try:
-                    proposal_id = None
-                 # Using regex to extract proposal id from file name / Example: "DAİry Proposal #7.docx.pdf" -> "7"
-                    match = re.search(r'#(\d+)', filename) 
+        # Sayfa metinleri süreç havuzunda çıkarılır; değişmemiş PDF'ler önbellekten gelir
+        for file_path, pdf_pages, error in self.pdf_extractor.iter_files(pdf_files):
+            filename = os.path.basename(file_path)
+            if error is not None:
+                print(f"PDF işleme hatası ({filename}): {str(error)}")
+                self.source_status[filename] = "failed"
+                continue
+            try:
+                proposal_id = None
+             # Using regex to extract proposal id from file name / Example: "DAİry Proposal #7.docx.pdf" -> "7"
+                match = re.search(r'#(\d+)', filename) 
+                if match:
+                    proposal_id = match.group(1) 
+                elif 'Proposal' in filename: 
+                    match = re.search(r'Proposal.*?(\d+)', filename, re.IGNORECASE)
                     if match:
-                        proposal_id = match.group(1) 
-                    elif 'Proposal' in filename: 
-                        match = re.search(r'Proposal.*?(\d+)', filename, re.IGNORECASE)
-                        if match:
-                            proposal_id = match.group(1)
-                    
-                    loader = PyPDFLoader(file_path)
-                    pdf_pages = loader.load() # PDF'i sayfalara yükler
+                        proposal_id = match.group(1)
+                
+                for page_number, page_text in pdf_pages:
+                    # Her sayfa içeriğini parçalara ayırır
+                    chunks = self.text_splitter.split_text(page_text)
                     
-                    for page in pdf_pages:
-                        # Her sayfa içeriğini parçalara ayırır
-                        chunks = self.text_splitter.split_text(page.page_content)
+                    for i, chunk in enumerate(chunks):
+                        # Her parça için meta verileri oluşturur
+                        metadata = {
+                            "source": filename,
+                            "page": page_number,
+                            "doc_type": "dao_proposal", # Belge türü olarak DAO önerisi
+                            "chunk_index": i,
+                            "proposal_id": proposal_id  # Çıkarılan proposal_id
+                        }
                         
-                        for i, chunk in enumerate(chunks):
-                            # Her parça için meta verileri oluşturur
-                            metadata = {
-                                "source": filename,
-                                "page": page.metadata["page"],
-                                "doc_type": "dao_proposal", # Belge türü olarak DAO önerisi
-                                "chunk_index": i,
-                                "proposal_id": proposal_id  # Çıkarılan proposal_id
-                            }
-                            
-                            # LangChain Document formatında belgeyi ekler
-                            documents.append(Document(
-                                page_content=chunk,
-                                metadata=metadata
-                            ))
-                except Exception as e:
-                    print(f"PDF işleme hatası ({filename}): {str(e)}")
-                    traceback.print_exc()
+                        count += 1
+                        yield Document(page_content=chunk, metadata=metadata)
+                self.source_status[filename] = "complete"
+            except Exception as e:
+                print(f"PDF işleme hatası ({filename}): {str(e)}")
+                traceback.print_exc()
+                self.source_status[filename] = "failed"
         
-        print(f"✅ {len(documents)} PDF parçası işlendi")
-        return documents
+        print(f"✅ {count} PDF parçası işlendi")
 
-    def process_csv_data(self, csv_files: List[str]) -> List[Document]:
+    def process_pdf_documents(self, pdf_folder_path: str) -> List[Document]:
+        """Processes PDF files in the specified folder and returns a list of LangChain Document objects."""
+        return list(self.iter_pdf_documents(pdf_folder_path))
+
+    def iter_csv_documents(self, csv_files: List[str]) -> Iterator[Document]:
         """
-           Processes the specified CSV files and returns a list of LangChain Document objects.
+           Yields LangChain Document objects of the specified CSV files, reading CSV_CHUNK_ROWS rows at a time.
            Calls custom processing methods based on file name (news or tweet).
         """
-        documents = []
+        count = 0
         
         for csv_file in csv_files:
             try:
@@ -116,201 +167,318 @@ class VectorEmbeddingPipeline:
                     print(f"⚠️ Atlandı: '{csv_file}' bir CSV dosyası değil.")
                     continue
 
-                df = pd.read_csv(csv_file)
-                
                 if 'news' in csv_file.lower():
-                    docs = self._process_news_csv(df, csv_file)
+                    process_rows = self._process_news_csv
                 elif 'tweet' in csv_file.lower():
-                    docs = self._process_tweet_csv(df, csv_file)
+                    process_rows = self._process_tweet_csv
                 else:
                     print(f"⚠️ Bilinmeyen CSV türü: {csv_file}")
                     continue
-                    
-                documents.extend(docs) # İşlenen belgeleri ana listeye ekle
+
+                self.source_status[csv_file] = "pending"
+                for df in pd.read_csv(csv_file, chunksize=self.CSV_CHUNK_ROWS):
+                    docs = process_rows(df, csv_file)
+                    count += len(docs)
+                    yield from docs
+                self.source_status[csv_file] = "complete"
                 
             except Exception as e:
                 print(f"CSV işleme hatası ({csv_file}): {str(e)}")
                 traceback.print_exc()
+                # Yarıda kalan dosyanın okunamayan satırları silinmesin
+                self.source_status[csv_file] = "failed"
         
-        print(f"✅ {len(documents)} CSV parçası işlendi")
-        return documents
+        print(f"✅ {count} CSV parçası işlendi")
+
+    def process_csv_data(self, csv_files: List[str]) -> List[Document]:
+        """Processes the specified CSV files and returns a list of LangChain Document objects."""
+        return list(self.iter_csv_documents(csv_files))
+
+    @staticmethod
+    def _column(df: pd.DataFrame, name: str) -> pd.Series:
+        return df[name] if name in df.columns else pd.Series("", index=df.index)
 
     def _process_news_csv(self, df: pd.DataFrame, source_file: str) -> List[Document]:
-    """Processes News CSV data and returns Document objects."""
-        documents = []
+        """Processes News CSV data column-wise and returns Document objects."""
+        titles = self._column(df, 'title')
+        # Haber başlığı ve içeriğini birleştirir
+        contents = "Başlık: " + titles.astype(str) + "\n\n" + self._column(df, 'content').astype(str)
         
-        for _, row in df.iterrows():
-            try:
-                # Haber başlığı ve içeriğini birleştirir
-                content = f"Başlık: {row.get('title', '')}\n\n{row.get('content', '')}"
-                
-                # İçeriği analiz ederek olay türünü ve ekonomik etkiyi belirler
-                event_type = self.classify_event_type(content)
-                economic_impact = self.assess_economic_impact(content, event_type)
-                
-                # Meta verileri oluşturur
-                metadata = {
-                    "source": source_file,
-                    "doc_type": "news",
-                    "title": row.get('title', ''),
-                    "url": row.get('url', ''),
-                    "date": row.get('date', ''),
-                    "event_type": event_type,
-                    "economic_significance": economic_impact # Ekonomik önem puanı
-                }
-                
-                documents.append(Document(
-                    page_content=content,
-                    metadata=metadata
-                ))
-                
-            except Exception as e:
-                print(f"Haber satırı işleme hatası: {str(e)}")
-                continue
+        # İçeriği analiz ederek olay türünü ve ekonomik etkiyi belirler (tüm sütun tek seferde)
+        classified = classify_news(contents)
+        
+        documents = []
+        for content, title, url, date, event_type, economic_impact in zip(
+            contents.tolist(), titles.tolist(), self._column(df, 'url').tolist(), self._column(df, 'date').tolist(),
+            classified["event_type"].tolist(), classified["economic_significance"].tolist(),
+        ):
+            # Meta verileri oluşturur
+            metadata = {
+                "source": source_file,
+                "doc_type": "news",
+                "title": title,
+                "url": url,
+                "date": date,
+                "event_type": event_type,
+                "economic_significance": economic_impact # Ekonomik önem puanı
+            }
+            documents.append(Document(page_content=content, metadata=metadata))
         
         return documents
 
     def _process_tweet_csv(self, df: pd.DataFrame, source_file: str) -> List[Document]:
-     """Tweet processes CSV data and returns Document objects."""
-        documents = []
+        """Processes Tweet CSV data column-wise and returns Document objects."""
+        texts = self._column(df, 'text')
+        # Metni olmayan satırlar atlanır
+        df, texts = df[texts.notna()], texts[texts.notna()].astype(str)
         
-        for _, row in df.iterrows():
-            try:
-                content = row.get('text', '')
-                
-                # Tweet'i ekonomik açıdan analiz eder (sadece tokenlar)
-                economy_analysis = self.analyze_tweet_economy(content)
-                # Tweet'in ekonomik etkisini değerlendirir
-                impact_score = self.assess_tweet_impact(content, economy_analysis)
-                
-                # Meta verileri oluşturur
-                metadata = {
-                    "source": source_file,
-                    "doc_type": "tweet",
-                    "tweet_id": row.get('id', ''),
-                    "author": row.get('author', ''),
-                    # LIKES VE RETWEETS KALDIRILDI
-                    "date": row.get('date', ''),
-                    "tokens": economy_analysis.get('tokens', []), # Bahsedilen tokenlar
-                    "economic_significance": impact_score # Ekonomik önem puanı
-                }
-                
-                documents.append(Document(
-                    page_content=content,
-                    metadata=metadata
-                ))
-                
-            except Exception as e:
-                print(f"Tweet satırı işleme hatası: {str(e)}")
-                continue
+        # Tweet'lerin ekonomik analizi (sadece tokenlar) ve etki puanı (tüm sütun tek seferde)
+        classified = classify_tweets(texts)
+        
+        documents = []
+        for content, tweet_id, author, date, tokens, impact_score in zip(
+            texts.tolist(), self._column(df, 'id').tolist(), self._column(df, 'author').tolist(),
+            self._column(df, 'date').tolist(), classified["tokens"].tolist(), classified["economic_significance"].tolist(),
+        ):
+            # Meta verileri oluşturur
+            metadata = {
+                "source": source_file,
+                "doc_type": "tweet",
+                "tweet_id": tweet_id,
+                "author": author,
+                # LIKES VE RETWEETS KALDIRILDI
+                "date": date,
+                "tokens": tokens, # Bahsedilen tokenlar
+                "economic_significance": impact_score # Ekonomik önem puanı
+            }
+            documents.append(Document(page_content=content, metadata=metadata))
         
         return documents
 
+    # Tek metinlik sürümler; toplu sınıflandırma classification modülündeki tek desenle yapılır
     def classify_event_type(self, content: str) -> str:
-      """Determines the type of event by analyzing the content."""
-        content_lower = content.lower()
-        
-        # Anahtar kelimelere dayalı basit sınıflandırma
-        if any(word in content_lower for word in ['partnership', 'collaboration', 'team up']):
-            return 'partnership'
-        elif any(word in content_lower for word in ['update', 'upgrade', 'new feature']):
-            return 'product_update'
-        elif any(word in content_lower for word in ['token', 'airdrop', 'staking', 'aury', 'xaury', 'nerite', 'ember', 'wisdom']):
-            return 'tokenomics'
-        # 'nft' ile ilgili sınıflandırma kaldırıldı
-        elif any(word in content_lower for word in ['tournament', 'competition', 'event']):
-            return 'game_event'
-        else:
-            return 'general'
+        """Determines the type of event by analyzing the content."""
+        return str(event_types(keyword_matrix(pd.Series([content])))[0])
 
     def assess_economic_impact(self, content: str, event_type: str) -> int:
-     """Evaluates the economic impact of a piece of content on a scale of 1-5."""
-        content_lower = content.lower()
-        score = 1
-        
-        # Olay türüne göre temel skor atar
-        type_scores = {
-            'partnership': 4,
-            'tokenomics': 5,
-            'product_update': 3,
-            'game_event': 2,
-            'general': 1
-        }
-        score = type_scores.get(event_type, 1)
-        
-        # Yüksek etki belirten kelimeler için bonus puan ekler
-        high_impact_words = ['major', 'significant', 'launch', 'million', 'billion', 'funding', 'risk', 'threat', 'vulnerability']
-        for word in high_impact_words:
-            if word in content_lower:
-                score = min(5, score + 1) # Skoru 5'i geçmeyecek şekilde artır
-        
-        return score
+        """Evaluates the economic impact of a piece of content on a scale of 1-5."""
+        return int(news_scores(keyword_matrix(pd.Series([content])), [event_type])[0])
 
     def analyze_tweet_economy(self, tweet_text: str) -> Dict[str, Any]:
         """
         Analyzes the economic content of a tweet (only tokens mentioned).
         """
-        tweet_lower = tweet_text.lower()
-        
-        # Aurory ekosistemine özgü token isimleri
-        token_keywords = ['aury', 'aurory', 'token', 'coin', 'xaury', 'nerite', 'ember', 'wisdom']
-        found_tokens = [token for token in token_keywords if token in tweet_lower]
-        
+        tokens = tweet_tokens(keyword_matrix(pd.Series([tweet_text])))[0]
         return {
-            'tokens': list(set(found_tokens)), # Tekrar edenleri kaldır
-            'has_economic_content': len(found_tokens) > 0 # Sadece tokenlar varsa ekonomik içerik var say
+            'tokens': tokens,
+            'has_economic_content': len(tokens) > 0 # Sadece tokenlar varsa ekonomik içerik var say
         }
 
     def assess_tweet_impact(self, tweet_text: str, economy_analysis: Dict[str, Any]) -> int:
         """Evaluates the economic impact of a tweet."""
-        tweet_lower = tweet_text.lower()
-        score = 1
-        
-        # Ekonomik içerik varsa temel skoru artır
-        if economy_analysis.get('has_economic_content', False):
-            score = 2
-        
-        # Yüksek etkili kelimeler için puan artır
-        high_impact_words = ['price', 'market', 'value', 'pump', 'dump', 'bullish', 'bearish', 'risk', 'exploit']
-        for word in high_impact_words:
-            if word in tweet_lower:
-                score = min(5, score + 1)
-        
-        # Duygu analizi (basit anahtar kelime tabanlı)
-        positive_words = ['good', 'great', 'buy', 'strong', 'up', 'moon', ' bullish']
-        negative_words = ['bad', 'sell', 'weak', 'down', 'bearish', 'scam', 'rug pull']
-        
-        for word in positive_words:
-            if word in tweet_lower:
-                score = min(5, score + 1)
-        for word in negative_words:
-            if word in tweet_lower:
-                score = max(1, score - 1) # Skoru 1'in altına düşürme
-        
-        return score
+        matrix = keyword_matrix(pd.Series([tweet_text]))
+        return int(tweet_scores(matrix, [economy_analysis.get('has_economic_content', False)])[0])
+
+    # Parçalar kararlı bir kimlikle (chunk_id) yazılır; içerik değişmediyse yeniden gömülmez
+    UPSERT_BATCH_SIZE = 500
+
+    UPSERT_CHUNKS_QUERY = """
+    UNWIND $rows AS row
+    MERGE (d:Document {chunk_id: row.chunk_id})
+    SET d += row.properties,
+        d.id = row.chunk_id,
+        d.content = row.content,
+        d.content_hash = row.content_hash,
+        d.run_id = $run_id
+    WITH d, row WHERE row.embedding IS NOT NULL
+    CALL db.create.setNodeVectorProperty(d, 'embedding', row.embedding)
+    SET d.updatedAt = timestamp()
+    """
+
+    # Verilen kaynakların bu çalıştırmada üretilmeyen parçaları ve chunk_id'siz eski kopyaları.
+    # Yalnızca tamamen okunan ya da diskten silindiği doğrulanan kaynaklar verilir
+    DELETE_STALE_CHUNKS_QUERY = """
+    MATCH (d:Document)
+    WHERE d.source IN $sources
+      AND (d.chunk_id IS NULL OR d.run_id <> $run_id)
+    CALL {
+        WITH d
+        DETACH DELETE d
+    } IN TRANSACTIONS OF 1000 ROWS
+    """
+
+    @staticmethod
+    def chunk_id(metadata: Dict[str, Any]) -> str:
+        """Stable id of a chunk: source + page + chunk_index (tweet id / url / title for CSV rows)."""
+        if metadata.get("doc_type") == "tweet":
+            position = metadata.get("tweet_id")
+        elif metadata.get("doc_type") == "news":
+            position = metadata.get("url") or metadata.get("title")
+        else:
+            position = metadata.get("page")
+        key = f"{os.path.basename(str(metadata.get('source', '')))}|{position}|{metadata.get('chunk_index', 0)}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    def store_documents_in_neo4j(self, documents: List[Document]):
+    @staticmethod
+    def _node_properties(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        # Neo4j özellikleri null (ve pandas NaN) tutamaz
+        return {
+            key: value for key, value in metadata.items()
+            if value is not None and not (isinstance(value, float) and value != value)
+        }
+
+    def _chunk_rows(self, documents: List[Document]) -> List[Dict[str, Any]]:
+        rows = {}
+        for document in documents:
+            # Aynı kimliğe sahip tekrar eden satırlarda sonuncusu geçerlidir
+            chunk_id = self.chunk_id(document.metadata)
+            rows[chunk_id] = {
+                "chunk_id": chunk_id,
+                "content": document.page_content,
+                "content_hash": self.content_hash(document.page_content),
+                "properties": self._node_properties(document.metadata),
+                "embedding": None,
+            }
+        return list(rows.values())
+
+    def store_documents_in_neo4j(self, documents: Iterable[Document]) -> int:
         """
-        Saves the processed documents to Neo4j and creates the vector index.
+        Streams the processed chunks into Neo4j, upserting them by their stable chunk_id
+        UPSERT_BATCH_SIZE chunks at a time, so memory does not grow with the corpus and the
+        first chunks are written while later sources are still being read. Only chunks that
+        are new or whose content hash changed are embedded; chunks that were not produced by
+        this run are deleted only for sources read completely in this run, and a source's
+        chunks are dropped entirely only once it is confirmed gone from disk. Creates the vector and full-text indexes. Returns the number
+        of chunks written.
         """
-        print(f"\n--- {len(documents)} belge Neo4j'ye yazılıyor... ---")
+        print("\n--- Belgeler Neo4j'ye yazılıyor... ---")
+        run_id = str(uuid.uuid4())
+        counts = {"chunks": 0, "unchanged": 0, "from_store": 0}
+        dimensions = None
         try:
-            # LangChain'in Neo4jVector sınıfını kullanarak belgeleri kaydeder
-            Neo4jVector.from_documents(
-                documents,
-                self.embedding_model,
-                url=self.neo4j_uri,
-                username=self.neo4j_user,
-                password=self.neo4j_password,
-                index_name="aurory_docs",
-                node_label="Document",
-                text_node_property="content",
-                embedding_node_property="embedding",
-            )
-            print("✅ Tüm belgeler Neo4j'ye başarıyla yazıldı ve vektör indeksi oluşturuldu.")
+            with self.driver.session() as session:
+                session.run(
+                    "CREATE CONSTRAINT document_chunk_id IF NOT EXISTS FOR (d:Document) REQUIRE d.chunk_id IS UNIQUE"
+                ).consume()
+
+                def write_batch(batch):
+                    nonlocal dimensions
+                    session.execute_write(
+                        lambda tx: tx.run(self.UPSERT_CHUNKS_QUERY, rows=batch, run_id=run_id).consume()
+                    )
+                    if dimensions is None:
+                        dimensions = next((len(row["embedding"]) for row in batch if row["embedding"] is not None), None)
+
+                def rows_to_embed():
+                    # Her pencere için: değişmeyenler ve depoda bulunanlar hemen yazılır, kalanlar gömülmeye gider
+                    for window in batched(documents, self.UPSERT_BATCH_SIZE):
+                        rows = self._chunk_rows(window)
+                        stored = {
+                            record["chunk_id"]: record["content_hash"]
+                            for record in session.run(
+                                "UNWIND $ids AS id MATCH (d:Document {chunk_id: id}) "
+                                "WHERE d.embedding IS NOT NULL RETURN d.chunk_id AS chunk_id, d.content_hash AS content_hash",
+                                ids=[row["chunk_id"] for row in rows],
+                            )
+                        }
+                        unchanged = [row for row in rows if stored.get(row["chunk_id"]) == row["content_hash"]]
+                        to_embed = [row for row in rows if stored.get(row["chunk_id"]) != row["content_hash"]]
+
+                        # Daha önce (başka bir veritabanı için bile) gömülmüş metinler diskten okunur
+                        stored_vectors = self.embedding_store.get_many([row["content"] for row in to_embed])
+                        for row, vector in zip(to_embed, stored_vectors):
+                            row["embedding"] = vector
+                        from_store = [row for row in to_embed if row["embedding"] is not None]
+
+                        # Değişmeyen parçalar yalnızca damgalanır (gömme yok)
+                        if unchanged or from_store:
+                            write_batch(unchanged + from_store)
+                        counts["chunks"] += len(rows)
+                        counts["unchanged"] += len(unchanged)
+                        counts["from_store"] += len(from_store)
+                        yield from (row for row in to_embed if row["embedding"] is None)
+
+                # Yeni/değişmiş parçalar gömülürken tamamlanan partiler hemen yazılır
+                writer = EmbeddingWriter(
+                    self.embedding_model, write_batch,
+                    max_batch_tokens=int(os.getenv("EMBED_BATCH_TOKENS", 8000)),
+                    concurrency=int(os.getenv("EMBED_CONCURRENCY", 4)),
+                    tokens_per_minute=int(os.getenv("EMBED_TOKENS_PER_MINUTE", 1_000_000)),
+                )
+                report = writer.run(rows_to_embed())
+                print(f"ℹ️ {counts['chunks']} parça: {counts['unchanged']} değişmedi, "
+                      f"{counts['from_store']} gömme deposundan, {report['docs']} OpenAI'dan")
+                if report["docs"]:
+                    print(f"✅ {report['docs']} parça gömüldü ve yazıldı: {report['batches']} parti, "
+                          f"{report['docs_per_sec']:.1f} belge/s, {report['tokens_per_sec']:.0f} token/s, "
+                          f"{report['retries']} tekrar deneme")
+
+                # Akış bittiğinde okuyucular her kaynağın durumunu kaydetmiştir. Eski parçalar yalnızca
+                # tamamen okunan kaynaklar ve diskten silindiği doğrulanan kaynaklar için silinir; hata
+                # veren, yarıda kalan ya da bu çalıştırmada hiç okunmayan kaynaklara dokunulmaz.
+                completed_sources = sorted(
+                    source for source, status in self.source_status.items() if status == "complete"
+                )
+                protected_sources = sorted(set(self.source_status) - set(completed_sources))
+                if protected_sources:
+                    print(f"⚠️ Tamamen okunamayan {len(protected_sources)} kaynağın eski parçaları korunuyor: "
+                          f"{', '.join(os.path.basename(source) for source in protected_sources)}")
+                vanished_sources = self._vanished_sources(session)
+                if vanished_sources:
+                    print(f"🧹 Diskte artık olmayan {len(vanished_sources)} kaynak kaldırılıyor: "
+                          f"{', '.join(os.path.basename(source) for source in vanished_sources)}")
+                if completed_sources or vanished_sources:
+                    deleted = session.run(
+                        self.DELETE_STALE_CHUNKS_QUERY, run_id=run_id, sources=completed_sources + vanished_sources
+                    ).consume().counters.nodes_deleted
+                    print(f"🧹 {deleted} eski/kaynağı silinmiş parça silindi")
+
+                if dimensions is not None:
+                    session.run(
+                        "CREATE VECTOR INDEX aurory_docs IF NOT EXISTS FOR (d:Document) ON (d.embedding) "
+                        "OPTIONS {indexConfig: {`vector.dimensions`: $dimensions, `vector.similarity_function`: 'cosine'}}",
+                        dimensions=dimensions,
+                    ).consume()
+                # Chatbot'un hibrit (anahtar kelime + vektör) araması için tam metin indeksi
+                session.run("""
+                CREATE FULLTEXT INDEX aurory_docs_keyword IF NOT EXISTS
+                FOR (n:Document) ON EACH [n.content, n.title]
+                """).consume()
+            print("✅ Belgeler Neo4j'ye yazıldı; vektör ve tam metin indeksleri hazır.")
         except Exception as e:
             print(f"❌ Belgeleri Neo4j'ye kaydetme hatası: {str(e)}")
             traceback.print_exc()
+        finally:
+            self.source_status = {}
+            self.scanned_pdf_folders = []
+        return counts["chunks"]
+
+    def _vanished_sources(self, session) -> List[str]:
+        """
+        Sources in Neo4j that this run did not read and that are confirmed gone
+        from disk: a PDF missing from every PDF folder listed in this run, or a
+        CSV whose absolute path no longer exists. Anything else is kept.
+        """
+        records = session.run(
+            "MATCH (d:Document) WHERE d.source IS NOT NULL AND NOT d.source IN $seen "
+            "RETURN DISTINCT d.source AS source",
+            seen=list(self.source_status),
+        )
+        vanished = []
+        for source in (record["source"] for record in records):
+            if source.lower().endswith(".pdf") and os.path.basename(source) == source:
+                gone = bool(self.scanned_pdf_folders) and not any(
+                    os.path.exists(os.path.join(folder, source)) for folder in self.scanned_pdf_folders
+                )
+            else:
+                gone = os.path.isabs(source) and not os.path.exists(source)
+            if gone:
+                vanished.append(source)
+        return sorted(vanished)
 
     def create_document_relationships(self):
         """
@@ -385,90 +553,261 @@ class VectorEmbeddingPipeline:
             print(f"❌ Belge ilişkileri oluşturma hatası: {str(e)}")
             traceback.print_exc()
 
-    def semantic_search(self, query_text: str, limit: int = 5, filters: Dict[str, Any] = None, score_threshold: float = 0.65) -> List[Document]:
-      # Performs semantic search based on the specified query text and applies optional filters.
-        try:
-            
-            vector_store = Neo4jVector.from_existing_index(
-                embedding=self.embedding_model,
-                url=self.neo4j_uri,
-                username=self.neo4j_user,
-                password=self.neo4j_password,
-                index_name="aurory_docs",
-                text_node_property="content",
-                embedding_node_property="embedding",
-     
-                retrieval_query="""
-                    RETURN node.content AS text, score, {
-                        source: node.source,
-                        page: node.page,
-                        doc_type: node.doc_type,
-                        chunk_index: node.chunk_index,
-                        proposal_id: node.proposal_id,
-                        title: node.title,
-                        url: node.url,
-                        date: node.date,
-                        event_type: node.event_type,
-                        economic_significance: node.economic_significance,
-                        tweet_id: node.tweet_id,
-                        author: node.author,
-                        // LIKES VE RETWEETS KALDIRILDI
-                        tokens: node.tokens
-                    } AS metadata
-                """
-            )
-
-# Performs similarity search. First we get more candidates (limit * 5 or more),
-# because there may not be enough results after filtering.
-# This part only works based on vector similarity.
-            docs_and_scores = vector_store.similarity_search_with_score(query_text, k=limit * 5) 
+        # İlişkiler değişti; belgelerdeki kopyalar yenilenir
+        self.materialize_retrieval_metadata()
 
-            filtered_results = []
-            for doc, score in docs_and_scores:
+    def materialize_retrieval_metadata(self, batch_size: int = 500):
+        """
+        Copies the related tokens, proposals, NFTs and game mechanics of every Document
+        onto the Document itself, so the chatbot's retrieval query is a flat property read.
+        Must be re-run whenever those relationships (or the related nodes) change.
+        """
+        # Neo4j özellikleri map listesi tutamaz; listeler paralel diziler olarak saklanır
+        query = """
+        MATCH (d:Document)
+        CALL {
+            WITH d
+            WITH d,
+                [ (t:Token)<-[:DISCUSSES]-(d) | t.name ] +
+                [ (t:Token)<-[:REFERENCES]-(d) | t.name ] +
+                [ (t:Token)<-[:POTENTIAL_IMPACT]-(d) | t.name ] AS tokens,
+                [ (p:Proposal)<-[:DESCRIBES]-(d) | p ] AS proposals,
+                [ (n:NftItem)<-[:ABOUT]-(d) | n ] AS nfts,
+                [ (g:GameMechanic)<-[:MENTIONS]-(d) | g ] AS mechanics
+            SET d.tokensMentioned = [name IN tokens WHERE name IS NOT NULL],
+                d.proposalIds = [p IN proposals | coalesce(toString(p.proposalId), '')],
+                d.proposalTitles = [p IN proposals | coalesce(p.title, '')],
+                d.nftIds = [n IN nfts | coalesce(toString(n.id), '')],
+                d.nftStatuses = [n IN nfts | coalesce(n.status, '')],
+                d.nftPricesSOL = [n IN nfts | coalesce(toFloat(n.priceSOL), -1.0)],
+                d.mechanicNames = [g IN mechanics | coalesce(g.name, '')],
+                d.mechanicDescriptions = [g IN mechanics | coalesce(g.description, '')],
+                d.sourceUrl = CASE
+                    WHEN d.docType = 'news' THEN 'https://aurorydocs.xyz/news/' + d.id
+                    WHEN d.docType = 'tweet' THEN 'https://twitter.com/tweet/' + d.tweet_id
+                    WHEN d.docType = 'dao_proposal' THEN 'https://gov.aurory.io/proposal/' + toString(d.proposalId)
+                    ELSE d.source
+                END,
+                d.retrievalMetadataAt = datetime()
+        } IN TRANSACTIONS OF $batch_size ROWS
+        """
+        try:
+            # CALL {} IN TRANSACTIONS yalnızca örtük (auto-commit) işlemde çalışır
+            with self.driver.session() as session:
+                summary = session.run(query, batch_size=batch_size).consume()
+            print(f"✅ Retrieval metadata materialized ({summary.counters.properties_set} properties)")
+        except Exception as e:
+            print(f"❌ Retrieval metadata oluşturma hatası: {str(e)}")
+            traceback.print_exc()
 
-                if score < score_threshold:
-                    continue
+    def mark_dataset_version(self):
+        """
+        Stamps a new dataset version in Neo4j so the chatbot drops caches built on the previous data.
+        """
+        try:
+            with self.driver.session() as session:
+                record = session.run("""
+                MERGE (m:DatasetVersion {name: 'aurory'})
+                SET m.version = toString(datetime()), m.updatedAt = datetime()
+                RETURN m.version AS version
+                """).single()
+                print(f"✅ Veri seti sürümü güncellendi: {record['version']}")
+        except Exception as e:
+            print(f"❌ Veri seti sürümü güncellenemedi: {str(e)}")
+            traceback.print_exc()
 
+    # Arama sonucundaki metadata; filtreler de aynı düğüm özellikleri üzerinde çalışır
+    SEARCH_RESULT = """
+        node.content AS text, score, {
+            source: node.source,
+            page: node.page,
+            doc_type: node.doc_type,
+            chunk_index: node.chunk_index,
+            proposal_id: node.proposal_id,
+            title: node.title,
+            url: node.url,
+            date: node.date,
+            event_type: node.event_type,
+            economic_significance: node.economic_significance,
+            tweet_id: node.tweet_id,
+            author: node.author,
+            // LIKES VE RETWEETS KALDIRILDI
+            tokens: node.tokens
+        } AS metadata
+    """
+    SEARCH_ORDER = " ORDER BY score DESC, elementId(node) LIMIT $limit"
+    # Filtreye uyan belge sayısı bunun altındaysa doğrudan tam (indekssiz) tarama yapılır
+    EXACT_SCAN_MAX_DOCS = 5000
+    # İndeks sorgusunda k en fazla bu kadar büyütülür, sonra tam taramaya geçilir
+    MAX_INDEX_K = 1000
+
+    @staticmethod
+    def _build_search_filter(filters: Dict[str, Any]):
+        """Turns the semantic_search filters into a Cypher predicate on `node` and its parameters."""
+        clauses, params = [], {}
+        filters = filters or {}
+
+        if filters.get("doc_type") is not None:
+            clauses.append("node.doc_type = $doc_type")
+            params["doc_type"] = filters["doc_type"]
+        if filters.get("economic_significance_min") is not None:
+            clauses.append("coalesce(node.economic_significance, 0) >= $economic_significance_min")
+            params["economic_significance_min"] = filters["economic_significance_min"]
+        if filters.get("proposal_id") is not None:
+            # proposal_id string veya int olarak saklanmış olabilir
+            clauses.append("toString(node.proposal_id) = $proposal_id")
+            params["proposal_id"] = str(filters["proposal_id"])
+        if filters.get("author") is not None:
+            clauses.append("toLower(coalesce(node.author, '')) CONTAINS $author")
+            params["author"] = filters["author"].lower()
+        if filters.get("tokens_mentioned") is not None:
+            clauses.append("any(token IN coalesce(node.tokens, []) WHERE toLower(token) IN $tokens_mentioned)")
+            params["tokens_mentioned"] = [token.lower() for token in filters["tokens_mentioned"]]
+
+        return " AND ".join(clauses), params
 
-                metadata = doc.metadata
-                match_filters = True
+    def semantic_search(self, query_text: str, limit: int = 5, filters: Dict[str, Any] = None, score_threshold: float = 0.65) -> List[Document]:
+        """
+        Semantic search with the filters evaluated inside Neo4j.
+
+        Without filters it is a plain top-`limit` vector index query. With
+        filters, selective ones (at most EXACT_SCAN_MAX_DOCS matching documents)
+        are answered by an exact cosine scan over just the matching documents;
+        broad ones query the vector index, filter on the server and grow k
+        until `limit` hits are found, falling back to the exact scan. Either
+        way the result is the true top `limit` above `score_threshold`.
+        """
+        try:
+            # Sorgu bir kez gömülür, tekrar sorgularda (ve depodan) yeniden kullanılır
+            embedding = self.embed_query(query_text)
+            predicate, params = self._build_search_filter(filters)
+            params.update({"embedding": embedding, "limit": limit, "score_threshold": score_threshold})
 
-                if filters:
-                    if "doc_type" in filters and filters["doc_type"] is not None:
-                        if metadata.get("doc_type") != filters["doc_type"]:
-                            match_filters = False
-                    
-                    if match_filters and "economic_significance_min" in filters and filters["economic_significance_min"] is not None:
-                        if metadata.get("economic_significance", 0) < filters["economic_significance_min"]:
-                            match_filters = False
-                    
-                    if match_filters and "proposal_id" in filters and filters["proposal_id"] is not None:
-                        # proposal_id'nin tipini kontrol et, string veya int olabilir
-                        if str(metadata.get("proposal_id")) != str(filters["proposal_id"]):
-                            match_filters = False
-                    
-                    if match_filters and "author" in filters and filters["author"] is not None:
-                        if filters["author"].lower() not in metadata.get("author", "").lower():
-                            match_filters = False
-                    
-                    if match_filters and "tokens_mentioned" in filters and filters["tokens_mentioned"] is not None:
-                        # Metadata'daki 'tokens' listesini kontrol et
-                        doc_tokens = [t.lower() for t in metadata.get("tokens", [])]
-                        if not any(token.lower() in doc_tokens for token in filters["tokens_mentioned"]):
-                            match_filters = False
-                    
-                if match_filters:
-                    filtered_results.append(doc)
-                
-                if len(filtered_results) >= limit: 
-                    break
-            
-            return filtered_results
+            with self.driver.session() as session:
+                if predicate:
+                    matching = session.run(
+                        f"MATCH (node:Document) WHERE {predicate} RETURN count(node) AS count", params
+                    ).single()["count"]
+                    if matching == 0:
+                        return []
+                    if matching <= self.EXACT_SCAN_MAX_DOCS:
+                        return self._exact_search(session, predicate, params)
+
+                k = limit if not predicate else limit * 4
+                while True:
+                    # `lowest`: filtrelenmemiş k adayın en düşük skoru
+                    records = session.run(
+                        "CALL db.index.vector.queryNodes('aurory_docs', $k, $embedding) YIELD node, score "
+                        "WITH collect({node: node, score: score}) AS hits, min(score) AS lowest "
+                        "UNWIND hits AS hit "
+                        "WITH hit.node AS node, hit.score AS score, lowest "
+                        f"WHERE score >= $score_threshold {('AND ' + predicate) if predicate else ''} "
+                        f"RETURN lowest, {self.SEARCH_RESULT} {self.SEARCH_ORDER}",
+                        {**params, "k": k},
+                    ).data()
+                    if len(records) >= limit or not predicate:
+                        return self._to_documents(records)
+                    # Adaylar zaten eşiğin altına indiyse k'yi büyütmek yeni sonuç getirmez
+                    if records and records[0]["lowest"] < score_threshold:
+                        return self._to_documents(records)
+                    if k >= self.MAX_INDEX_K:
+                        return self._exact_search(session, predicate, params)
+                    k = min(k * 4, self.MAX_INDEX_K)
         except Exception as e:
             print(f"❌ Semantic search hatası: {str(e)}")
             traceback.print_exc()
             return []
 
+    def embed_query(self, query_text: str) -> List[float]:
+        """Embeds a search query: in-memory LRU first, then the shared embedding store."""
+        with self._query_embeddings_lock:
+            embedding = self._query_embeddings.get(query_text)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(query_text)
+                return embedding
+        embedding = self.embedding_model.embed_query(query_text)
+        with self._query_embeddings_lock:
+            self._query_embeddings[query_text] = embedding
+            self._query_embeddings.move_to_end(query_text)
+            while len(self._query_embeddings) > self.query_embedding_cache_size:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+
+    def _exact_search(self, session, predicate: str, params: Dict[str, Any]) -> List[Document]:
+        """Cosine similarity over only the documents matching the filter (no index)."""
+        records = session.run(
+            f"MATCH (node:Document) WHERE {predicate} AND node.embedding IS NOT NULL "
+            "WITH node, vector.similarity.cosine(node.embedding, $embedding) AS score "
+            "WHERE score >= $score_threshold "
+            f"RETURN {self.SEARCH_RESULT} {self.SEARCH_ORDER}",
+            params,
+        ).data()
+        return self._to_documents(records)
+
+    @staticmethod
+    def _to_documents(records) -> List[Document]:
+        return [
+            Document(
+                page_content=record["text"],
+                metadata={key: value for key, value in record["metadata"].items() if value is not None},
+            )
+            for record in records
+        ]
+
+    # Kullanım senaryoları: her biri sabit kalıplı sorgular kullanır, bu yüzden gömmeler önbellekten gelir
+    def get_dao_proposal_info(self, proposal_id: str, limit: int = 3, score_threshold: float = 0.65) -> Dict[str, List[Document]]:
+        """Documents of a DAO proposal and the tweets discussing it."""
+        query = f"Aurory DAO proposal #{proposal_id} details, goals and budget"
+        return {
+            "proposal_docs": self.semantic_search(
+                query, limit=limit, score_threshold=score_threshold,
+                filters={"doc_type": "dao_proposal", "proposal_id": proposal_id},
+            ),
+            "proposal_tweets": self.semantic_search(
+                f"Community reaction to Aurory DAO proposal #{proposal_id}", limit=limit,
+                score_threshold=score_threshold, filters={"doc_type": "tweet"},
+            ),
+        }
+
+    def get_token_market_sentiment(self, token: str, limit: int = 3, score_threshold: float = 0.55) -> Dict[str, List[Document]]:
+        """Tweets and news about a token's price and market sentiment."""
+        query = f"{token} token price, market sentiment and trading"
+        return {
+            "token_tweets": self.semantic_search(
+                query, limit=limit, score_threshold=score_threshold,
+                filters={"doc_type": "tweet", "tokens_mentioned": [token]},
+            ),
+            "token_news": self.semantic_search(
+                query, limit=limit, score_threshold=score_threshold, filters={"doc_type": "news"},
+            ),
+        }
+
+    def get_player_earning_strategies(self, limit: int = 3, score_threshold: float = 0.6) -> Dict[str, List[Document]]:
+        """Earning strategies discussed by players and news on the token economy."""
+        return {
+            "player_strategy_tweets": self.semantic_search(
+                "Aurory player earning strategies, farming and rewards", limit=limit,
+                score_threshold=score_threshold, filters={"doc_type": "tweet"},
+            ),
+            "token_economy_news": self.semantic_search(
+                "Aurory token economy, rewards, staking and tokenomics", limit=limit,
+                score_threshold=score_threshold, filters={"doc_type": "news", "economic_significance_min": 3},
+            ),
+        }
+
+    def get_ecosystem_economic_risks(self, limit: int = 3, score_threshold: float = 0.6) -> Dict[str, List[Document]]:
+        """News and community discussions about economic risks of the ecosystem."""
+        query = "Economic risks for the Aurory ecosystem: token inflation, sell pressure, exploits, market decline"
+        return {
+            "risk_news": self.semantic_search(
+                query, limit=limit, score_threshold=score_threshold,
+                filters={"doc_type": "news", "economic_significance_min": 3},
+            ),
+            "community_risk_tweets": self.semantic_search(
+                query, limit=limit, score_threshold=score_threshold, filters={"doc_type": "tweet"},
+            ),
+        }
+
    
 def print_search_results(title: str, results: List[Document]):
     """Arama sonuçlarını düzenli bir şekilde yazdırır."""
@@ -505,6 +844,13 @@ if __name__ == "__main__":
         print("Uygulama Neo4j bağlantısı olmadan devam edemez.")
         exit()
 
+    # Kullanım: python vector_embedding.py --refresh-metadata
+    # (ilişkiler başka bir yerden, örneğin data.txt ile değiştiğinde yalnızca kopyaları yeniler)
+    if "--refresh-metadata" in sys.argv:
+        pipeline.materialize_retrieval_metadata()
+        pipeline.mark_dataset_version()
+        exit()
+
     # Veri yükleme ve işleme
     pdf_folder = "C:/Users/alice/OneDrive/Masaüstü/FinalCase/DataGathering/embedding_data/DAOPDF"
     csv_files = [
@@ -512,21 +858,18 @@ if __name__ == "__main__":
         "C:/Users/alice/OneDrive/Masaüstü/FinalCase/DataGathering/embedding_data/tweets.csv" 
     ]
 
-    all_documents = []
-
-    # PDF belgelerini işle
-    pdf_docs = pipeline.process_pdf_documents(pdf_folder)
-    all_documents.extend(pdf_docs)
-
-    # CSV verilerini işle
-    csv_docs = pipeline.process_csv_data(csv_files)
-    all_documents.extend(csv_docs)
+    # Okuma → parçalama/sınıflandırma → gömme → yazma akış halinde çalışır; tüm derlem bellekte tutulmaz
+    documents = itertools.chain(
+        pipeline.iter_pdf_documents(pdf_folder),  # PDF belgeleri
+        pipeline.iter_csv_documents(csv_files),   # CSV verileri
+    )
 
-    if all_documents:
-        # Belgeleri Neo4j'ye kaydet ve vektör indeksini oluştur
-        pipeline.store_documents_in_neo4j(all_documents)
+    # Belgeleri Neo4j'ye kaydet ve vektör indeksini oluştur
+    if pipeline.store_documents_in_neo4j(prefetch(documents, maxsize=int(os.getenv("INGEST_QUEUE_SIZE", 1000)))):
         # Belgeler arasında ilişkileri oluştur
         pipeline.create_document_relationships()
+        # Chatbot önbelleklerinin yeni veriyi görmesi için sürümü güncelle
+        pipeline.mark_dataset_version()
     else:
         print("İşlenecek belge bulunamadı. Vektör indeksleme ve ilişki oluşturma atlanıyor.")
 